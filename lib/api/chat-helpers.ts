@@ -320,8 +320,10 @@ export function createGeminiModel(): ReturnType<ReturnType<typeof createGoogleGe
       : 'gemini-2.0-flash'
   ) as GeminiModelId
 
+  // GEMINI_BASE_URL 用于指向本地的模拟服务（scripts/load_test.py mock），生产环境不设置
   const googleProvider = createGoogleGenerativeAI({
     apiKey: geminiApiKey,
+    baseURL: process.env.GEMINI_BASE_URL || undefined,
   })
 
   logger.debug('Using Gemini model', {
@@ -12,6 +12,18 @@ interface KnowledgeFile {
   stats: Record<string, unknown>
 }
 
+// _manifest.json：旧格式为文件名数组；migrate_knowledge_base.py 发布的格式为对象，
+// entries 中带有发布时预先计算的字节数和统计信息
+interface ManifestEntry {
+  bytes?: number
+  stats?: Record<string, unknown>
+}
+
+interface Manifest {
+  files: string[]
+  entries?: Record<string, ManifestEntry>
+}
+
 interface KnowledgeData {
   company: string
   files: KnowledgeFile[]
@@ -19,6 +31,7 @@ interface KnowledgeData {
   totalSize: number
 }
 
+// 清单中没有预先计算的统计信息时才使用
 function getFileStats(key: string, data: unknown): Record<string, unknown> {
   const stats: Record<string, unknown> = {}
   
@@ -133,6 +146,7 @@ export async function loadKnowledgeData(
   // 从 public 目录读取清单文件
   const manifestUrl = `${baseUrl}/projects/${company}/knowledge/_manifest.json`
   let fileList: string[] = []
+  let manifestEntries: Record<string, ManifestEntry> = {}
   
   try {
     const manifestResponse = await fetch(manifestUrl, {
@@ -140,7 +154,13 @@ export async function loadKnowledgeData(
     })
     
     if (manifestResponse.ok) {
-      fileList = await manifestResponse.json()
+      const manifest: string[] | Manifest = await manifestResponse.json()
+      if (Array.isArray(manifest)) {
+        fileList = manifest
+      } else {
+        fileList = manifest.files || []
+        manifestEntries = manifest.entries || {}
+      }
     } else {
       // 如果清单文件不存在，尝试常见的文件名模式
       const commonFiles = [
@@ -190,9 +210,13 @@ export async function loadKnowledgeData(
         const fileNumber = fileName.match(/^\d+/)?.[0] || '0'
         const fileKey = fileName.replace(/^\d+-/, '')
         
-        // 估算文件大小（字符数）
+        // 文件大小（字节数）
         const size = new TextEncoder().encode(content).length
         
+        // 清单可能落后于实际文件（如只运行了 copy:knowledge），大小不一致时不使用预先计算的统计
+        const entry = manifestEntries[file]
+        const precomputed = entry?.bytes === size ? entry.stats : undefined
+        
         return {
           filename: file,
           name: fileName,
@@ -202,7 +226,7 @@ export async function loadKnowledgeData(
           lastModified: new Date().toISOString(), // Edge Runtime 无法获取文件修改时间
           data: data,
           // 统计信息
-          stats: getFileStats(fileKey, data)
+          stats: precomputed ?? getFileStats(fileKey, data)
         }
       } catch (error) {
         console.error(`Error loading file ${file}:`, error)
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+对话日志分析
+
+把 messages 表（sql/01-init.sql）的导出文件（JSONL / CSV，可 gzip 压缩）逐行流式写入
+列式存储：每一列是一个定长二进制文件，字符串列（公司、意图）用字典编码为整数。
+分析时用 numpy.memmap 直接映射这些文件，按公司计算 response_time 的 p50/p95/p99、
+按小时的负载曲线和意图频率，全部是向量化运算，数千万条消息也不需要把行读成对象。
+
+messages 表本身没有 company_id，需要同时提供 conversations 表的导出（--conversations），
+或者导出时已经 JOIN 出 company_id 列：
+
+    psql -c "\\copy (SELECT m.*, c.company_id FROM messages m JOIN conversations c USING (conversation_id)) \\
+             TO 'messages.csv' CSV HEADER"
+    python scripts/analyze_conversations.py ingest messages.csv
+    python scripts/analyze_conversations.py report --utc-offset 8
+
+写入只依赖标准库；report 需要 numpy（pip install numpy）。
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_STORE = PROJECT_ROOT / '.analytics' / 'messages'
+META_FILE = 'meta.json'
+STORE_VERSION = 1
+
+# 列名 -> array 类型码；写入时用 array.tofile，读取时映射为对应的 numpy dtype
+COLUMNS = {
+    'company': 'H',        # 公司字典编码，0 = 未知
+    'role': 'B',           # ROLES 中的下标
+    'intent': 'H',         # 意图字典编码，0 = 无
+    'timestamp': 'q',      # Unix 时间戳（秒，UTC）
+    'response_time': 'i',  # 毫秒，-1 = 空
+}
+NUMPY_DTYPES = {'H': 'u2', 'B': 'u1', 'q': 'i8', 'i': 'i4'}
+ROLES = ('unknown', 'user', 'assistant', 'system')
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+FLUSH_ROWS = 65536
+PERCENTILES = (50, 95, 99)
+
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        print('❌ report 需要 numpy：pip install numpy')
+        sys.exit(2)
+    return numpy
+
+
+def open_text(path: Path) -> io.TextIOBase:
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def detect_format(path: Path) -> str:
+    suffixes = [suffix for suffix in path.suffixes if suffix != '.gz']
+    return 'csv' if suffixes and suffixes[-1] == '.csv' else 'jsonl'
+
+
+def iter_rows(path: Path, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """逐行读取导出文件；每行只在处理期间存在"""
+    fmt = fmt or detect_format(path)
+    with open_text(path) as f:
+        if fmt == 'csv':
+            # content 列可能很长
+            csv.field_size_limit(sys.maxsize)
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict):
+                yield row
+
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """ISO 8601（含 PostgreSQL 的 '2025-01-01 12:00:00.123+08' 形式）或数字（秒/毫秒）"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        # 大于 10^11 的数字按毫秒处理
+        return int(value / 1000) if value > 1e11 else int(value)
+    text = str(value).strip()
+    if text.isdigit():
+        return parse_timestamp(int(text))
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    elif len(text) > 3 and text[-3] in '+-' and text[-2:].isdigit() and ':' not in text[-3:]:
+        text += ':00'
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def parse_int(value: Any) -> int:
+    if value is None or value == '':
+        return -1
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return -1
+
+
+class ColumnStore:
+    """每列一个追加写入的二进制文件，字典和行数记录在 meta.json"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        meta_path = self.directory / META_FILE
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            if self.meta.get('version') != STORE_VERSION:
+                raise ValueError(f'{self.directory} 的存储格式版本不兼容，请使用 --reset 重新导入')
+        else:
+            self.meta = {'version': STORE_VERSION, 'byteorder': sys.byteorder, 'rows': 0,
+                         'companies': [''], 'intents': [''], 'sources': []}
+        self.company_codes = {name: code for code, name in enumerate(self.meta['companies'])}
+        self.intent_codes = {name: code for code, name in enumerate(self.meta['intents'])}
+
+    @property
+    def rows(self) -> int:
+        return self.meta['rows']
+
+    def reset(self):
+        for column in COLUMNS:
+            (self.directory / f'{column}.bin').unlink(missing_ok=True)
+        (self.directory / META_FILE).unlink(missing_ok=True)
+        self.__init__(self.directory)
+
+    @staticmethod
+    def _code(codes: Dict[str, int], names: List[str], name: str) -> int:
+        code = codes.get(name)
+        if code is None:
+            if len(names) >= 0xFFFF:
+                raise ValueError('字典项超过 65535 个')
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def company_code(self, name: Optional[str]) -> int:
+        return self._code(self.company_codes, self.meta['companies'], name) if name else 0
+
+    def intent_code(self, name: Optional[str]) -> int:
+        return self._code(self.intent_codes, self.meta['intents'], name) if name else 0
+
+    def append(self, buffers: Dict[str, array]):
+        rows = len(buffers['company'])
+        if not rows:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for column, buffer in buffers.items():
+            with open(self.directory / f'{column}.bin', 'ab') as f:
+                buffer.tofile(f)
+        self.meta['rows'] += rows
+        self.save_meta()
+
+    def save_meta(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+    def arrays(self, np) -> Dict[str, Any]:
+        """以只读 memmap 打开所有列"""
+        prefix = '<' if self.meta['byteorder'] == 'little' else '>'
+        columns = {}
+        for column, typecode in COLUMNS.items():
+            dtype = np.dtype(prefix + NUMPY_DTYPES[typecode])
+            if self.rows == 0:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(self.directory / f'{column}.bin', dtype=dtype, mode='r',
+                                            shape=(self.rows,))
+        return columns
+
+
+class Ingestor:
+    def __init__(self, store: ColumnStore, conversation_companies: Optional[Dict[str, int]] = None):
+        self.store = store
+        # conversation_id -> 公司编码（来自 conversations 导出）
+        self.conversation_companies = conversation_companies or {}
+        self.buffers = {column: array(typecode) for column, typecode in COLUMNS.items()}
+        self.rows = 0
+        self.skipped = 0
+        self.unknown_company = 0
+
+    def resolve_company(self, row: Dict[str, Any]) -> int:
+        company = row.get('company_id') or row.get('company')
+        if company:
+            return self.store.company_code(company)
+        code = self.conversation_companies.get(row.get('conversation_id') or '')
+        if code is not None:
+            return code
+        metadata = row.get('metadata')
+        if isinstance(metadata, str) and metadata.startswith('{'):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                metadata = None
+        if isinstance(metadata, dict) and (metadata.get('company_id') or metadata.get('company')):
+            return self.store.company_code(metadata.get('company_id') or metadata.get('company'))
+        self.unknown_company += 1
+        return 0
+
+    def add(self, row: Dict[str, Any]):
+        timestamp = parse_timestamp(row.get('timestamp') or row.get('created_at'))
+        if timestamp is None:
+            self.skipped += 1
+            return
+        buffers = self.buffers
+        buffers['company'].append(self.resolve_company(row))
+        buffers['role'].append(ROLE_CODES.get(row.get('role') or 'unknown', 0))
+        buffers['intent'].append(self.store.intent_code(row.get('intent')))
+        buffers['timestamp'].append(timestamp)
+        buffers['response_time'].append(parse_int(row.get('response_time')))
+        self.rows += 1
+        if len(buffers['company']) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        self.store.append(self.buffers)
+        self.buffers = {column: array(typecode) for column, typecode in COLUMNS.items()}
+
+
+def load_conversation_companies(paths: List[Path], store: ColumnStore) -> Dict[str, int]:
+    """只保留 conversation_id -> 公司编码，不保存整行"""
+    mapping: Dict[str, int] = {}
+    for path in paths:
+        for row in iter_rows(path):
+            conversation_id = row.get('conversation_id')
+            company = row.get('company_id')
+            if conversation_id and company:
+                mapping[conversation_id] = store.company_code(company)
+    return mapping
+
+
+# ---------------------------------------------------------------------------
+# 分析（numpy）
+# ---------------------------------------------------------------------------
+
+def group_bounds(np, sorted_keys):
+    """已排序键数组中每组的 [start, end)"""
+    if len(sorted_keys) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    ends = np.r_[starts[1:], len(sorted_keys)]
+    return starts, ends
+
+
+def response_time_percentiles(np, company, role, response_time) -> Dict[int, Dict[str, Any]]:
+    """按公司排序后一次取出所有分位数（最近秩法）"""
+    selected = np.flatnonzero((response_time >= 0) & (role == ROLE_CODES['assistant']))
+    companies = company[selected]
+    times = response_time[selected]
+    order = np.lexsort((times, companies))
+    companies = companies[order]
+    times = times[order]
+    starts, ends = group_bounds(np, companies)
+    sizes = ends - starts
+    result: Dict[int, Dict[str, Any]] = {}
+    values = {p: times[starts + np.ceil(sizes * p / 100).astype(np.int64) - 1] for p in PERCENTILES}
+    means = np.add.reduceat(times.astype(np.int64), starts) / sizes if len(starts) else []
+    for i, start in enumerate(starts):
+        stats = {'count': int(sizes[i]), 'mean': round(float(means[i]), 1)}
+        stats.update({f'p{p}': int(values[p][i]) for p in PERCENTILES})
+        result[int(companies[start])] = stats
+    return result
+
+
+def hourly_load(np, company, timestamp, companies: int, utc_offset: int) -> Dict[int, Dict[str, Any]]:
+    """每个公司按一天中的小时统计消息量（总数和每个活跃日的平均），以及单小时峰值"""
+    local = timestamp + utc_offset * 3600
+    company64 = company.astype(np.int64)
+    hour_of_day = (local // 3600) % 24
+    totals = np.bincount(company64 * 24 + hour_of_day, minlength=companies * 24).reshape(companies, 24)
+
+    # 活跃天数：(公司, 日) 去重
+    day_keys = np.unique((company64 << 32) | (local // 86400))
+    active_days = np.bincount(day_keys >> 32, minlength=companies)
+
+    # 单小时峰值：(公司, 小时桶) 计数后取每个公司的最大值
+    hour_keys, hour_counts = np.unique((company64 << 32) | (local // 3600), return_counts=True)
+    order = np.lexsort((hour_counts, hour_keys >> 32))
+    hour_keys = hour_keys[order]
+    hour_counts = hour_counts[order]
+    _, ends = group_bounds(np, hour_keys >> 32)
+
+    result: Dict[int, Dict[str, Any]] = {}
+    for end in ends:
+        code = int(hour_keys[end - 1] >> 32)
+        days = int(active_days[code])
+        peak_hour = int(hour_keys[end - 1] & 0xFFFFFFFF) * 3600 - utc_offset * 3600
+        result[code] = {
+            'by_hour': totals[code].tolist(),
+            'avg_per_day': [round(float(v) / days, 2) for v in totals[code]] if days else [],
+            'active_days': days,
+            'busiest_hour_of_day': int(totals[code].argmax()),
+            'peak_hour': datetime.fromtimestamp(peak_hour, timezone.utc).strftime('%Y-%m-%dT%H:00Z'),
+            'peak_hour_messages': int(hour_counts[end - 1])
+        }
+    return result
+
+
+def intent_frequencies(np, company, intent, companies: int, intents: int, top: int) -> Dict[int, List[List[Any]]]:
+    selected = intent > 0
+    counts = np.bincount(company[selected].astype(np.int64) * intents + intent[selected],
+                         minlength=companies * intents).reshape(companies, intents)
+    result: Dict[int, List[List[Any]]] = {}
+    for code in np.flatnonzero(counts.sum(axis=1)):
+        row = counts[code]
+        ranked = np.argsort(-row, kind='stable')[:top]
+        result[int(code)] = [[int(i), int(row[i])] for i in ranked if row[i] > 0]
+    return result
+
+
+def analyze(store: ColumnStore, utc_offset: int = 0, since: Optional[int] = None, until: Optional[int] = None,
+            company_names: Optional[List[str]] = None, top_intents: int = 10) -> Dict[str, Any]:
+    np = require_numpy()
+    columns = store.arrays(np)
+    companies = store.meta['companies']
+    intents = store.meta['intents']
+
+    mask = None
+    if since is not None:
+        mask = columns['timestamp'] >= since
+    if until is not None:
+        mask = (columns['timestamp'] < until) if mask is None else mask & (columns['timestamp'] < until)
+    if company_names:
+        codes = [store.company_codes[name] for name in company_names if name in store.company_codes]
+        selected = np.isin(columns['company'], codes)
+        mask = selected if mask is None else mask & selected
+    if mask is not None:
+        columns = {name: column[mask] for name, column in columns.items()}
+
+    company, role, timestamp = columns['company'], columns['role'], columns['timestamp']
+    per_company = np.bincount(company, minlength=len(companies))
+    per_role = np.bincount(company.astype(np.int64) * len(ROLES) + role,
+                           minlength=len(companies) * len(ROLES)).reshape(len(companies), len(ROLES))
+    latencies = response_time_percentiles(np, company, role, columns['response_time'])
+    load = hourly_load(np, company, timestamp, len(companies), utc_offset)
+    frequencies = intent_frequencies(np, company, columns['intent'], len(companies), len(intents), top_intents)
+
+    report: Dict[str, Any] = {}
+    for code in np.flatnonzero(per_company):
+        code = int(code)
+        report[companies[code] or '(unknown)'] = {
+            'messages': int(per_company[code]),
+            'by_role': {ROLES[i]: int(per_role[code][i]) for i in range(len(ROLES)) if per_role[code][i]},
+            'response_time_ms': latencies.get(code),
+            'load': load.get(code),
+            'top_intents': [{'intent': intents[i], 'count': count} for i, count in frequencies.get(code, [])]
+        }
+    return {
+        'rows': int(len(company)),
+        'time_range': [int(timestamp.min()), int(timestamp.max())] if len(timestamp) else None,
+        'utc_offset': utc_offset,
+        'companies': report
+    }
+
+
+def sparkline(values: List[int]) -> str:
+    blocks = ' ▁▂▃▄▅▆▇█'
+    peak = max(values) if values else 0
+    if not peak:
+        return ' ' * len(values)
+    return ''.join(blocks[min(8, round(v / peak * 8))] for v in values)
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"📊 {result['rows']:,} 条消息，{len(result['companies'])} 个公司（时区 UTC{result['utc_offset']:+d}）")
+    for name, stats in sorted(result['companies'].items(), key=lambda item: -item[1]['messages']):
+        print(f"\n## {name}: {stats['messages']:,} 条 " +
+              ' '.join(f'{role}={count:,}' for role, count in stats['by_role'].items()))
+        latency = stats['response_time_ms']
+        if latency:
+            print(f"  响应时间(ms): p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} "
+                  f"mean={latency['mean']} (n={latency['count']:,})")
+        load = stats['load']
+        if load:
+            print(f"  每小时负载 0-23h: |{sparkline(load['by_hour'])}| 最忙 {load['busiest_hour_of_day']}:00，"
+                  f"峰值 {load['peak_hour_messages']:,} 条/小时 ({load['peak_hour']})，活跃 {load['active_days']} 天")
+        if stats['top_intents']:
+            print('  意图: ' + ', '.join(f"{item['intent']}={item['count']:,}" for item in stats['top_intents']))
+
+
+def parse_date_arg(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    timestamp = parse_timestamp(value)
+    if timestamp is None:
+        raise argparse.ArgumentTypeError(f'无法解析时间: {value}')
+    return timestamp
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对话日志分析（列式存储 + 向量化统计）')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE, help='列式存储目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='把 messages 导出文件追加到列式存储')
+    ingest_parser.add_argument('files', nargs='+', type=Path, help='JSONL / CSV 文件（可为 .gz）')
+    ingest_parser.add_argument('--format', choices=['jsonl', 'csv'], help='默认按扩展名判断')
+    ingest_parser.add_argument('--conversations', type=Path, action='append', default=[],
+                               help='conversations 表导出，用于把 conversation_id 映射到公司')
+    ingest_parser.add_argument('--reset', action='store_true', help='清空已有数据后再导入')
+
+    report_parser = subparsers.add_parser('report', help='输出各公司的响应时间分位数、负载曲线和意图频率')
+    report_parser.add_argument('--utc-offset', type=int, default=0, help='按该时区（小时）统计一天中的小时')
+    report_parser.add_argument('--since', type=parse_date_arg, help='起始时间（含）')
+    report_parser.add_argument('--until', type=parse_date_arg, help='结束时间（不含）')
+    report_parser.add_argument('--company', action='append', help='只统计指定公司（可多次指定）')
+    report_parser.add_argument('--top-intents', type=int, default=10)
+    report_parser.add_argument('--json', type=Path, help='把结果写入 JSON 文件')
+
+    args = parser.parse_args()
+    try:
+        store = ColumnStore(args.store)
+    except ValueError as e:
+        print(f'❌ {e}')
+        return 1
+
+    if args.command == 'ingest':
+        if args.reset:
+            store.reset()
+        conversation_companies = load_conversation_companies(args.conversations, store)
+        ingestor = Ingestor(store, conversation_companies)
+        for path in args.files:
+            before = ingestor.rows
+            for row in iter_rows(path, args.format):
+                ingestor.add(row)
+            ingestor.flush()
+            store.meta['sources'].append({'file': str(path), 'rows': ingestor.rows - before,
+                                          'ingested_at': datetime.now().isoformat(timespec='seconds')})
+            print(f'✅ {path}: {ingestor.rows - before:,} 行')
+        store.save_meta()
+        print(f'📦 {args.store}: 共 {store.rows:,} 行，{len(store.meta["companies"]) - 1} 个公司，'
+              f'{len(store.meta["intents"]) - 1} 个意图')
+        if ingestor.skipped:
+            print(f'⚠️  {ingestor.skipped:,} 行缺少可解析的时间戳，已跳过')
+        if ingestor.unknown_company:
+            print(f'⚠️  {ingestor.unknown_company:,} 行无法确定公司（缺少 company_id，可用 --conversations 提供映射）')
+        return 0
+
+    if store.rows == 0:
+        print(f'❌ {args.store} 中没有数据，请先运行 ingest')
+        return 1
+    result = analyze(store, args.utc_offset, args.since, args.until, args.company, args.top_intents)
+    print_report(result)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f'\n📄 结果已保存: {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+知识库缓存策略模拟器
+
+按请求轨迹回放 getKnowledgeBase 的缓存行为，比较不同策略的命中率、回源次数和陈旧程度。
+轨迹来源：
+- 日志：messages 导出（JSONL / CSV，可 gzip，格式同 analyze_conversations.py），每条 user 消息
+  对应一次知识库读取；没有 company_id 列时用 --conversations 提供 conversation_id 到公司的映射
+- 合成：Zipf 分布的租户组合 + 泊松到达
+
+知识库更新按每个租户的泊松过程生成（--update-interval），用来衡量返回了多旧的内容。
+
+策略：
+- current：lib/knowledge-cache.ts 的忠实模型——固定 TTL；写入前先清理过期项，再按写入时间
+  删除最旧的条目到 maxSize（所以实际最多 maxSize + 1 条）；读取时 10% 概率清理过期项；
+  读取不更新时间戳（淘汰顺序是 FIFO 而不是 LRU）；并发未命中各自回源（没有合并请求）
+- lru：TTL + LRU 淘汰
+- wtinylfu：TTL + W-TinyLFU（1% 窗口 LRU + 分段 LRU 主区，Count-Min Sketch 频率准入）
+- swr：LRU；过期后 --stale-window 内先返回旧内容，同时在后台刷新
+- revalidate：LRU；过期后用 _manifest.json 中的 sha256 做一次条件校验，内容未变只续期，
+  变了才完整回源
+除 current 外都合并同一租户的并发回源（single flight）。
+
+Edge Runtime 每个 isolate 有独立的内存缓存，--isolates 把请求随机分配到多个缓存实例。
+
+    python scripts/cache_simulator.py --tenants 200 --rate 20 --duration 86400
+    python scripts/cache_simulator.py --log messages.jsonl.gz --ttl 60 --ttl 300 --ttl 1800 --json cache.json
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import math
+import random
+import sys
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from analyze_conversations import iter_rows, parse_timestamp  # noqa: E402
+
+POLICIES = ('current', 'lru', 'wtinylfu', 'swr', 'revalidate')
+# lib/knowledge-cache.ts 的默认配置
+DEFAULT_TTL = 5 * 60
+DEFAULT_MAX_SIZE = 100
+CLEANUP_PROBABILITY = 0.1
+
+Trace = List[Tuple[float, str]]
+
+
+class Entry:
+    __slots__ = ('version', 'stored', 'expiry')
+
+    def __init__(self, version: int, stored: float, expiry: float):
+        self.version = version
+        self.stored = stored
+        self.expiry = expiry
+
+
+# ---------------------------------------------------------------------------
+# 存储与淘汰
+# ---------------------------------------------------------------------------
+
+class TimestampStore:
+    """knowledge-cache.ts 的 Map：超出 maxSize 时按写入时间删除最旧的条目"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: Dict[str, Entry] = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Entry]:
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: Entry):
+        # enforceMaxSize 在写入之前执行
+        if len(self.entries) > self.capacity:
+            oldest = sorted(self.entries.items(), key=lambda item: item[1].stored)
+            for old_key, _ in oldest[:len(self.entries) - self.capacity]:
+                del self.entries[old_key]
+        self.entries[key] = entry
+
+    def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    def remove_expired(self, now: float):
+        for key in [key for key, entry in self.entries.items() if entry.expiry < now]:
+            del self.entries[key]
+
+
+class LRUStore:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: 'OrderedDict[str, Entry]' = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Entry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self.entries.pop(key, None)
+
+
+class CountMinSketch:
+    """4 行、4 位计数器的频率估计；累计 10 倍容量次访问后全部减半，让旧的热度衰减"""
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int):
+        self.width = 1 << max(4, (4 * capacity - 1).bit_length())
+        self.rows = [bytearray(self.width) for _ in range(self.DEPTH)]
+        self.sample_size = 10 * capacity
+        self.additions = 0
+
+    def _indexes(self, key: str):
+        data = key.encode('utf-8')
+        mask = self.width - 1
+        return [zlib.crc32(data, seed * 0x9E3779B1 & 0xFFFFFFFF) & mask for seed in range(1, self.DEPTH + 1)]
+
+    def increment(self, key: str):
+        for row, index in zip(self.rows, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            for row in self.rows:
+                for index in range(self.width):
+                    row[index] >>= 1
+            self.additions //= 2
+
+    def frequency(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+
+class WTinyLFUStore:
+    """窗口 LRU（1%）+ 主区分段 LRU（probation 20% / protected 80%），窗口淘汰者按频率准入主区"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.window_capacity = max(1, capacity // 100)
+        self.main_capacity = max(1, capacity - self.window_capacity)
+        self.protected_capacity = max(1, self.main_capacity * 8 // 10)
+        self.window: 'OrderedDict[str, Entry]' = OrderedDict()
+        self.probation: 'OrderedDict[str, Entry]' = OrderedDict()
+        self.protected: 'OrderedDict[str, Entry]' = OrderedDict()
+        self.sketch = CountMinSketch(capacity)
+
+    def __len__(self):
+        return len(self.window) + len(self.probation) + len(self.protected)
+
+    def get(self, key: str) -> Optional[Entry]:
+        # 未命中也计入频率，准入判断才能识别反复回源的租户
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+            return self.window[key]
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return self.protected[key]
+        if key in self.probation:
+            entry = self.probation.pop(key)
+            self.protected[key] = entry
+            if len(self.protected) > self.protected_capacity:
+                demoted_key, demoted = self.protected.popitem(last=False)
+                self.probation[demoted_key] = demoted
+            return entry
+        return None
+
+    def put(self, key: str, entry: Entry):
+        for segment in (self.window, self.probation, self.protected):
+            if key in segment:
+                segment[key] = entry
+                return
+        self.window[key] = entry
+        if len(self.window) <= self.window_capacity:
+            return
+        candidate_key, candidate = self.window.popitem(last=False)
+        if len(self.probation) + len(self.protected) < self.main_capacity:
+            self.probation[candidate_key] = candidate
+            return
+        victims = self.probation or self.protected
+        victim_key = next(iter(victims))
+        if self.sketch.frequency(candidate_key) > self.sketch.frequency(victim_key):
+            del victims[victim_key]
+            self.probation[candidate_key] = candidate
+
+    def delete(self, key: str):
+        for segment in (self.window, self.probation, self.protected):
+            segment.pop(key, None)
+
+
+# ---------------------------------------------------------------------------
+# 源站与策略
+# ---------------------------------------------------------------------------
+
+class Origin:
+    """每个租户的版本号 = 截至当前时刻的更新次数"""
+
+    def __init__(self, updates: Dict[str, List[float]]):
+        self.updates = updates
+
+    def version(self, key: str, now: float) -> int:
+        return bisect.bisect_right(self.updates.get(key, []), now)
+
+    def superseded_at(self, key: str, version: int) -> float:
+        return self.updates[key][version]
+
+
+class Policy:
+    """
+    一个缓存实例：lookup 返回 ('fresh' | 'stale' | 'miss', 条目)
+
+    回源有 fetch_latency 的延迟，完成时才写入缓存；single_flight 为 False 时，
+    回源期间到达的同一租户请求会各自再回源一次（与当前 getKnowledgeBase 一致）。
+    """
+
+    def __init__(self, name: str, capacity: int, ttl: float, stale_window: float, rng: random.Random):
+        self.name = name
+        self.ttl = ttl
+        self.rng = rng
+        self.single_flight = name != 'current'
+        if name == 'current':
+            self.store = TimestampStore(capacity)
+        elif name == 'wtinylfu':
+            self.store = WTinyLFUStore(capacity)
+        else:
+            self.store = LRUStore(capacity)
+        if name == 'swr':
+            self.stale_window = stale_window
+        elif name == 'revalidate':
+            # 条目一直保留到被淘汰，过期后只需要校验
+            self.stale_window = math.inf
+        else:
+            self.stale_window = 0.0
+        self.pending: List[Tuple[float, int, str, int]] = []
+        self.in_flight: Dict[str, Tuple[float, int]] = {}
+        self.sequence = 0
+
+    def complete_fetches(self, now: float):
+        while self.pending and self.pending[0][0] <= now:
+            completed, _, key, version = heapq.heappop(self.pending)
+            if self.name == 'current':
+                # setCachedKnowledgeBase 先清理过期项
+                self.store.remove_expired(completed)
+            self.store.put(key, Entry(version, completed, completed + self.ttl))
+            if self.in_flight.get(key, (None,))[0] == completed:
+                del self.in_flight[key]
+
+    def lookup(self, key: str, now: float) -> Tuple[str, Optional[Entry]]:
+        if self.name == 'current' and len(self.store) and self.rng.random() < CLEANUP_PROBABILITY:
+            self.store.remove_expired(now)
+        entry = self.store.get(key)
+        if entry is None:
+            return 'miss', None
+        # knowledge-cache.ts 用 expiry < now 判断过期
+        if entry.expiry >= now:
+            return 'fresh', entry
+        if now - entry.expiry <= self.stale_window:
+            return 'stale', entry
+        self.store.delete(key)
+        return 'miss', None
+
+    def fetch(self, key: str, now: float, latency: float, version: int) -> Tuple[bool, int]:
+        """发起或加入回源；返回 (是否新发起, 得到的版本)"""
+        if self.single_flight and key in self.in_flight:
+            return False, self.in_flight[key][1]
+        completed = now + latency
+        self.sequence += 1
+        heapq.heappush(self.pending, (completed, self.sequence, key, version))
+        self.in_flight[key] = (completed, version)
+        return True, version
+
+    def extend(self, entry: Entry, now: float):
+        entry.expiry = now + self.ttl
+
+
+# ---------------------------------------------------------------------------
+# 模拟
+# ---------------------------------------------------------------------------
+
+def simulate(trace: Trace, origin: Origin, policy_name: str, capacity: int, ttl: float, stale_window: float,
+             fetch_latency: float, isolates: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    caches = [Policy(policy_name, capacity, ttl, stale_window, rng) for _ in range(isolates)]
+    counters = {'requests': 0, 'hits': 0, 'stale_hits': 0, 'misses': 0, 'joined': 0,
+                'origin_fetches': 0, 'background_fetches': 0, 'validations': 0, 'stale_served': 0}
+    stale_ages: List[float] = []
+
+    for now, key in trace:
+        cache = caches[rng.randrange(isolates)] if isolates > 1 else caches[0]
+        cache.complete_fetches(now)
+        counters['requests'] += 1
+        current_version = origin.version(key, now)
+        state, entry = cache.lookup(key, now)
+
+        if state == 'stale' and cache.name == 'revalidate':
+            counters['validations'] += 1
+            if entry.version == current_version:
+                cache.extend(entry, now)
+                state = 'fresh'
+            else:
+                state = 'miss'
+
+        if state == 'fresh':
+            counters['hits'] += 1
+            served = entry.version
+        elif state == 'stale':
+            counters['hits'] += 1
+            counters['stale_hits'] += 1
+            served = entry.version
+            started, _ = cache.fetch(key, now, fetch_latency, current_version)
+            if started:
+                counters['origin_fetches'] += 1
+                counters['background_fetches'] += 1
+        else:
+            counters['misses'] += 1
+            started, served = cache.fetch(key, now, fetch_latency, current_version)
+            if started:
+                counters['origin_fetches'] += 1
+            else:
+                counters['joined'] += 1
+
+        if served < current_version:
+            counters['stale_served'] += 1
+            stale_ages.append(now - origin.superseded_at(key, served))
+
+    requests = counters['requests'] or 1
+    stale_ages.sort()
+    return {
+        'policy': policy_name,
+        'ttl': ttl,
+        'capacity': capacity,
+        **counters,
+        'hit_ratio': round(counters['hits'] / requests, 4),
+        'fetches_per_1k': round(counters['origin_fetches'] * 1000 / requests, 2),
+        'blocking_origin_trips': counters['misses'] - counters['joined'] + counters['validations'],
+        'stale_ratio': round(counters['stale_served'] / requests, 5),
+        'stale_age_mean': round(sum(stale_ages) / len(stale_ages), 1) if stale_ages else 0.0,
+        'stale_age_p95': round(stale_ages[min(len(stale_ages) - 1, int(len(stale_ages) * 0.95))], 1)
+        if stale_ages else 0.0,
+        'stale_age_max': round(stale_ages[-1], 1) if stale_ages else 0.0
+    }
+
+
+# ---------------------------------------------------------------------------
+# 轨迹
+# ---------------------------------------------------------------------------
+
+def synthetic_trace(tenants: int, zipf: float, rate: float, duration: float, seed: int) -> Trace:
+    """泊松到达；第 i 个租户的权重为 1 / i^zipf"""
+    rng = random.Random(seed)
+    names = [f'tenant-{rank:04d}' for rank in range(1, tenants + 1)]
+    cumulative = []
+    total = 0.0
+    for rank in range(1, tenants + 1):
+        total += 1 / rank ** zipf
+        cumulative.append(total)
+    trace = []
+    now = rng.expovariate(rate)
+    while now < duration:
+        trace.append((now, names[min(bisect.bisect_left(cumulative, rng.random() * total), tenants - 1)]))
+        now += rng.expovariate(rate)
+    return trace
+
+
+def load_conversation_companies(paths: List[Path]) -> Dict[str, str]:
+    mapping = {}
+    for path in paths:
+        for row in iter_rows(path):
+            if row.get('conversation_id') and row.get('company_id'):
+                mapping[row['conversation_id']] = row['company_id']
+    return mapping
+
+
+def log_trace(paths: List[Path], conversations: Dict[str, str]) -> Tuple[Trace, int]:
+    """每条 user 消息（没有 role 列时每一行）是一次读取；返回轨迹和跳过的行数"""
+    trace = []
+    skipped = 0
+    for path in paths:
+        for row in iter_rows(path):
+            if row.get('role') and row['role'] != 'user':
+                continue
+            timestamp = parse_timestamp(row.get('timestamp') or row.get('created_at'))
+            company = row.get('company_id') or row.get('company') or conversations.get(row.get('conversation_id') or '')
+            if timestamp is None or not company:
+                skipped += 1
+                continue
+            trace.append((float(timestamp), company))
+    # 日志时间只精确到秒：同一秒内的请求均匀分布，避免全部落在同一时刻
+    trace.sort(key=lambda item: item[0])
+    spread = []
+    index = 0
+    while index < len(trace):
+        end = index
+        while end < len(trace) and trace[end][0] == trace[index][0]:
+            end += 1
+        count = end - index
+        spread.extend((timestamp + offset / count, company)
+                      for offset, (timestamp, company) in enumerate(trace[index:end]))
+        index = end
+    return spread, skipped
+
+
+def generate_updates(trace: Trace, interval: float, seed: int) -> Dict[str, List[float]]:
+    """每个租户的知识库按平均间隔 interval 秒的泊松过程更新"""
+    if not trace or interval <= 0:
+        return {}
+    rng = random.Random(seed + 1)
+    start, end = trace[0][0], trace[-1][0]
+    updates = {}
+    for key in sorted({key for _, key in trace}):
+        times = []
+        now = start + rng.expovariate(1 / interval)
+        while now <= end:
+            times.append(now)
+            now += rng.expovariate(1 / interval)
+        updates[key] = times
+    return updates
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"{'策略':<11} {'TTL':>6} {'容量':>5} {'命中率':>7} {'回源':>8} {'回源/千次':>9} {'阻塞回源':>8} "
+          f"{'陈旧率':>8} {'陈旧均值s':>9} {'陈旧p95s':>9} {'陈旧最大s':>9}")
+    for result in results:
+        print(f"{result['policy']:<11} {result['ttl']:>6g} {result['capacity']:>5} {result['hit_ratio']:>7.2%} "
+              f"{result['origin_fetches']:>8} {result['fetches_per_1k']:>9} {result['blocking_origin_trips']:>8} "
+              f"{result['stale_ratio']:>8.3%} {result['stale_age_mean']:>9} {result['stale_age_p95']:>9} "
+              f"{result['stale_age_max']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='知识库缓存策略模拟器')
+    source = parser.add_argument_group('轨迹')
+    source.add_argument('--log', type=Path, action='append', help='messages 导出文件（可多次指定）')
+    source.add_argument('--conversations', type=Path, action='append',
+                        help='conversations 导出文件，用于补全 company_id')
+    source.add_argument('--tenants', type=int, default=50, help='合成轨迹的租户数')
+    source.add_argument('--zipf', type=float, default=1.0, help='合成轨迹的 Zipf 指数')
+    source.add_argument('--rate', type=float, default=5.0, help='合成轨迹的平均请求数/秒')
+    source.add_argument('--duration', type=float, default=6 * 3600, help='合成轨迹时长（秒）')
+    sim = parser.add_argument_group('模拟')
+    sim.add_argument('--policy', action='append', choices=POLICIES, help='要比较的策略（默认全部）')
+    sim.add_argument('--ttl', type=float, action='append', help=f'TTL 秒数，可多次指定（默认 {DEFAULT_TTL}）')
+    sim.add_argument('--capacity', type=int, action='append',
+                     help=f'最大条目数，可多次指定（默认 {DEFAULT_MAX_SIZE}）')
+    sim.add_argument('--stale-window', type=float, default=3600, help='swr 过期后仍可返回旧内容的秒数')
+    sim.add_argument('--fetch-latency', type=float, default=0.3, help='一次完整回源的秒数')
+    sim.add_argument('--update-interval', type=float, default=4 * 3600,
+                     help='每个租户知识库更新的平均间隔秒数（0 表示不更新）')
+    sim.add_argument('--isolates', type=int, default=1, help='独立缓存实例数（Edge isolate）')
+    sim.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    if args.log:
+        missing = [path for path in args.log + (args.conversations or []) if not path.exists()]
+        if missing:
+            print(f'❌ 文件不存在: {", ".join(map(str, missing))}')
+            return 1
+        trace, skipped = log_trace(args.log, load_conversation_companies(args.conversations or []))
+        print(f'📥 日志轨迹: {len(trace):,} 次读取，{len({key for _, key in trace})} 个租户'
+              + (f'，跳过 {skipped:,} 行（缺少时间或公司）' if skipped else ''))
+    else:
+        trace = synthetic_trace(args.tenants, args.zipf, args.rate, args.duration, args.seed)
+        print(f'🎲 合成轨迹: {len(trace):,} 次读取，{args.tenants} 个租户，Zipf {args.zipf}，'
+              f'{args.rate:g} 次/秒，{args.duration:g} 秒')
+    if not trace:
+        print('❌ 轨迹为空')
+        return 1
+
+    origin = Origin(generate_updates(trace, args.update_interval, args.seed))
+    results = []
+    for ttl in args.ttl or [DEFAULT_TTL]:
+        for capacity in args.capacity or [DEFAULT_MAX_SIZE]:
+            for policy in args.policy or POLICIES:
+                results.append(simulate(trace, origin, policy, capacity, ttl, args.stale_window,
+                                        args.fetch_latency, args.isolates, args.seed))
+    print()
+    print_results(results)
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': {key: str(value) if isinstance(value, Path) else value
+                                  for key, value in vars(args).items() if key != 'json'},
+                       'requests': len(trace), 'results': results}, f, ensure_ascii=False, indent=2, default=str)
+        print(f'\n📄 结果已保存: {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
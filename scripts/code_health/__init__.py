@@ -0,0 +1,5 @@
+"""
+代码健康度检查的子模块
+
+各检查引擎按需由 code_health_check.py 延迟导入，避免未使用的检查拖慢启动。
+"""
@@ -0,0 +1,357 @@
+"""
+离线依赖漏洞审计
+
+直接解析 package-lock.json（lockfileVersion 1 / 2 / 3），建立 包名 -> 版本 -> 安装路径 的索引，
+与本地的漏洞库快照做 semver 范围匹配，不需要网络，也不需要 npm。
+
+快照格式与 npm registry 的批量漏洞接口（/-/npm/v1/security/advisories/bulk）返回值相同，
+外加查询时的包名列表，用来判断哪些包不在快照覆盖范围内（快照之后新增的依赖）：
+    {"format": 1, "fetched_at": ..., "source": ..., "packages": [...], "advisories": {包名: [漏洞, ...]}}
+快照由 `code_health_check.py update-advisories` 更新并提交到仓库，CI 中只读。
+
+审计结果按 (lockfile 哈希, 快照哈希) 缓存在 .code-health/audit-cache.json，两者都未变化时直接复用。
+
+范围语法与 npm 相同（||、空格分隔的比较符、连字符范围、^、~、x 通配）。
+预发布版本按 semver 优先级直接比较，不套用 npm 排除预发布版本的规则——对漏洞匹配来说宁可多报。
+"""
+
+import hashlib
+import json
+import os
+import re
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ADVISORY_SNAPSHOT = Path(__file__).parent / 'advisories.json'
+CACHE_FILE = 'audit-cache.json'
+LOCKFILE_NAME = 'package-lock.json'
+SNAPSHOT_FORMAT = 1
+# 匹配逻辑变化时递增，使旧缓存失效
+ENGINE_VERSION = 1
+DEFAULT_REGISTRY = 'https://registry.npmjs.org'
+BULK_ENDPOINT = '/-/npm/v1/security/advisories/bulk'
+SEVERITY_ORDER = ('critical', 'high', 'moderate', 'low', 'info')
+# status 不为 ok 时审计没有执行，findings 为空不代表没有漏洞
+STATUS_MESSAGES = {
+    'no_lockfile': f'缺少 {LOCKFILE_NAME}',
+    'no_snapshot': '缺少漏洞库快照（运行 code_health_check.py update-advisories 生成并提交）',
+    'invalid_snapshot': '漏洞库快照格式无效（重新运行 update-advisories）',
+}
+
+VERSION_PATTERN = re.compile(
+    r'^\s*v?(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(?:-(?P<pre>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?\s*$'
+)
+PARTIAL_PATTERN = re.compile(
+    r'^v?(?P<major>\d+|[xX*])(?:\.(?P<minor>\d+|[xX*])(?:\.(?P<patch>\d+|[xX*])'
+    r'(?:-(?P<pre>[0-9A-Za-z.-]+))?)?)?(?:\+[0-9A-Za-z.-]+)?$'
+)
+COMPARATOR_PATTERN = re.compile(r'^(?P<op><=|>=|<|>|=|\^|~>?|)(?P<version>.*)$')
+# ">= 1.2.3" 中比较符与版本号之间的空白
+OPERATOR_SPACE = re.compile(r'(<=|>=|<|>|=|\^|~>?)\s+')
+HYPHEN_RANGE = re.compile(r'^(?P<low>\S+)\s+-\s+(?P<high>\S+)$')
+
+VersionKey = Tuple[int, int, int, Tuple[Any, ...]]
+Comparator = Tuple[str, VersionKey]
+
+
+# ---------------------------------------------------------------------------
+# semver
+# ---------------------------------------------------------------------------
+
+def _prerelease_key(pre: Optional[str]) -> Tuple[Any, ...]:
+    """正式版排在所有预发布版本之后；数字标识符小于字母标识符"""
+    if not pre:
+        return (1,)
+    return (0,) + tuple((0, int(part), '') if part.isdigit() else (1, 0, part) for part in pre.split('.'))
+
+
+def parse_version(text: str) -> Optional[VersionKey]:
+    match = VERSION_PATTERN.match(text or '')
+    if not match:
+        return None
+    return (int(match['major']), int(match['minor']), int(match['patch']), _prerelease_key(match['pre']))
+
+
+def _release(major: int, minor: int, patch: int) -> VersionKey:
+    return (major, minor, patch, (1,))
+
+
+def _lowest(major: int, minor: int, patch: int) -> VersionKey:
+    # X.Y.Z-0：比 X.Y.Z 的任何预发布版本都小，用作开区间上界
+    return (major, minor, patch, (0, (0, 0, '')))
+
+
+def _desugar(op: str, text: str) -> Optional[List[Comparator]]:
+    """把一个比较符展开为只含 <、<=、>、>=、= 的比较符列表；无法解析时返回 None"""
+    if text in ('', '*', 'x', 'X'):
+        return []
+    match = PARTIAL_PATTERN.match(text)
+    if not match:
+        return None
+    parts = [match[name] for name in ('major', 'minor', 'patch')]
+    numbers = [int(part) if part and part not in ('x', 'X', '*') else None for part in parts]
+    # 1.x.3 中 x 之后的部分也视为通配
+    for index in range(3):
+        if numbers[index] is None:
+            numbers[index + 1:] = [None] * (2 - index)
+            break
+    major, minor, patch = numbers
+    pre = _prerelease_key(match['pre'])
+    if major is None:
+        return [] if op in ('', '=', '>=', '<=', '^', '~', '~>') else [('<', _lowest(0, 0, 0))]
+    full = (major, minor or 0, patch or 0, pre)
+
+    if op == '^':
+        if major > 0 or minor is None:
+            upper = _lowest(major + 1, 0, 0)
+        elif minor > 0 or patch is None:
+            upper = _lowest(0, minor + 1, 0)
+        else:
+            upper = _lowest(0, 0, patch + 1)
+        return [('>=', full), ('<', upper)]
+    if op in ('~', '~>'):
+        upper = _lowest(major + 1, 0, 0) if minor is None else _lowest(major, minor + 1, 0)
+        return [('>=', full), ('<', upper)]
+
+    # 部分版本号表示的区间 [lower, upper)
+    if minor is None:
+        lower, upper = _release(major, 0, 0), _lowest(major + 1, 0, 0)
+    elif patch is None:
+        lower, upper = _release(major, minor, 0), _lowest(major, minor + 1, 0)
+    else:
+        lower = upper = None
+    if lower is None:
+        return [(op or '=', full)]
+    if op in ('', '='):
+        return [('>=', lower), ('<', upper)]
+    if op == '>':
+        return [('>=', upper)]
+    if op == '>=':
+        return [('>=', lower)]
+    if op == '<':
+        return [('<', lower)]
+    return [('<', upper)]
+
+
+def parse_range(text: str) -> Optional[List[List[Comparator]]]:
+    """解析为比较符集合的列表（集合之间为或、集合内部为与）；无法解析时返回 None"""
+    sets = []
+    for part in (text or '*').split('||'):
+        part = OPERATOR_SPACE.sub(r'\1', part.strip())
+        hyphen = HYPHEN_RANGE.match(part)
+        if hyphen:
+            low = _desugar('>=', hyphen['low'])
+            high = _desugar('<=', hyphen['high'])
+            if low is None or high is None:
+                return None
+            sets.append(low + high)
+            continue
+        comparators: List[Comparator] = []
+        for token in part.split():
+            match = COMPARATOR_PATTERN.match(token)
+            desugared = _desugar(match['op'], match['version'])
+            if desugared is None:
+                return None
+            comparators.extend(desugared)
+        sets.append(comparators)
+    return sets
+
+
+def _compare(version: VersionKey, op: str, bound: VersionKey) -> bool:
+    if op == '<':
+        return version < bound
+    if op == '<=':
+        return version <= bound
+    if op == '>':
+        return version > bound
+    if op == '>=':
+        return version >= bound
+    return version == bound
+
+
+def satisfies(version: VersionKey, parsed_range: List[List[Comparator]]) -> bool:
+    return any(all(_compare(version, op, bound) for op, bound in comparators) for comparators in parsed_range)
+
+
+# ---------------------------------------------------------------------------
+# lockfile
+# ---------------------------------------------------------------------------
+
+def _add_install(index: Dict[str, Dict[str, Dict[str, Any]]], name: str, version: str, path: str, dev: bool):
+    install = index.setdefault(name, {}).setdefault(version, {'paths': [], 'dev': True})
+    install['paths'].append(path)
+    # 只要有一处是生产依赖，就不算 dev
+    install['dev'] = install['dev'] and dev
+
+
+def index_lockfile(data: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """包名 -> 版本 -> {paths, dev}；跳过根项目、workspace 链接和非 semver 版本（git / 文件依赖）"""
+    index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    packages = data.get('packages')
+    if isinstance(packages, dict):
+        for path, entry in packages.items():
+            if not path or not isinstance(entry, dict) or entry.get('link'):
+                continue
+            version = entry.get('version')
+            if not isinstance(version, str) or parse_version(version) is None:
+                continue
+            name = entry.get('name') or path.rsplit('node_modules/', 1)[-1]
+            _add_install(index, name, version, path, bool(entry.get('dev')))
+        return index
+
+    # lockfileVersion 1：嵌套的 dependencies
+    stack = [('', data.get('dependencies') or {})]
+    while stack:
+        prefix, dependencies = stack.pop()
+        for name, entry in dependencies.items():
+            if not isinstance(entry, dict):
+                continue
+            path = f'{prefix}node_modules/{name}'
+            version = entry.get('version')
+            if isinstance(version, str) and parse_version(version) is not None:
+                _add_install(index, name, version, path, bool(entry.get('dev')))
+            if isinstance(entry.get('dependencies'), dict):
+                stack.append((f'{path}/', entry['dependencies']))
+    return index
+
+
+# ---------------------------------------------------------------------------
+# 快照
+# ---------------------------------------------------------------------------
+
+def load_snapshot(path: Path = ADVISORY_SNAPSHOT) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('format') != SNAPSHOT_FORMAT:
+        return None
+    return snapshot
+
+
+def write_snapshot(path: Path, advisories: Dict[str, Any], packages: List[str], source: str) -> Dict[str, Any]:
+    snapshot = {
+        'format': SNAPSHOT_FORMAT,
+        'fetched_at': datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        'packages': sorted(packages),
+        'advisories': {name: advisories[name] for name in sorted(advisories) if advisories[name]}
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix('.tmp')
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write('\n')
+    os.replace(temporary, path)
+    return snapshot
+
+
+def fetch_advisories(index: Dict[str, Dict[str, Any]], registry: str = DEFAULT_REGISTRY,
+                     timeout: int = 60) -> Dict[str, Any]:
+    """向 registry 的批量接口查询 lockfile 中所有包的漏洞（需要网络）"""
+    body = json.dumps({name: sorted(versions) for name, versions in index.items()}).encode('utf-8')
+    request = urllib.request.Request(registry.rstrip('/') + BULK_ENDPOINT, data=body, method='POST',
+                                     headers={'Content-Type': 'application/json', 'Accept': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        result = json.loads(response.read().decode('utf-8'))
+    if not isinstance(result, dict):
+        raise ValueError('批量漏洞接口返回的不是对象')
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 审计
+# ---------------------------------------------------------------------------
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def match_advisories(index: Dict[str, Dict[str, Dict[str, Any]]], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    findings = []
+    unparsed = []
+    for name, advisories in snapshot.get('advisories', {}).items():
+        installs = index.get(name)
+        if not installs:
+            continue
+        for advisory in advisories:
+            vulnerable = advisory.get('vulnerable_versions') or advisory.get('range') or ''
+            parsed = parse_range(vulnerable)
+            if parsed is None:
+                unparsed.append({'package': name, 'id': advisory.get('id'), 'range': vulnerable})
+                continue
+            for version, install in installs.items():
+                if satisfies(parse_version(version), parsed):
+                    findings.append({
+                        'package': name,
+                        'version': version,
+                        'paths': install['paths'],
+                        'dev': install['dev'],
+                        'id': advisory.get('id'),
+                        'title': advisory.get('title', ''),
+                        'severity': advisory.get('severity') or 'info',
+                        'url': advisory.get('url', ''),
+                        'vulnerable_versions': vulnerable
+                    })
+    rank = {severity: position for position, severity in enumerate(SEVERITY_ORDER)}
+    findings.sort(key=lambda f: (rank.get(f['severity'], len(rank)), f['package'], parse_version(f['version'])))
+    covered = set(snapshot.get('packages', []))
+    return {
+        'findings': findings,
+        'unparsed_ranges': unparsed,
+        'uncovered_packages': sorted(name for name in index if name not in covered)
+    }
+
+
+def audit_project(project_root: Path, snapshot_path: Path = ADVISORY_SNAPSHOT,
+                  cache_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    审计 project_root/package-lock.json
+
+    返回 lockfile / snapshot 状态、包与安装数、findings、无法解析的范围和不在快照覆盖范围内的包；
+    缺少 lockfile 或快照时 findings 为空，并在 status 中说明原因。
+    """
+    project_root = Path(project_root)
+    lockfile = project_root / LOCKFILE_NAME
+    result: Dict[str, Any] = {'status': 'ok', 'findings': [], 'unparsed_ranges': [], 'uncovered_packages': [],
+                              'packages': 0, 'installs': 0, 'fetched_at': None, 'cached': False}
+    if not lockfile.exists():
+        result['status'] = 'no_lockfile'
+        return result
+    if not snapshot_path.exists():
+        result['status'] = 'no_snapshot'
+        return result
+
+    cache_path = (cache_dir or project_root / '.code-health') / CACHE_FILE
+    cache_key = f'{ENGINE_VERSION}:{_file_hash(lockfile)}:{_file_hash(snapshot_path)}'
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == cache_key:
+            return {**cached['result'], 'cached': True}
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass
+
+    try:
+        with open(lockfile, 'r', encoding='utf-8') as f:
+            lock_data = json.load(f)
+    except ValueError as e:
+        result['status'] = f'invalid_lockfile: {e}'
+        return result
+    snapshot = load_snapshot(snapshot_path)
+    if snapshot is None:
+        result['status'] = 'invalid_snapshot'
+        return result
+
+    index = index_lockfile(lock_data)
+    result.update(match_advisories(index, snapshot))
+    result.update({'packages': len(index), 'installs': sum(len(versions) for versions in index.values()),
+                   'fetched_at': snapshot.get('fetched_at')})
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'key': cache_key, 'result': result}, f, ensure_ascii=False)
+    return result
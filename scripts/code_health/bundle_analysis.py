@@ -0,0 +1,184 @@
+"""
+Next.js 构建产物分析
+
+读取 .next 目录中的构建清单，计算：
+- 每个路由的首屏 JS（First Load JS，gzip 后）
+- Edge 函数（如 app/api/[company]/chat/route.ts）的服务端包体积
+- 体积最大的共享 chunk
+如果存在 @cloudflare/next-on-pages 的输出（.vercel/output/functions），同时统计每个函数的体积。
+"""
+
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+# 阈值（gzip 后 KB）
+FIRST_LOAD_JS_BUDGET_KB = 250
+EDGE_BUNDLE_BUDGET_KB = 1024
+LARGEST_SHARED_CHUNKS = 10
+
+CHAT_ROUTE = '/api/[company]/chat/route'
+
+RSC_MANIFEST_PATTERN = re.compile(r'__RSC_MANIFEST\[("(?:[^"\\]|\\.)*")\]\s*=\s*')
+
+
+class SizeCache:
+    """缓存文件的原始大小和 gzip 大小，多个路由共享同一 chunk 时只计算一次"""
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = base_dir
+        self._sizes: Dict[str, tuple] = {}
+
+    def get(self, rel_path: str) -> tuple:
+        if rel_path not in self._sizes:
+            path = self.base_dir / rel_path
+            try:
+                data = path.read_bytes()
+                self._sizes[rel_path] = (len(data), len(gzip.compress(data, compresslevel=6)))
+            except OSError:
+                self._sizes[rel_path] = (0, 0)
+        return self._sizes[rel_path]
+
+    def total(self, rel_paths) -> Dict[str, float]:
+        raw = gzipped = 0
+        for rel_path in rel_paths:
+            size, gz_size = self.get(rel_path)
+            raw += size
+            gzipped += gz_size
+        return {'raw_kb': round(raw / 1024, 1), 'gzip_kb': round(gzipped / 1024, 1)}
+
+
+def read_json(path: Path) -> Optional[Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def load_route_chunks(next_dir: Path) -> Dict[str, List[str]]:
+    """返回 路由 -> 客户端 JS chunk 列表（相对 .next）"""
+    routes: Dict[str, List[str]] = {}
+
+    # Webpack 构建：app-build-manifest.json
+    app_manifest = read_json(next_dir / 'app-build-manifest.json')
+    if isinstance(app_manifest, dict):
+        for route, files in app_manifest.get('pages', {}).items():
+            routes[route] = [f for f in files if f.endswith('.js')]
+
+    # Turbopack 构建：server/app/**/page_client-reference-manifest.js 中的 entryJSFiles
+    if not routes:
+        decoder = json.JSONDecoder()
+        for manifest_path in (next_dir / 'server' / 'app').rglob('*_client-reference-manifest.js'):
+            try:
+                content = manifest_path.read_text(encoding='utf-8')
+            except OSError:
+                continue
+            for match in RSC_MANIFEST_PATTERN.finditer(content):
+                try:
+                    route = json.loads(match.group(1))
+                    manifest, _ = decoder.raw_decode(content, match.end())
+                except (json.JSONDecodeError, ValueError):
+                    continue
+                chunks: List[str] = []
+                for files in manifest.get('entryJSFiles', {}).values():
+                    chunks.extend(f for f in files if f.endswith('.js') and f not in chunks)
+                routes[route] = chunks
+
+    # Pages Router 页面（如果有）
+    build_manifest = read_json(next_dir / 'build-manifest.json') or {}
+    for route, files in build_manifest.get('pages', {}).items():
+        if route in ('/_app', '/_error', '/_document'):
+            continue
+        routes.setdefault(route, [f for f in files if f.endswith('.js')])
+
+    return routes
+
+
+def load_shared_chunks(next_dir: Path) -> List[str]:
+    """所有页面都会加载的根 chunk（rootMainFiles + polyfills）"""
+    build_manifest = read_json(next_dir / 'build-manifest.json') or {}
+    shared = []
+    for key in ('rootMainFiles', 'polyfillFiles'):
+        shared.extend(f for f in build_manifest.get(key, []) if f.endswith('.js') and f not in shared)
+    return shared
+
+
+def load_edge_functions(next_dir: Path) -> Dict[str, List[str]]:
+    """返回 Edge 函数路由 -> 打包文件列表（相对 .next）"""
+    manifest = read_json(next_dir / 'server' / 'middleware-manifest.json') or {}
+    functions = {}
+    for route, info in {**manifest.get('middleware', {}), **manifest.get('functions', {})}.items():
+        files = [f for f in info.get('files', []) if not f.endswith('.map')]
+        files.extend(w['filePath'] for w in info.get('wasm', []) if w.get('filePath'))
+        functions[route] = files
+    return functions
+
+
+def load_pages_functions(project_root: Path) -> Dict[str, Dict[str, float]]:
+    """统计 next-on-pages 输出中每个 .func 目录的体积"""
+    functions_dir = project_root / '.vercel' / 'output' / 'functions'
+    if not functions_dir.exists():
+        return {}
+    result = {}
+    for func_dir in functions_dir.rglob('*.func'):
+        if not func_dir.is_dir():
+            continue
+        cache = SizeCache(func_dir)
+        files = [
+            os.path.relpath(os.path.join(dirpath, filename), func_dir)
+            for dirpath, _, filenames in os.walk(func_dir)
+            for filename in filenames
+            if not filename.endswith('.map')
+        ]
+        route = '/' + str(func_dir.relative_to(functions_dir))[:-len('.func')]
+        result[route] = cache.total(files)
+    return result
+
+
+def analyze_next_build(project_root: Path) -> Dict[str, Any]:
+    """分析 .next 构建输出"""
+    next_dir = Path(project_root) / '.next'
+    if not (next_dir / 'build-manifest.json').exists():
+        return {'status': 'skipped', 'reason': '未找到 .next 构建输出，请先运行 npm run build:next'}
+
+    cache = SizeCache(next_dir)
+    shared = load_shared_chunks(next_dir)
+    route_chunks = load_route_chunks(next_dir)
+
+    first_load: Dict[str, Dict[str, float]] = {}
+    chunk_usage: Dict[str, int] = {}
+    for route, chunks in sorted(route_chunks.items()):
+        files: Set[str] = set(shared) | set(chunks)
+        first_load[route] = cache.total(files)
+        for chunk in chunks:
+            chunk_usage[chunk] = chunk_usage.get(chunk, 0) + 1
+
+    # 共享 chunk：根 chunk 或被多个路由加载的 chunk
+    shared_candidates = set(shared) | {chunk for chunk, count in chunk_usage.items() if count > 1}
+    largest_shared = sorted(
+        ({
+            'chunk': chunk,
+            'raw_kb': round(cache.get(chunk)[0] / 1024, 1),
+            'gzip_kb': round(cache.get(chunk)[1] / 1024, 1),
+            'routes': len(route_chunks) if chunk in shared else chunk_usage[chunk]
+        } for chunk in shared_candidates),
+        key=lambda item: item['gzip_kb'],
+        reverse=True
+    )[:LARGEST_SHARED_CHUNKS]
+
+    edge_functions = {route: cache.total(files) for route, files in load_edge_functions(next_dir).items()}
+
+    build_id_path = next_dir / 'BUILD_ID'
+    return {
+        'status': 'ok',
+        'build_id': build_id_path.read_text().strip() if build_id_path.exists() else '',
+        'shared_js': cache.total(shared),
+        'first_load_js': first_load,
+        'edge_functions': edge_functions,
+        'pages_functions': load_pages_functions(Path(project_root)),
+        'largest_shared_chunks': largest_shared
+    }
@@ -0,0 +1,229 @@
+"""
+重复代码（克隆）检测
+
+对整个仓库（包括 projects/* 和 projects_backup/）的 TS/JS 源码做词法归一化：
+标识符统一为 I、数字统一为 N、字符串内容和注释去除，关键字和标点保留，
+因此只改了变量名或文案的复制代码也能识别（Type-2 克隆）。
+
+用 Rabin-Karp 滚动哈希对每个长度为 MIN_TOKENS 的 token 窗口取指纹，相同指纹的窗口按
+“对角线”（两个位置的偏移差）合并成最长的重复区域，再把相同内容的区域归并为克隆组。
+哈希和合并都是线性的；出现次数超过 MAX_BUCKET 的窗口（样板代码）不参与配对，保证整体接近线性。
+"""
+
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from .ts_source import LineIndex, strip_comments_and_strings
+
+SOURCE_EXTENSIONS = {'.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs'}
+EXCLUDED_DIRS = {'node_modules', '.next', '.git', '.vercel', '.wrangler', '__pycache__', 'coverage',
+                 '.code-health', 'dist', 'out'}
+MAX_FILE_BYTES = 512 * 1024
+
+MIN_TOKENS = 60
+MIN_LINES = 6
+MAX_BUCKET = 64
+
+HASH_BASE = 1_000_003
+HASH_MOD = (1 << 61) - 1
+
+TOKEN_PATTERN = re.compile(r'[A-Za-z_$][\w$]*|\d[\w.]*|=>|===|!==|==|!=|<=|>=|&&|\|\||\?\?|\?\.|\.\.\.|\S')
+KEYWORDS = frozenset('''
+    abstract as async await break case catch class const continue debugger default delete do else enum export
+    extends false finally for from function get if implements import in instanceof interface let new null of
+    private protected public readonly return set static super switch this throw true try type typeof undefined
+    var void while with yield
+'''.split())
+
+# 每个克隆实例: (文件序号, 起始 token, 结束 token)
+Instance = Tuple[int, int, int]
+
+
+class TokenizedFile:
+    __slots__ = ('path', 'tokens', 'lines')
+
+    def __init__(self, path: str, tokens: List[int], lines: List[int]):
+        self.path = path
+        self.tokens = tokens
+        self.lines = lines
+
+
+def iter_clone_targets(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS)
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1] not in SOURCE_EXTENSIONS or filename.endswith('.d.ts'):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.path.getsize(path) > MAX_FILE_BYTES:
+                    continue
+            except OSError:
+                continue
+            yield path
+
+
+def tokenize(content: str, vocabulary: Dict[str, int]) -> Tuple[List[int], List[int]]:
+    """返回 (归一化 token id 列表, 每个 token 所在行号)"""
+    code = strip_comments_and_strings(content)
+    index = LineIndex(code)
+    tokens: List[int] = []
+    lines: List[int] = []
+    for match in TOKEN_PATTERN.finditer(code):
+        text = match.group(0)
+        first = text[0]
+        if first.isdigit():
+            text = 'N'
+        elif (first.isalpha() or first in '_$') and text not in KEYWORDS:
+            text = 'I'
+        token_id = vocabulary.get(text)
+        if token_id is None:
+            token_id = vocabulary[text] = len(vocabulary) + 1
+        tokens.append(token_id)
+        lines.append(index.line_of(match.start()))
+    return tokens, lines
+
+
+def window_hashes(tokens: List[int], size: int) -> List[int]:
+    """Rabin-Karp：所有长度为 size 的窗口的滚动哈希"""
+    if len(tokens) < size:
+        return []
+    high = pow(HASH_BASE, size - 1, HASH_MOD)
+    value = 0
+    for token in tokens[:size]:
+        value = (value * HASH_BASE + token) % HASH_MOD
+    hashes = [value]
+    for i in range(size, len(tokens)):
+        value = ((value - tokens[i - size] * high) * HASH_BASE + tokens[i]) % HASH_MOD
+        hashes.append(value)
+    return hashes
+
+
+def find_clone_pairs(files: List[TokenizedFile], size: int = MIN_TOKENS) -> List[Tuple[Instance, Instance]]:
+    """返回最长重复区域对 ((文件a, 起点, 终点), (文件b, 起点, 终点))"""
+    buckets: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for file_index, tokenized in enumerate(files):
+        for pos, value in enumerate(window_hashes(tokenized.tokens, size)):
+            buckets[value].append((file_index, pos))
+
+    # (文件a, 文件b, 对角线) -> 匹配窗口在文件a中的起点
+    diagonals: Dict[Tuple[int, int, int], List[int]] = defaultdict(list)
+    for locations in buckets.values():
+        if len(locations) < 2 or len(locations) > MAX_BUCKET:
+            continue
+        for i, (file_a, pos_a) in enumerate(locations):
+            window = files[file_a].tokens[pos_a:pos_a + size]
+            for file_b, pos_b in locations[i + 1:]:
+                # 同一文件内相互重叠的窗口不算克隆
+                if file_a == file_b and pos_b - pos_a < size:
+                    continue
+                # 排除哈希碰撞
+                if files[file_b].tokens[pos_b:pos_b + size] != window:
+                    continue
+                diagonals[(file_a, file_b, pos_b - pos_a)].append(pos_a)
+
+    pairs = []
+    for (file_a, file_b, offset), starts in diagonals.items():
+        starts.sort()
+        run_start = previous = starts[0]
+        for pos in starts[1:] + [None]:
+            if pos is not None and pos == previous + 1:
+                previous = pos
+                continue
+            end = previous + size
+            if file_a == file_b:
+                # 同一文件内的重复区域不能与自身的副本重叠
+                end = min(end, run_start + offset)
+            if end - run_start >= size:
+                pairs.append(((file_a, run_start, end), (file_b, run_start + offset, end + offset)))
+            if pos is not None:
+                run_start = previous = pos
+    return pairs
+
+
+def group_clones(files: List[TokenizedFile], pairs: List[Tuple[Instance, Instance]]) -> List[List[Instance]]:
+    """按区域内容把重复区域对归并为克隆组，并去掉被更大克隆组完全覆盖的组"""
+    groups: Dict[Tuple[int, ...], Set[Instance]] = defaultdict(set)
+    for first, second in pairs:
+        key = tuple(files[first[0]].tokens[first[1]:first[2]])
+        groups[key].add(first)
+        groups[key].add(second)
+
+    def without_overlaps(instances: Set[Instance]) -> List[Instance]:
+        # 重复结构在同一文件中连续出现时，不同配对得到的区域会相互重叠，只保留不重叠的实例
+        result: List[Instance] = []
+        for instance in sorted(instances):
+            if result and result[-1][0] == instance[0] and instance[1] < result[-1][2]:
+                continue
+            result.append(instance)
+        return result
+
+    candidates = (without_overlaps(instances) for instances in groups.values())
+    ordered = sorted((instances for instances in candidates if len(instances) > 1),
+                     key=lambda instances: -(instances[0][2] - instances[0][1]) * len(instances))
+    kept: List[List[Instance]] = []
+    covered: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for instances in ordered:
+        if all(any(start >= s and end <= e for s, e in covered[file_index])
+               for file_index, start, end in instances):
+            continue
+        kept.append(instances)
+        for file_index, start, end in instances:
+            covered[file_index].append((start, end))
+    return kept
+
+
+def detect_clones(root: Path, min_tokens: int = MIN_TOKENS, min_lines: int = MIN_LINES) -> Dict[str, Any]:
+    """扫描整个仓库，返回克隆组和可共享的行数"""
+    root = Path(root)
+    vocabulary: Dict[str, int] = {}
+    files: List[TokenizedFile] = []
+    total_lines = 0
+    for path in iter_clone_targets(root):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+        total_lines += content.count('\n') + 1
+        tokens, lines = tokenize(content, vocabulary)
+        files.append(TokenizedFile(os.path.relpath(path, root), tokens, lines))
+
+    groups = []
+    # 每个文件中可被共享代码替代的行（每组保留第一个实例，其余实例计为重复）
+    duplicated_lines: Dict[int, Set[int]] = defaultdict(set)
+    for instances in group_clones(files, find_clone_pairs(files, min_tokens)):
+        described = []
+        for file_index, start, end in instances:
+            tokenized = files[file_index]
+            described.append({
+                'file': tokenized.path,
+                'start_line': tokenized.lines[start],
+                'end_line': tokenized.lines[end - 1]
+            })
+        lines = described[0]['end_line'] - described[0]['start_line'] + 1
+        if lines < min_lines:
+            continue
+        for file_index, start, end in instances[1:]:
+            tokenized = files[file_index]
+            duplicated_lines[file_index].update(range(tokenized.lines[start], tokenized.lines[end - 1] + 1))
+        groups.append({
+            'instances': described,
+            'tokens': instances[0][2] - instances[0][1],
+            'lines': lines,
+            'duplicated_lines': lines * (len(instances) - 1)
+        })
+
+    groups.sort(key=lambda group: (-group['duplicated_lines'], group['instances'][0]['file']))
+    shareable = sum(len(lines) for lines in duplicated_lines.values())
+    return {
+        'files_scanned': len(files),
+        'total_lines': total_lines,
+        'tokens': sum(len(f.tokens) for f in files),
+        'groups': groups,
+        'shareable_lines': shareable,
+        'duplication_pct': round(shareable / total_lines * 100, 1) if total_lines else 0
+    }
@@ -0,0 +1,170 @@
+"""
+测试覆盖率报告的解析与合并
+
+Jest 按 --shard=i/N 并行运行时，每个分片各自写出 lcov.info / clover.xml 和 --json 测试结果。
+这里逐行（lcov）或用 iterparse（clover）流式解析，按源文件合并各分片的行、分支命中数，
+得到每个文件的行/分支覆盖率；同时从测试结果中找出最慢的测试文件。
+"""
+
+import json
+import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FileCoverage:
+    __slots__ = ('lines', 'branches')
+
+    def __init__(self):
+        # 行号 -> 命中次数
+        self.lines: Dict[int, int] = {}
+        # (行号, 块, 分支) -> 命中次数
+        self.branches: Dict[Tuple[int, str, str], int] = {}
+
+    def add_line(self, line: int, hits: int):
+        self.lines[line] = self.lines.get(line, 0) + hits
+
+    def add_branch(self, key: Tuple[int, str, str], hits: int):
+        self.branches[key] = self.branches.get(key, 0) + hits
+
+    def summary(self) -> Dict[str, Any]:
+        lines_covered = sum(1 for hits in self.lines.values() if hits > 0)
+        branches_covered = sum(1 for hits in self.branches.values() if hits > 0)
+        return {
+            'lines_total': len(self.lines),
+            'lines_covered': lines_covered,
+            'line_pct': percentage(lines_covered, len(self.lines)),
+            'branches_total': len(self.branches),
+            'branches_covered': branches_covered,
+            'branch_pct': percentage(branches_covered, len(self.branches))
+        }
+
+
+def percentage(covered: int, total: int) -> float:
+    # 没有可执行行/分支的文件视为完全覆盖（与 istanbul 一致）
+    return round(covered / total * 100, 2) if total else 100.0
+
+
+class CoverageMerger:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.files: Dict[str, FileCoverage] = {}
+
+    def file(self, path: str) -> FileCoverage:
+        if os.path.isabs(path):
+            relative = os.path.relpath(path, self.root)
+            if not relative.startswith('..'):
+                path = relative
+        path = path.replace(os.sep, '/')
+        coverage = self.files.get(path)
+        if coverage is None:
+            coverage = self.files[path] = FileCoverage()
+        return coverage
+
+    def add_lcov(self, lcov_path: Path):
+        """逐行解析 lcov.info（SF / DA / BRDA / end_of_record）"""
+        current: Optional[FileCoverage] = None
+        with open(lcov_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('DA:') and current is not None:
+                    fields = line[3:].rstrip().split(',')
+                    if len(fields) >= 2 and fields[0].isdigit():
+                        current.add_line(int(fields[0]), int(fields[1]) if fields[1].isdigit() else 0)
+                elif line.startswith('BRDA:') and current is not None:
+                    fields = line[5:].rstrip().split(',')
+                    if len(fields) == 4 and fields[0].isdigit():
+                        taken = int(fields[3]) if fields[3].isdigit() else 0
+                        current.add_branch((int(fields[0]), fields[1], fields[2]), taken)
+                elif line.startswith('SF:'):
+                    current = self.file(line[3:].rstrip('\r\n'))
+                elif line.startswith('end_of_record'):
+                    current = None
+
+    def add_clover(self, clover_path: Path):
+        """用 iterparse 流式解析 clover.xml，处理完的元素立即释放"""
+        current: Optional[FileCoverage] = None
+        for event, element in ET.iterparse(str(clover_path), events=('start', 'end')):
+            if element.tag == 'file':
+                if event == 'start':
+                    current = self.file(element.get('path') or element.get('name') or '')
+                else:
+                    current = None
+                    element.clear()
+            elif element.tag == 'line' and event == 'end' and current is not None:
+                num = int(element.get('num', '0'))
+                current.add_line(num, int(element.get('count', '0')))
+                if element.get('type') == 'cond':
+                    # clover 只给出条件的真/假命中次数
+                    current.add_branch((num, '0', 'true'), int(element.get('truecount', '0')))
+                    current.add_branch((num, '0', 'false'), int(element.get('falsecount', '0')))
+                element.clear()
+
+    def add_shard(self, directory: Path) -> Optional[str]:
+        """合并一个分片的覆盖率输出，优先使用 lcov（分支信息更完整）；返回使用的格式"""
+        lcov_path = Path(directory) / 'lcov.info'
+        clover_path = Path(directory) / 'clover.xml'
+        if lcov_path.exists():
+            self.add_lcov(lcov_path)
+            return 'lcov'
+        if clover_path.exists():
+            try:
+                self.add_clover(clover_path)
+            except ET.ParseError:
+                return None
+            return 'clover'
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        files = {path: coverage.summary() for path, coverage in sorted(self.files.items())}
+        lines_total = sum(f['lines_total'] for f in files.values())
+        lines_covered = sum(f['lines_covered'] for f in files.values())
+        branches_total = sum(f['branches_total'] for f in files.values())
+        branches_covered = sum(f['branches_covered'] for f in files.values())
+        return {
+            'files': files,
+            'totals': {
+                'files': len(files),
+                'lines_total': lines_total,
+                'lines_covered': lines_covered,
+                'line_pct': percentage(lines_covered, lines_total),
+                'branches_total': branches_total,
+                'branches_covered': branches_covered,
+                'branch_pct': percentage(branches_covered, branches_total)
+            }
+        }
+
+
+def load_test_results(results_path: Path, root: Path) -> Dict[str, Any]:
+    """读取 jest --json --outputFile 的结果，返回测试计数和每个测试文件的耗时"""
+    try:
+        with open(results_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    files = []
+    for result in data.get('testResults', []):
+        perf = result.get('perfStats') or {}
+        if 'runtime' in perf:
+            duration = perf['runtime']
+        else:
+            duration = (perf.get('end') or result.get('endTime') or 0) - (perf.get('start') or result.get('startTime') or 0)
+        name = result.get('name', '')
+        if os.path.isabs(name):
+            name = os.path.relpath(name, root)
+        files.append({
+            'file': name.replace(os.sep, '/'),
+            'duration_ms': max(0, int(duration)),
+            'status': result.get('status', 'unknown'),
+            'tests': len(result.get('assertionResults', []))
+        })
+    return {
+        'total': data.get('numTotalTests', 0),
+        'passed': data.get('numPassedTests', 0),
+        'failed': data.get('numFailedTests', 0),
+        'files': files
+    }
+
+
+def slowest_test_files(files: List[Dict[str, Any]], limit: int = 10) -> List[Dict[str, Any]]:
+    return sorted(files, key=lambda f: -f['duration_ms'])[:limit]
@@ -0,0 +1,386 @@
+"""
+常驻检查服务（daemon 模式）
+
+每次调用 npx 都要解析包、启动 Node、冷启动编译器。daemon 模式保持以下进程常驻：
+- tsc --watch：增量类型检查，daemon 缓存最近一轮编译的诊断
+- ESLint worker（eslint_worker.cjs）：配置和插件只加载一次，按需 lint 改动的文件
+
+客户端通过本地 Unix socket 发送按行分隔的 JSON 请求，daemon 从热状态直接返回结果，
+编辑器保存或 pre-commit 时的检查可以在几百毫秒内完成。
+
+请求格式：
+    {"command": "check", "checks": ["typescript", "eslint"], "files": ["lib/knowledge.ts"]}
+    {"command": "status"}
+    {"command": "shutdown"}
+"""
+
+import json
+import os
+import queue
+import re
+import shutil
+import signal
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CHECKS = ('typescript', 'eslint')
+# 只在请求指定了文件时运行的纯 Python 检查
+FILE_CHECKS = ('hotpath', 'security')
+LINT_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs')
+# tsc --watch 只会因这些文件的改动重新编译；其他文件不参与新鲜度判断，否则会空等到超时
+TSC_EXTENSIONS = ('.ts', '.tsx', '.mts', '.cts')
+
+# 请求的文件比最近一轮 tsc 编译更新时，最多等待这么久让 tsc --watch 完成新一轮编译
+FRESH_RESULT_TIMEOUT = 30
+ESLINT_TIMEOUT = 120
+CLIENT_TIMEOUT = 150
+
+TSC_CYCLE_START = re.compile(r'Starting compilation in watch mode|File change detected')
+TSC_CYCLE_END = re.compile(r'Found (\d+) errors?')
+
+
+def socket_path(project_root: Path) -> Path:
+    return Path(project_root) / '.code-health' / 'daemon.sock'
+
+
+def node_bin(project_root: Path, name: str) -> List[str]:
+    """优先使用 node_modules/.bin 下的可执行文件，跳过 npx 的包解析"""
+    local = Path(project_root) / 'node_modules' / '.bin' / name
+    if local.exists():
+        return [str(local)]
+    return ['npx', name]
+
+
+class TscWatcher:
+    """保持 tsc --watch 运行，缓存最近一轮编译的诊断"""
+
+    def __init__(self, project_root: Path, parse_line: Callable[[str], Dict[str, Any]]):
+        self.project_root = Path(project_root)
+        self.parse_line = parse_line
+        self.process: Optional[subprocess.Popen] = None
+        self.condition = threading.Condition()
+        self.compiling = False
+        self.generation = 0
+        self.cycle_started = 0.0
+        self.diagnostics: List[Dict[str, Any]] = []
+        self._pending: List[Dict[str, Any]] = []
+
+    def start(self):
+        cmd = node_bin(self.project_root, 'tsc') + ['--noEmit', '--pretty', 'false', '--watch', '--preserveWatchOutput']
+        self.process = subprocess.Popen(
+            cmd, cwd=self.project_root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL, text=True, bufsize=1
+        )
+        threading.Thread(target=self._read_output, name='tsc-watch', daemon=True).start()
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            if TSC_CYCLE_START.search(line):
+                with self.condition:
+                    self.compiling = True
+                    self.cycle_started = time.time()
+                    self._pending = []
+            elif TSC_CYCLE_END.search(line):
+                with self.condition:
+                    self.diagnostics = self._pending
+                    self._pending = []
+                    self.compiling = False
+                    self.generation += 1
+                    self.condition.notify_all()
+            else:
+                finding = self.parse_line(line)
+                if finding:
+                    self._pending.append(finding)
+        with self.condition:
+            self.compiling = False
+            self.condition.notify_all()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def snapshot(self, since: float = 0.0, timeout: float = FRESH_RESULT_TIMEOUT) -> Dict[str, Any]:
+        """
+        返回最近一轮完整编译的诊断
+
+        since 是请求中文件的最新修改时间：如果最近一轮编译开始于它之前，等待 tsc 检测到改动并完成新一轮编译。
+        """
+        with self.condition:
+            fresh = self.condition.wait_for(
+                lambda: not self.alive or (self.generation > 0 and not self.compiling and self.cycle_started >= since),
+                timeout=timeout
+            )
+            return {
+                'diagnostics': list(self.diagnostics),
+                'generation': self.generation,
+                'stale': not fresh or self.cycle_started < since
+            }
+
+    def stop(self):
+        if self.alive:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class EslintWorker:
+    """与常驻的 Node ESLint 进程通信；进程退出后在下次请求时自动重启"""
+
+    def __init__(self, project_root: Path):
+        self.project_root = Path(project_root)
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+        self._responses: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        self._next_id = 0
+
+    def start(self, timeout: float = ESLINT_TIMEOUT):
+        worker = Path(__file__).with_name('eslint_worker.cjs')
+        self.process = subprocess.Popen(
+            [shutil.which('node') or 'node', str(worker)], cwd=self.project_root,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read_output, args=(self.process, self._responses),
+                         name='eslint-worker', daemon=True).start()
+        ready = self._responses.get(timeout=timeout)
+        if not ready.get('ready'):
+            raise RuntimeError(ready.get('error', 'ESLint worker 启动失败'))
+
+    @staticmethod
+    def _read_output(process: subprocess.Popen, responses: 'queue.Queue[Dict[str, Any]]'):
+        for line in process.stdout:
+            try:
+                responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        responses.put({'error': 'ESLint worker 已退出', 'fatal': True})
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def lint(self, files: List[str], timeout: float = ESLINT_TIMEOUT) -> List[Dict[str, Any]]:
+        with self.lock:
+            if not self.alive:
+                self.start()
+            self._next_id += 1
+            request_id = self._next_id
+            self.process.stdin.write(json.dumps({'id': request_id, 'files': files}) + '\n')
+            self.process.stdin.flush()
+            deadline = time.monotonic() + timeout
+            while True:
+                response = self._responses.get(timeout=max(0.0, deadline - time.monotonic()))
+                if response.get('fatal'):
+                    raise RuntimeError(response.get('error', 'ESLint worker 已退出'))
+                if response.get('id') != request_id:
+                    # 之前超时请求的迟到响应
+                    continue
+                if 'error' in response:
+                    raise RuntimeError(response['error'])
+                return response['results']
+
+    def stop(self):
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class HealthDaemon:
+    def __init__(self, project_root: Path, parse_tsc_line: Callable[[str], Dict[str, Any]],
+                 relative_path: Callable[[str], str]):
+        self.project_root = Path(project_root)
+        self.relative_path = relative_path
+        self.socket_path = socket_path(self.project_root)
+        self.tsc = TscWatcher(self.project_root, parse_tsc_line)
+        self.eslint = EslintWorker(self.project_root)
+        self.started_at = time.time()
+        self.requests = 0
+        self.server: Optional[socketserver.UnixStreamServer] = None
+
+    def _file_mtime(self, files: List[str]) -> float:
+        """tsc 编译的文件（含 tsconfig）中最新的修改时间；没有这类文件时为 0，不等待新一轮编译"""
+        latest = 0.0
+        for rel_path in files:
+            name = Path(rel_path).name
+            if not (rel_path.endswith(TSC_EXTENSIONS) or (name.startswith('tsconfig') and name.endswith('.json'))):
+                continue
+            try:
+                latest = max(latest, (self.project_root / rel_path).stat().st_mtime)
+            except OSError:
+                continue
+        return latest
+
+    def check(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        files = [self.relative_path(str((self.project_root / f).resolve())) for f in request.get('files') or []]
+        checks = request.get('checks') or list(DEFAULT_CHECKS) + (list(FILE_CHECKS) if files else [])
+        file_set = set(files)
+        findings: List[Dict[str, Any]] = []
+        stale = False
+        errors: Dict[str, str] = {}
+
+        if 'typescript' in checks:
+            snapshot = self.tsc.snapshot(since=self._file_mtime(files))
+            stale = snapshot['stale']
+            for finding in snapshot['diagnostics']:
+                rel_path = self.relative_path(finding.get('file', ''))
+                # 类型错误可能出现在依赖被修改文件的其他文件中，因此不按文件过滤，只把相关文件排在前面
+                findings.append({'check_name': 'typescript', 'rule': '', 'line': 0, 'col': 0, **finding,
+                                 'file': rel_path, 'related': not file_set or rel_path in file_set})
+
+        if 'eslint' in checks:
+            targets = [f for f in files if f.endswith(LINT_EXTENSIONS)] if files else []
+            if not files or targets:
+                try:
+                    for result in self.eslint.lint(targets):
+                        rel_path = self.relative_path(result['filePath'])
+                        for message in result['messages']:
+                            findings.append({
+                                'check_name': 'eslint', 'file': rel_path, 'line': message.get('line') or 0,
+                                'col': message.get('column') or 0, 'rule': message.get('ruleId') or '',
+                                'severity': 'error' if message.get('severity') == 2 else 'warning',
+                                'message': message.get('message', ''), 'related': True
+                            })
+                except (RuntimeError, queue.Empty) as e:
+                    errors['eslint'] = str(e) or 'timeout'
+
+        if files and 'hotpath' in checks:
+            from .hotpath import analyze_source
+            for rel_path in files:
+                content = self._read(rel_path)
+                if content is None or not rel_path.endswith(LINT_EXTENSIONS):
+                    continue
+                for finding in analyze_source(content):
+                    findings.append({'check_name': 'hotpath', 'file': rel_path, 'col': 0, 'severity': 'info',
+                                     'related': True, **finding})
+
+        if files and 'security' in checks:
+            from .secret_scan import scan_content
+            for rel_path in files:
+                content = self._read(rel_path)
+                if content is None:
+                    continue
+                for issue in scan_content(content, rel_path):
+                    findings.append({'check_name': 'security', 'file': rel_path, 'line': issue['line'], 'col': 0,
+                                     'rule': issue['rule'], 'severity': 'error', 'message': issue['type'],
+                                     'related': True})
+
+        findings.sort(key=lambda f: (not f['related'], f['file'], f['line']))
+        return {
+            'ok': not errors,
+            'errors': errors,
+            'stale': stale,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'findings': findings
+        }
+
+    def _read(self, rel_path: str) -> Optional[str]:
+        try:
+            return (self.project_root / rel_path).read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ok': True,
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'requests': self.requests,
+            'tsc': {'alive': self.tsc.alive, 'generation': self.tsc.generation, 'compiling': self.tsc.compiling},
+            'eslint': {'alive': self.eslint.alive}
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests += 1
+        command = request.get('command', 'check')
+        if command == 'status':
+            return self.status()
+        if command == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        if command == 'check':
+            return self.check(request)
+        return {'ok': False, 'errors': {'request': f'未知命令: {command}'}}
+
+    def serve_forever(self):
+        if is_running(self.project_root):
+            raise RuntimeError(f'daemon 已在运行: {self.socket_path}')
+        # 上次异常退出遗留的 socket 文件
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.tsc.start()
+        try:
+            self.eslint.start()
+        except (RuntimeError, queue.Empty, OSError) as e:
+            # ESLint worker 启动失败时仍然提供类型检查，下次 eslint 请求时重试
+            print(f"⚠️  ESLint worker 启动失败: {e}")
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    response = daemon.handle(json.loads(line))
+                except (json.JSONDecodeError, TypeError, AttributeError) as e:
+                    response = {'ok': False, 'errors': {'request': str(e)}}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+
+        self.server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        self.server.daemon_threads = True
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.shutdown, daemon=True).start())
+        print(f"🟢 daemon 已启动 (pid {os.getpid()})，socket: {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.tsc.stop()
+            self.eslint.stop()
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+            print("🔴 daemon 已停止")
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+
+
+def send_request(project_root: Path, request: Dict[str, Any], timeout: float = CLIENT_TIMEOUT) -> Dict[str, Any]:
+    """向 daemon 发送一个请求并等待响应；daemon 未运行时抛出 ConnectionError"""
+    path = socket_path(project_root)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        try:
+            client.connect(str(path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ConnectionError(f'daemon 未运行 ({path})') from e
+        client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if chunk.endswith(b'\n'):
+                break
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def is_running(project_root: Path) -> bool:
+    try:
+        return bool(send_request(project_root, {'command': 'status'}, timeout=2).get('ok'))
+    except (ConnectionError, OSError, ValueError):
+        return False
@@ -0,0 +1,71 @@
+// ESLint 常驻进程（由 code_health/daemon.py 启动）
+//
+// 从 stdin 读取按行分隔的 JSON 请求 {"id": 1, "files": ["lib/a.ts"]}，
+// 向 stdout 写入按行分隔的 JSON 响应 {"id": 1, "results": [...]}。
+// 配置、解析器和插件只加载一次，之后每次请求只需要 lint 改动的文件。
+
+const readline = require('readline')
+
+const DEFAULT_TARGETS = ['app', 'lib', 'components', 'types']
+
+async function createESLint() {
+  // 从项目目录解析 eslint，使用项目自己安装的版本
+  const eslintModule = require(require.resolve('eslint', { paths: [process.cwd()] }))
+  const ESLint = eslintModule.loadESLint ? await eslintModule.loadESLint() : eslintModule.ESLint
+  return new ESLint({
+    cwd: process.cwd(),
+    cache: true,
+    cacheLocation: '.code-health/eslintcache',
+    errorOnUnmatchedPattern: false,
+  })
+}
+
+function send(message) {
+  process.stdout.write(JSON.stringify(message) + '\n')
+}
+
+async function main() {
+  const eslint = await createESLint()
+  let queue = Promise.resolve()
+
+  const rl = readline.createInterface({ input: process.stdin })
+  rl.on('line', (line) => {
+    // 请求串行处理，避免并发 lint 争用同一个缓存文件
+    queue = queue.then(async () => {
+      let request
+      try {
+        request = JSON.parse(line)
+      } catch (error) {
+        send({ id: null, error: `invalid request: ${error.message}` })
+        return
+      }
+      try {
+        const files = request.files && request.files.length ? request.files : DEFAULT_TARGETS
+        const results = await eslint.lintFiles(files)
+        send({
+          id: request.id,
+          results: results.map((result) => ({
+            filePath: result.filePath,
+            messages: result.messages.map((m) => ({
+              line: m.line,
+              column: m.column,
+              severity: m.severity,
+              message: m.message,
+              ruleId: m.ruleId,
+            })),
+          })),
+        })
+      } catch (error) {
+        send({ id: request.id, error: error.message })
+      }
+    })
+  })
+  rl.on('close', () => process.exit(0))
+
+  send({ ready: true })
+}
+
+main().catch((error) => {
+  send({ id: null, error: error.message, fatal: true })
+  process.exit(1)
+})
@@ -0,0 +1,206 @@
+"""
+检查指标的历史时间序列存储与回归检测
+
+每次运行的指标（复杂度、代码统计、错误数、检查耗时、包体积等）按 git commit 追加到
+.code-health/history.sqlite；trend 子命令用滚动基线的稳健 z 分数（中位数 + MAD）识别显著回归。
+"""
+
+import sqlite3
+import statistics
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  commit_sha TEXT NOT NULL,
+  dirty INTEGER NOT NULL DEFAULT 0,
+  branch TEXT,
+  timestamp TEXT NOT NULL,
+  UNIQUE(commit_sha, dirty)
+);
+
+CREATE TABLE IF NOT EXISTS metrics (
+  run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  value REAL NOT NULL,
+  PRIMARY KEY (run_id, name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_metrics_name ON metrics(name, run_id);
+"""
+
+# 这些结果分区中的数值会被记录为指标
+METRIC_SECTIONS = ('typescript', 'eslint', 'eslint_complexity', 'dead_code', 'dependency_health',
+                   'dependencies', 'security', 'performance', 'hotpath', 'import_graph', 'duplication', 'knowledge',
+                   'durations')
+# 数值变大不代表变差的指标（只记录，不参与回归判断）
+NEUTRAL_METRICS = ('code_quality.total_files_analyzed', 'code_quality.code_statistics.total_comment_lines',
+                   'code_quality.code_statistics.total_blank_lines', 'dependencies.total_dependencies',
+                   'dependencies.total_dev_dependencies', 'security.files_scanned', 'hotpath.files_scanned',
+                   'hotpath.api_entries', 'hotpath.reachable_files', 'import_graph.files', 'import_graph.edges',
+                   'import_graph.type_only_edges', 'duplication.files_scanned', 'duplication.total_lines',
+                   'knowledge.tenants', 'knowledge.files', 'knowledge.entries')
+
+MIN_BASELINE_RUNS = 5
+# MAD 到标准差的换算系数（正态分布）
+MAD_SCALE = 1.4826
+
+
+def flatten_metrics(results: Dict[str, Any]) -> Dict[str, float]:
+    """把检查结果中的数值字段展开为 section.key 形式的指标"""
+    metrics: Dict[str, float] = {}
+
+    def walk(prefix: str, value: Any):
+        if isinstance(value, bool):
+            return
+        if isinstance(value, (int, float)):
+            metrics[prefix] = float(value)
+        elif isinstance(value, dict):
+            for key, child in value.items():
+                # 外部工具的运行信息（退出码、输出字节数）不是指标，耗时已记录在 durations 中
+                if key == 'run':
+                    continue
+                walk(f'{prefix}.{key}', child)
+
+    for section in METRIC_SECTIONS:
+        walk(section, results.get(section, {}))
+
+    code_quality = results.get('code_quality', {})
+    for key in ('total_files_analyzed', 'average_complexity', 'large_files_count', 'complex_files_count'):
+        walk(f'code_quality.{key}', code_quality.get(key))
+    walk('code_quality.code_statistics', code_quality.get('code_statistics', {}))
+    walk('code_quality.unused_imports', code_quality.get('unused_imports', {}))
+    return metrics
+
+
+class MetricsHistory:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+
+    def record(self, commit_sha: str, dirty: bool, branch: Optional[str], timestamp: str,
+               metrics: Dict[str, float]) -> int:
+        """追加一次运行；同一 commit（及相同 dirty 状态）重复运行时覆盖旧记录"""
+        self.conn.execute('DELETE FROM runs WHERE commit_sha = ? AND dirty = ?', (commit_sha, int(dirty)))
+        cursor = self.conn.execute(
+            'INSERT INTO runs (commit_sha, dirty, branch, timestamp) VALUES (?, ?, ?, ?)',
+            (commit_sha, int(dirty), branch, timestamp)
+        )
+        run_id = cursor.lastrowid
+        self.conn.executemany(
+            'INSERT INTO metrics (run_id, name, value) VALUES (?, ?, ?)',
+            [(run_id, name, value) for name, value in metrics.items()]
+        )
+        self.conn.commit()
+        return run_id
+
+    def merge(self, commit_sha: str, dirty: bool, branch: Optional[str], timestamp: str,
+              metrics: Dict[str, float]) -> int:
+        """把额外的指标（如 tsc-profile）合并到同一 commit 的运行记录中，不覆盖其他指标"""
+        row = self.conn.execute(
+            'SELECT id FROM runs WHERE commit_sha = ? AND dirty = ?', (commit_sha, int(dirty))
+        ).fetchone()
+        if row:
+            run_id = row['id']
+        else:
+            run_id = self.conn.execute(
+                'INSERT INTO runs (commit_sha, dirty, branch, timestamp) VALUES (?, ?, ?, ?)',
+                (commit_sha, int(dirty), branch, timestamp)
+            ).lastrowid
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO metrics (run_id, name, value) VALUES (?, ?, ?)',
+            [(run_id, name, value) for name, value in metrics.items()]
+        )
+        self.conn.commit()
+        return run_id
+
+    def latest_with_prefix(self, prefix: str) -> Dict[str, float]:
+        """返回最近一次包含该前缀指标的运行中，所有该前缀的指标"""
+        row = self.conn.execute(
+            'SELECT r.id FROM runs r JOIN metrics m ON m.run_id = r.id WHERE m.name LIKE ? '
+            'ORDER BY r.timestamp DESC, r.id DESC LIMIT 1', (prefix + '%',)
+        ).fetchone()
+        if not row:
+            return {}
+        return {r['name']: r['value'] for r in self.conn.execute(
+            'SELECT name, value FROM metrics WHERE run_id = ? AND name LIKE ?', (row['id'], prefix + '%')
+        )}
+
+    def runs(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = 'SELECT * FROM runs ORDER BY timestamp DESC, id DESC'
+        params: List[Any] = []
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def series(self, name: str, limit: Optional[int] = None) -> List[float]:
+        """返回某个指标按时间从旧到新的序列"""
+        sql = ('SELECT m.value FROM metrics m JOIN runs r ON r.id = m.run_id '
+               'WHERE m.name = ? ORDER BY r.timestamp DESC, r.id DESC')
+        params: List[Any] = [name]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [row[0] for row in self.conn.execute(sql, params)][::-1]
+
+    def latest_metrics(self, offset: int = 0) -> Dict[str, float]:
+        """返回倒数第 offset+1 次运行的全部指标"""
+        row = self.conn.execute(
+            'SELECT id FROM runs ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?', (offset,)
+        ).fetchone()
+        if not row:
+            return {}
+        return {r['name']: r['value'] for r in self.conn.execute(
+            'SELECT name, value FROM metrics WHERE run_id = ?', (row['id'],)
+        )}
+
+    def detect_regressions(self, window: int = 20, threshold: float = 3.0, min_change: float = 0.05,
+                           prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        将最近一次运行与之前 window 次运行的滚动基线比较
+
+        稳健 z 分数 = (当前值 - 基线中位数) / (MAD * 1.4826)；
+        同时要求相对变化超过 min_change，避免对极小的波动报警。
+        """
+        latest = self.latest_metrics()
+        regressions = []
+        for name, current in sorted(latest.items()):
+            if prefix and not name.startswith(prefix):
+                continue
+            if name in NEUTRAL_METRICS:
+                continue
+            baseline = self.series(name, limit=window + 1)[:-1]
+            if len(baseline) < MIN_BASELINE_RUNS:
+                continue
+
+            median = statistics.median(baseline)
+            mad = statistics.median(abs(v - median) for v in baseline) * MAD_SCALE
+            delta = current - median
+            if delta <= 0:
+                continue
+            relative = delta / abs(median) if median else float('inf')
+            if relative < min_change:
+                continue
+            # 基线完全稳定时，任何超过 min_change 的上升都视为显著
+            z_score = delta / mad if mad > 0 else float('inf')
+            if z_score < threshold:
+                continue
+
+            regressions.append({
+                'metric': name,
+                'current': current,
+                'baseline_median': median,
+                'baseline_runs': len(baseline),
+                'change_pct': round(relative * 100, 1) if relative != float('inf') else None,
+                'z_score': round(z_score, 2) if z_score != float('inf') else None
+            })
+        return regressions
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,234 @@
+"""
+运行时热路径反模式检测
+
+基于去除注释/字符串后的源码做结构匹配（不依赖 TypeScript 编译器），识别：
+- await-in-loop: 循环体内串行 await（for await 和循环内定义的回调函数除外）
+- json-in-loop: 循环或数组遍历回调中的 JSON.parse / JSON.stringify
+- sort-to-evict: 为淘汰少量条目而对整个集合排序（O(n log n)，应使用 O(n) 扫描或有序结构）
+- clone-in-handler: 请求处理函数中同步深拷贝大对象（structuredClone、JSON.parse(JSON.stringify())、cloneDeep）
+
+结果按文件是否能从 API 路由到达排序：能到达的问题会在每个请求中执行，优先级更高。
+"""
+
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .import_graph import ImportGraph, iter_source_files
+from .ts_source import LineIndex, block_after, find_matching, skip_whitespace, strip_comments_and_strings
+
+# 规则 -> (基础权重, 说明)
+HOTPATH_RULES = {
+    'await-in-loop': (4, '循环内串行 await，可改为 Promise.all 并发执行'),
+    'json-in-loop': (3, '循环内 JSON.parse/JSON.stringify，可移到循环外或缓存结果'),
+    'sort-to-evict': (3, '为淘汰条目对整个集合排序，可改为线性扫描最小值或按插入顺序淘汰'),
+    'clone-in-handler': (4, '请求处理路径中同步深拷贝对象，会阻塞事件循环'),
+}
+REACHABLE_BONUS = 5
+
+HANDLER_NAMES = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS', 'middleware'}
+EVICTION_NAME_PATTERN = re.compile(r'evict|enforce|prune|trim|cleanup|purge|shrink', re.IGNORECASE)
+# sort 之后这么多行内取前几个/最后几个元素，视为用排序做淘汰
+EVICTION_LOOKAHEAD_LINES = 5
+
+LOOP_PATTERN = re.compile(r'\b(for|while)\s*(await\b\s*)?\(')
+DO_PATTERN = re.compile(r'\bdo\s*\{')
+ITERATION_CALL_PATTERN = re.compile(r'\.(?:forEach|map|flatMap|filter|reduce|some|every|find)\s*\(')
+AWAIT_PATTERN = re.compile(r'\bawait\b')
+JSON_CALL_PATTERN = re.compile(r'\bJSON\s*\.\s*(parse|stringify)\s*\(')
+SORT_PATTERN = re.compile(r'\.(?:sort|toSorted)\s*\(')
+EVICT_ACCESS_PATTERN = re.compile(
+    r'\.slice\(\s*(?:0\s*,|-)|\[\s*0\s*\]|\.shift\(\s*\)|\.pop\(\s*\)|\.splice\(\s*0\s*,'
+)
+CLONE_PATTERN = re.compile(
+    r'\bstructuredClone\s*\(|\bJSON\s*\.\s*parse\s*\(\s*JSON\s*\.\s*stringify\s*\(|\bcloneDeep\s*\('
+)
+
+FUNCTION_PATTERN = re.compile(r'\bfunction\b\s*\*?\s*([A-Za-z_$][\w$]*)?\s*(?:<[^>(]*>)?\s*\(')
+VARIABLE_FUNCTION_PATTERN = re.compile(
+    r'\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=;]*)?=\s*(?:async\s+)?(?:function\b[^(]*)?\('
+)
+METHOD_PATTERN = re.compile(
+    r'^[ \t]*(?:(?:public|private|protected|static|async|readonly|override)\s+)*([A-Za-z_$][\w$]*)\s*(?:<[^>(]*>)?\s*\(',
+    re.MULTILINE
+)
+ARROW_PATTERN = re.compile(r'=>')
+NOT_METHOD_NAMES = {'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'with', 'await', 'typeof', 'new'}
+
+Range = Tuple[int, int]
+
+
+def _body_after_signature(code: str, close_paren: int) -> Optional[Range]:
+    """参数列表之后跳过返回类型注解，返回函数体范围"""
+    pos = skip_whitespace(code, close_paren + 1)
+    if code.startswith('=>', pos):
+        start, end = block_after(code, pos + 2)
+        return start, end
+    if pos < len(code) and code[pos] == ':':
+        brace = code.find('{', pos)
+        arrow = code.find('=>', pos)
+        if arrow != -1 and (brace == -1 or arrow < brace):
+            start, end = block_after(code, arrow + 2)
+            return start, end
+        pos = brace
+    if pos != -1 and pos < len(code) and code[pos] == '{':
+        start, end = block_after(code, pos)
+        return start, end
+    return None
+
+
+def function_ranges(code: str) -> List[Tuple[str, int, int]]:
+    """返回 (函数名, 函数体开始, 函数体结束)；匿名函数的名字为空字符串"""
+    functions: Dict[int, Tuple[str, int, int]] = {}
+
+    def add(name: str, open_paren: int):
+        close = find_matching(code, open_paren)
+        if close is None:
+            return
+        body = _body_after_signature(code, close)
+        if body and body[0] not in functions:
+            functions[body[0]] = (name, body[0], body[1])
+
+    for match in VARIABLE_FUNCTION_PATTERN.finditer(code):
+        add(match.group(1), match.end() - 1)
+    for match in FUNCTION_PATTERN.finditer(code):
+        add(match.group(1) or '', match.end() - 1)
+    for match in METHOD_PATTERN.finditer(code):
+        if match.group(1) not in NOT_METHOD_NAMES:
+            add(match.group(1), match.end() - 1)
+    # 其余箭头函数（回调）
+    for match in ARROW_PATTERN.finditer(code):
+        start, end = block_after(code, match.end())
+        if start not in functions:
+            functions[start] = ('', start, end)
+    return sorted(functions.values(), key=lambda item: item[1])
+
+
+def enclosing_function(functions: List[Tuple[str, int, int]], pos: int) -> Optional[Tuple[str, int, int]]:
+    """返回包含 pos 的最内层函数"""
+    best = None
+    for function in functions:
+        if function[1] > pos:
+            break
+        if function[1] <= pos < function[2] and (best is None or function[1] >= best[1]):
+            best = function
+    return best
+
+
+def loop_bodies(code: str, include_iteration_calls: bool) -> List[Range]:
+    """for/while/do 循环体（以及可选的 forEach/map 等回调参数）的范围"""
+    bodies: List[Range] = []
+    for match in LOOP_PATTERN.finditer(code):
+        if match.group(2):
+            # for await (... of stream) 是逐个消费异步迭代器，不是反模式
+            continue
+        close = find_matching(code, match.end() - 1)
+        if close is None:
+            continue
+        start, end = block_after(code, close + 1)
+        if end > start:
+            bodies.append((start, end))
+    for match in DO_PATTERN.finditer(code):
+        start, end = block_after(code, match.end() - 1)
+        bodies.append((start, end))
+    if include_iteration_calls:
+        for match in ITERATION_CALL_PATTERN.finditer(code):
+            close = find_matching(code, match.end() - 1)
+            if close is not None:
+                bodies.append((match.end(), close))
+    return bodies
+
+
+def _in_nested_function(functions: List[Tuple[str, int, int]], loop: Range, pos: int) -> bool:
+    return any(loop[0] <= start and start <= pos < end for _, start, end in functions)
+
+
+def analyze_source(content: str, is_entry: bool = False) -> List[Dict[str, Any]]:
+    """分析单个文件，返回 {'rule', 'line', 'message'} 列表"""
+    code = strip_comments_and_strings(content)
+    index = LineIndex(content)
+    functions = function_ranges(code)
+    findings: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+    def report(rule: str, pos: int, detail: str):
+        line = index.line_of(pos)
+        findings.setdefault((rule, line), {'rule': rule, 'line': line, 'message': detail})
+
+    for loop in loop_bodies(code, include_iteration_calls=False):
+        for match in AWAIT_PATTERN.finditer(code, loop[0], loop[1]):
+            if not _in_nested_function(functions, loop, match.start()):
+                report('await-in-loop', match.start(), '循环体内 await，每次迭代串行等待')
+
+    for start, end in loop_bodies(code, include_iteration_calls=True):
+        for match in JSON_CALL_PATTERN.finditer(code, start, end):
+            report('json-in-loop', match.start(), f'循环内调用 JSON.{match.group(1)}')
+
+    for match in SORT_PATTERN.finditer(code):
+        close = find_matching(code, match.end() - 1)
+        if close is None:
+            continue
+        function = enclosing_function(functions, match.start())
+        name = function[0] if function else ''
+        lookahead_end = close
+        for _ in range(EVICTION_LOOKAHEAD_LINES):
+            next_newline = code.find('\n', lookahead_end + 1)
+            if next_newline == -1:
+                lookahead_end = len(code)
+                break
+            lookahead_end = next_newline
+        if function:
+            lookahead_end = min(lookahead_end, function[2])
+        if EVICT_ACCESS_PATTERN.search(code, close + 1, lookahead_end) or EVICTION_NAME_PATTERN.search(name):
+            report('sort-to-evict', match.start(), f'{name or "匿名函数"} 中对整个集合排序后只取部分元素')
+
+    handlers = [f for f in functions if f[0] in HANDLER_NAMES] if is_entry else []
+    for match in CLONE_PATTERN.finditer(code):
+        in_handler = any(start <= match.start() < end for _, start, end in handlers)
+        if in_handler or not is_entry:
+            report('clone-in-handler', match.start(), '同步深拷贝：' + code[match.start():match.end()].strip('( '))
+
+    return sorted(findings.values(), key=lambda item: item['line'])
+
+
+def scan_hotpaths(project_root: Path) -> Dict[str, Any]:
+    """
+    扫描整个源码树
+
+    返回的每条问题带有 reachable（能否从 API 路由到达）和 score（规则权重 + 可达加分），按 score 降序排列。
+    非入口文件中的深拷贝只有在可从 API 路由到达时才上报。
+    """
+    project_root = Path(project_root)
+    graph = ImportGraph(project_root).build()
+    entries = graph.api_entries()
+    reachable: Set[str] = graph.reachable_from(entries)
+    entry_set = set(entries)
+
+    issues: List[Dict[str, Any]] = []
+    files_scanned = 0
+    for path in iter_source_files(project_root):
+        rel_path = graph.relative(path)
+        try:
+            content = path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue
+        files_scanned += 1
+        is_reachable = rel_path in reachable
+        for finding in analyze_source(content, is_entry=rel_path in entry_set):
+            if finding['rule'] == 'clone-in-handler' and not is_reachable:
+                continue
+            weight, hint = HOTPATH_RULES[finding['rule']]
+            issues.append({
+                **finding,
+                'file': rel_path,
+                'reachable': is_reachable,
+                'score': weight + (REACHABLE_BONUS if is_reachable else 0),
+                'hint': hint
+            })
+
+    issues.sort(key=lambda issue: (-issue['score'], issue['file'], issue['line']))
+    return {
+        'files_scanned': files_scanned,
+        'api_entries': len(entries),
+        'reachable_files': len(reachable),
+        'issues': issues
+    }
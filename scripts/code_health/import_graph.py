@@ -0,0 +1,395 @@
+"""
+TypeScript 模块导入图
+
+解析 import / export ... from / 动态 import() / require()，按 tsconfig.json 的 paths 别名和相对路径
+把模块说明符解析为仓库内文件，建立内存中的邻接表，用于：
+- 判断文件能否从 API 路由入口（app/api/**/route.ts、middleware.ts）到达
+- 每个路由入口的传递闭包（文件数、源码字节数、引入的第三方包）
+- Tarjan 强连通分量检测循环依赖
+- 最重的导入边：删除该边后入口闭包减少的字节数
+
+只有运行时导入参与闭包和循环计算，import type / export type 不会进入打包产物。
+"""
+
+import json
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .ts_source import strip_comments_and_strings
+
+SOURCE_DIRS = ('app', 'lib', 'components', 'types')
+ROOT_SOURCES = ('middleware.ts',)
+SOURCE_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs')
+EXCLUDED_DIRS = {'node_modules', '.next', '__tests__'}
+ENTRY_STEMS = ('route', 'page')
+
+# tsconfig.json 缺失或没有 paths 时使用的默认别名
+PATH_ALIASES = {'@/*': ['']}
+
+IMPORT_FROM_PATTERN = re.compile(r'''\bimport\s+(type\s+)?(?:[\w*{}\s,$]+?\s+from\s+)?(["'])([^"']+)\2''')
+EXPORT_FROM_PATTERN = re.compile(r'''\bexport\s+(type\s+)?[\w*{}\s,$]*?\s+from\s+(["'])([^"']+)\2''')
+DYNAMIC_IMPORT_PATTERN = re.compile(r'''\b(?:import|require)\s*\(\s*(["'])([^"']+)\1\s*\)''')
+
+# 计算“删除该边后闭包减少多少”时，闭包内最多考察的边数（每条边一次 BFS）
+MAX_EDGES_FOR_EXCLUSIVE_COST = 3000
+
+
+def iter_source_files(project_root: Path) -> Iterable[Path]:
+    for name in ROOT_SOURCES:
+        path = project_root / name
+        if path.exists():
+            yield path
+    for dir_name in SOURCE_DIRS:
+        base = project_root / dir_name
+        if not base.exists():
+            continue
+        for path in base.rglob('*'):
+            if path.suffix not in SOURCE_EXTENSIONS or not path.is_file():
+                continue
+            if EXCLUDED_DIRS.intersection(path.relative_to(project_root).parts):
+                continue
+            yield path
+
+
+def parse_imports(content: str) -> List[Tuple[str, bool]]:
+    """返回文件中所有导入的 (模块说明符, 是否仅类型导入)"""
+    # 用去掉注释和字符串内容后的文本定位导入语句，再从原文取出说明符
+    code = strip_comments_and_strings(content)
+    imports = []
+    for pattern in (IMPORT_FROM_PATTERN, EXPORT_FROM_PATTERN):
+        for match in pattern.finditer(code):
+            start, end = match.span(3)
+            imports.append((content[start:end], bool(match.group(1))))
+    for match in DYNAMIC_IMPORT_PATTERN.finditer(code):
+        start, end = match.span(2)
+        imports.append((content[start:end], False))
+    return [(specifier, type_only) for specifier, type_only in imports if specifier.strip()]
+
+
+def package_name(specifier: str) -> str:
+    """'@scope/pkg/sub' -> '@scope/pkg'，'pkg/sub' -> 'pkg'"""
+    parts = specifier.split('/')
+    if specifier.startswith('@') and len(parts) > 1:
+        return '/'.join(parts[:2])
+    return parts[0]
+
+
+def load_jsonc(text: str) -> Any:
+    """解析允许注释和末尾逗号的 JSON（tsconfig.json 的格式）"""
+    out = []
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == '"':
+            j = i + 1
+            while j < length and text[j] != '"':
+                j += 2 if text[j] == '\\' else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = length if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+        else:
+            out.append(char)
+            i += 1
+    return json.loads(re.sub(r',(\s*[}\]])', r'\1', ''.join(out)))
+
+
+def load_path_aliases(project_root: Path, config_name: str = 'tsconfig.json') -> Dict[str, List[str]]:
+    """
+    读取 compilerOptions.paths（沿 extends 链向上合并），返回 模式 -> 目标前缀列表（相对项目根目录）
+
+    "@/*": ["./*"] -> {'@/*': ['']}；以 * 结尾的模式按前缀匹配，否则按完整说明符匹配。
+    """
+    config_path = Path(project_root) / config_name
+    seen: Set[Path] = set()
+    paths: Dict[str, List[str]] = {}
+    base_url: Optional[Path] = None
+
+    while config_path and config_path.exists() and config_path not in seen:
+        seen.add(config_path)
+        try:
+            config = load_jsonc(config_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            break
+        options = config.get('compilerOptions', {})
+        # 子配置中的设置优先，extends 中的只补充缺失项
+        if base_url is None and options.get('baseUrl'):
+            base_url = (config_path.parent / options['baseUrl']).resolve()
+        for pattern, targets in options.get('paths', {}).items():
+            if pattern not in paths:
+                paths[pattern] = [(config_path.parent, target) for target in targets]
+        extends = config.get('extends')
+        if not isinstance(extends, str) or not extends.startswith('.'):
+            break
+        config_path = (config_path.parent / extends).resolve()
+        if config_path.suffix != '.json':
+            config_path = config_path.with_suffix('.json')
+
+    if not paths:
+        return dict(PATH_ALIASES)
+
+    root = Path(project_root).resolve()
+    aliases: Dict[str, List[str]] = {}
+    for pattern, targets in paths.items():
+        resolved_targets = []
+        for config_dir, target in targets:
+            # paths 相对 baseUrl，没有 baseUrl 时相对声明它的 tsconfig
+            base = base_url or config_dir.resolve()
+            absolute = (base / target.rstrip('*')).resolve() if target.rstrip('*') else base
+            try:
+                relative = absolute.relative_to(root).as_posix()
+            except ValueError:
+                continue
+            relative = '' if relative == '.' else relative
+            if target.endswith('*') and relative:
+                relative += '/'
+            resolved_targets.append(relative)
+        aliases[pattern] = resolved_targets
+    return aliases
+
+
+class ImportGraph:
+    """文件级导入图，节点为相对项目根目录的 posix 路径"""
+
+    def __init__(self, project_root: Path, aliases: Optional[Dict[str, List[str]]] = None):
+        self.project_root = Path(project_root)
+        self.aliases = load_path_aliases(self.project_root) if aliases is None else aliases
+        # 按前缀长度降序匹配，更具体的别名优先
+        self._alias_order = sorted(self.aliases, key=len, reverse=True)
+        self.edges: Dict[str, Set[str]] = {}
+        self.type_edges: Dict[str, Set[str]] = {}
+        self.packages: Dict[str, Set[str]] = {}
+        self.sizes: Dict[str, int] = {}
+        self._files: Set[str] = set()
+
+    def relative(self, path: Path) -> str:
+        return path.relative_to(self.project_root).as_posix()
+
+    @property
+    def files(self) -> Set[str]:
+        return self._files
+
+    def build(self) -> 'ImportGraph':
+        sources = list(iter_source_files(self.project_root))
+        self._files = {self.relative(path) for path in sources}
+        for path in sources:
+            importer = self.relative(path)
+            self.edges[importer] = set()
+            self.type_edges[importer] = set()
+            self.packages[importer] = set()
+            try:
+                content = path.read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError):
+                continue
+            self.sizes[importer] = len(content.encode('utf-8'))
+            for specifier, type_only in parse_imports(content):
+                resolved = self.resolve(importer, specifier)
+                if resolved:
+                    (self.type_edges if type_only else self.edges)[importer].add(resolved)
+                elif not type_only and not specifier.startswith(('.', '/')) and not self._is_alias(specifier):
+                    self.packages[importer].add(package_name(specifier))
+        # 同时存在类型导入和运行时导入时以运行时为准
+        for importer, targets in self.type_edges.items():
+            targets -= self.edges[importer]
+        return self
+
+    def _is_alias(self, specifier: str) -> bool:
+        return any(specifier.startswith(pattern[:-1]) if pattern.endswith('*') else specifier == pattern
+                   for pattern in self._alias_order)
+
+    def _candidate(self, base: str) -> Optional[str]:
+        """按 TypeScript 的规则补全扩展名和 index 文件"""
+        base = base.rstrip('/')
+        if base in self._files:
+            return base
+        for ext in SOURCE_EXTENSIONS:
+            if base + ext in self._files:
+                return base + ext
+        # 编译后的 .js 扩展名指向 .ts 源文件
+        stem, dot, ext = base.rpartition('.')
+        if dot and '.' + ext in ('.js', '.jsx', '.mjs'):
+            for source_ext in ('.ts', '.tsx'):
+                if stem + source_ext in self._files:
+                    return stem + source_ext
+        for ext in SOURCE_EXTENSIONS:
+            if f'{base}/index{ext}' in self._files:
+                return f'{base}/index{ext}'
+        return None
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        parts: List[str] = []
+        for part in path.split('/'):
+            if part == '..':
+                if parts:
+                    parts.pop()
+            elif part not in ('', '.'):
+                parts.append(part)
+        return '/'.join(parts)
+
+    def resolve(self, importer: str, specifier: str) -> Optional[str]:
+        """把模块说明符解析为仓库内文件；第三方包返回 None"""
+        if specifier.startswith('.'):
+            parent = Path(importer).parent.as_posix()
+            return self._candidate(self._normalize(f'{parent}/{specifier}'))
+        for pattern in self._alias_order:
+            if pattern.endswith('*'):
+                if not specifier.startswith(pattern[:-1]):
+                    continue
+                rest = specifier[len(pattern) - 1:]
+            elif specifier != pattern:
+                continue
+            else:
+                rest = ''
+            for target in self.aliases[pattern]:
+                resolved = self._candidate(self._normalize(target + rest))
+                if resolved:
+                    return resolved
+        return None
+
+    def api_entries(self) -> List[str]:
+        """API 路由和中间件入口"""
+        entries = [f for f in self._files if f.startswith('app/api/') and Path(f).stem == 'route']
+        entries.extend(f for f in self._files if f in ROOT_SOURCES)
+        return sorted(entries)
+
+    def route_entries(self) -> List[str]:
+        """所有路由入口：app 下的 route / page 文件和中间件"""
+        entries = [f for f in self._files if f.startswith('app/') and Path(f).stem in ENTRY_STEMS]
+        entries.extend(f for f in self._files if f in ROOT_SOURCES)
+        return sorted(entries)
+
+    def reachable_from(self, entries: Iterable[str], skip_edge: Optional[Tuple[str, str]] = None) -> Set[str]:
+        """广度优先遍历，返回从入口出发可到达的所有文件（包括入口本身）"""
+        seen: Set[str] = set()
+        queue = deque(e for e in entries if e in self._files)
+        seen.update(queue)
+        while queue:
+            node = queue.popleft()
+            for target in self.edges.get(node, ()):
+                if target not in seen and (node, target) != skip_edge:
+                    seen.add(target)
+                    queue.append(target)
+        return seen
+
+    def closure_cost(self, files: Iterable[str]) -> int:
+        return sum(self.sizes.get(f, 0) for f in files)
+
+    def closure_summary(self, entry: str) -> Dict[str, Any]:
+        closure = self.reachable_from([entry])
+        packages: Set[str] = set()
+        for node in closure:
+            packages |= self.packages.get(node, set())
+        return {
+            'files': len(closure),
+            'bytes': self.closure_cost(closure),
+            'packages': sorted(packages)
+        }
+
+    def heaviest_edges(self, entry: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        入口闭包内删除后能让闭包减少最多字节的导入边
+
+        排除代价 = 闭包字节数 - 去掉该边后的闭包字节数，只计算该边独占带入的文件。
+        """
+        closure = self.reachable_from([entry])
+        total = self.closure_cost(closure)
+        edges = [(source, target) for source in closure for target in self.edges.get(source, ())]
+        results = []
+        if len(edges) <= MAX_EDGES_FOR_EXCLUSIVE_COST:
+            for edge in edges:
+                remaining = self.reachable_from([entry], skip_edge=edge)
+                cost = total - self.closure_cost(remaining)
+                if cost > 0:
+                    results.append({'from': edge[0], 'to': edge[1], 'bytes': cost,
+                                    'files': len(closure) - len(remaining)})
+        else:
+            # 图太大时退化为目标文件自身闭包的大小
+            for source, target in edges:
+                sub_closure = self.reachable_from([target])
+                results.append({'from': source, 'to': target, 'bytes': self.closure_cost(sub_closure),
+                                'files': len(sub_closure)})
+        results.sort(key=lambda item: (-item['bytes'], item['from'], item['to']))
+        return results[:limit]
+
+    def strongly_connected_components(self) -> List[List[str]]:
+        """Tarjan 算法（迭代实现，避免深层递归），返回所有 SCC"""
+        index_of: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        counter = 0
+
+        for root in sorted(self._files):
+            if root in index_of:
+                continue
+            work = [(root, iter(sorted(self.edges.get(root, ()))))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                advanced = False
+                for child in children:
+                    if child not in index_of:
+                        index_of[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self.edges.get(child, ())))))
+                        advanced = True
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[child])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+        return components
+
+    def cycles(self) -> List[List[str]]:
+        """运行时导入形成的循环（多于一个文件的 SCC 或自引用）"""
+        return sorted(
+            (component for component in self.strongly_connected_components()
+             if len(component) > 1 or component[0] in self.edges.get(component[0], ())),
+            key=lambda component: (-len(component), component)
+        )
+
+    def cycle_path(self, component: List[str]) -> List[str]:
+        """在 SCC 内找一条从第一个文件出发回到自身的最短路径，便于阅读"""
+        members = set(component)
+        start = component[0]
+        parents: Dict[str, Optional[str]] = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for target in sorted(self.edges.get(node, ())):
+                if target == start:
+                    path = [node]
+                    while parents[path[-1]] is not None:
+                        path.append(parents[path[-1]])
+                    return path[::-1] + [start]
+                if target in members and target not in parents:
+                    parents[target] = node
+                    queue.append(target)
+        return component
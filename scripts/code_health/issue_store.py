@@ -0,0 +1,177 @@
+"""
+基于 SQLite 的问题存储
+
+所有检查的发现都以流式方式写入磁盘上的 SQLite 数据库（按 file / rule / severity 建索引），
+Markdown 报告和总结通过查询生成，不再截断或在内存中保存完整结果。
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  timestamp TEXT NOT NULL,
+  label TEXT
+);
+
+CREATE TABLE IF NOT EXISTS findings (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+  check_name TEXT NOT NULL,
+  file TEXT,
+  line INTEGER DEFAULT 0,
+  col INTEGER DEFAULT 0,
+  rule TEXT,
+  severity TEXT NOT NULL DEFAULT 'warning',
+  message TEXT,
+  extra TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_findings_run_check ON findings(run_id, check_name);
+CREATE INDEX IF NOT EXISTS idx_findings_run_file ON findings(run_id, file);
+CREATE INDEX IF NOT EXISTS idx_findings_run_rule ON findings(run_id, rule);
+CREATE INDEX IF NOT EXISTS idx_findings_run_severity ON findings(run_id, severity);
+"""
+
+FINDING_COLUMNS = ('check_name', 'file', 'line', 'col', 'rule', 'severity', 'message', 'extra')
+
+# 缓冲区达到该行数时批量写入
+FLUSH_EVERY = 500
+# 保留最近的运行次数
+KEEP_RUNS = 20
+
+
+class IssueStore:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self.run_id: Optional[int] = None
+        self._buffer: List[tuple] = []
+
+    def start_run(self, timestamp: str, label: Optional[str] = None) -> int:
+        """创建一次新的运行记录，并清理过旧的运行"""
+        cursor = self.conn.execute('INSERT INTO runs (timestamp, label) VALUES (?, ?)', (timestamp, label))
+        self.run_id = cursor.lastrowid
+        self.conn.execute(
+            'DELETE FROM runs WHERE id NOT IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?)',
+            (KEEP_RUNS,)
+        )
+        self.conn.commit()
+        return self.run_id
+
+    def use_latest_run(self) -> Optional[int]:
+        """切换到最近一次运行（用于只读查询）"""
+        row = self.conn.execute('SELECT id FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+        self.run_id = row['id'] if row else None
+        return self.run_id
+
+    def add(self, check_name: str, file: str = '', line: int = 0, col: int = 0, rule: str = '',
+            severity: str = 'warning', message: str = '', extra: Optional[Dict[str, Any]] = None):
+        """记录一条发现（缓冲写入）"""
+        self._buffer.append((
+            self.run_id, check_name, file, line or 0, col or 0, rule or '', severity, message,
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        ))
+        if len(self._buffer) >= FLUSH_EVERY:
+            self.flush()
+
+    def add_many(self, check_name: str, findings: Iterable[Dict[str, Any]]):
+        for finding in findings:
+            finding = dict(finding)
+            extra = {k: finding.pop(k) for k in list(finding) if k not in FINDING_COLUMNS}
+            self.add(check_name, extra=extra or None, **{k: v for k, v in finding.items() if k != 'check_name'})
+
+    def flush(self):
+        if not self._buffer:
+            return
+        self.conn.executemany(
+            'INSERT INTO findings (run_id, check_name, file, line, col, rule, severity, message, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            self._buffer
+        )
+        self.conn.commit()
+        self._buffer = []
+
+    def clear_check(self, check_name: str):
+        """删除当前运行中某个检查的全部发现（检查重跑时使用）"""
+        self.flush()
+        self.conn.execute('DELETE FROM findings WHERE run_id = ? AND check_name = ?', (self.run_id, check_name))
+        self.conn.commit()
+
+    def _where(self, check_name: Optional[str], severity: Optional[str], rule: Optional[str],
+               rules: Optional[Iterable[str]], file: Optional[str], message_like: Optional[Iterable[str]]):
+        clauses = ['run_id = ?']
+        params: List[Any] = [self.run_id]
+        if check_name:
+            clauses.append('check_name = ?')
+            params.append(check_name)
+        if severity:
+            clauses.append('severity = ?')
+            params.append(severity)
+        if rule:
+            clauses.append('rule = ?')
+            params.append(rule)
+        if rules:
+            rules = list(rules)
+            clauses.append(f"rule IN ({','.join('?' * len(rules))})")
+            params.extend(rules)
+        if file:
+            clauses.append('file LIKE ?')
+            params.append(f'%{file}%')
+        if message_like:
+            patterns = list(message_like)
+            clauses.append('(' + ' OR '.join('message LIKE ?' for _ in patterns) + ')')
+            params.extend(f'%{p}%' for p in patterns)
+        return ' AND '.join(clauses), params
+
+    def count(self, check_name: Optional[str] = None, severity: Optional[str] = None, rule: Optional[str] = None,
+              rules: Optional[Iterable[str]] = None, file: Optional[str] = None,
+              message_like: Optional[Iterable[str]] = None) -> int:
+        self.flush()
+        where, params = self._where(check_name, severity, rule, rules, file, message_like)
+        return self.conn.execute(f'SELECT COUNT(*) FROM findings WHERE {where}', params).fetchone()[0]
+
+    def query(self, check_name: Optional[str] = None, severity: Optional[str] = None, rule: Optional[str] = None,
+              rules: Optional[Iterable[str]] = None, file: Optional[str] = None,
+              message_like: Optional[Iterable[str]] = None, limit: Optional[int] = None,
+              order_by: str = 'id') -> List[Dict[str, Any]]:
+        """查询当前运行的发现，返回字典列表"""
+        self.flush()
+        where, params = self._where(check_name, severity, rule, rules, file, message_like)
+        sql = f'SELECT * FROM findings WHERE {where} ORDER BY {order_by}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [self._row_to_dict(row) for row in self.conn.execute(sql, params)]
+
+    def counts_by(self, column: str, check_name: Optional[str] = None, limit: Optional[int] = None) -> List[tuple]:
+        """按列（file / rule / severity）分组计数，按数量降序"""
+        if column not in ('file', 'rule', 'severity', 'check_name'):
+            raise ValueError(f'不支持的分组列: {column}')
+        self.flush()
+        where, params = self._where(check_name, None, None, None, None, None)
+        sql = f'SELECT {column}, COUNT(*) AS n FROM findings WHERE {where} GROUP BY {column} ORDER BY n DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [(row[0], row[1]) for row in self.conn.execute(sql, params)]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        finding = {key: row[key] for key in row.keys() if key not in ('extra', 'run_id')}
+        if row['extra']:
+            finding.update(json.loads(row['extra']))
+        return finding
+
+    def close(self):
+        self.flush()
+        self.conn.close()
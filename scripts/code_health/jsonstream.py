@@ -0,0 +1,147 @@
+"""
+顶层 JSON 数组的增量解析
+
+tsc --generateTrace 的 trace.json / types.json、ESLint -f json 的输出都可能有几十到几百 MB，
+一次 json.load 会把整个文档和所有对象同时放进内存。这里按块读取，逐个产出数组元素，
+内存占用只与单个元素的大小有关。
+"""
+
+import json
+from typing import Any, Iterator, List, TextIO
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = ' \t\r\n'
+# 被截断的合法 JSON 只会在末尾附近报错（最长的截断字面量如 "-Infinit"、"\\u12"）或报字符串未结束
+INCOMPLETE_TAIL = 16
+# 单个元素超过这么多字符仍未解析完成时视为格式错误，避免缓冲区无限增长
+MAX_PENDING_CHARS = 64 * 1024 * 1024
+
+
+class JsonArrayStream:
+    """
+    可以分块喂入文本的顶层数组解析器
+
+    用法：
+        stream = JsonArrayStream()
+        for chunk in chunks:
+            for item in stream.feed(chunk):
+                ...
+        stream.close()  # 检查文档是否完整
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        # 已丢弃的前缀长度，用于报告错误在整个文档中的位置
+        self._offset = 0
+        self._started = False
+        # 遇到格式错误的元素时先返回它之前已完整的元素，错误在下一次 feed/close 时抛出
+        self._error = None
+        self.finished = False
+
+    @property
+    def error(self):
+        return self._error
+
+    def _skip(self, chars: str):
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in chars:
+            self._pos += 1
+
+    def _incomplete(self, error: json.JSONDecodeError) -> bool:
+        """解析错误是否只是因为元素还没有读完"""
+        return error.msg.startswith('Unterminated string') or error.pos >= len(self._buffer) - INCOMPLETE_TAIL
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        追加一段文本，返回其中已经完整的数组元素
+
+        元素格式错误（而不只是不完整）时抛出 ValueError，之后的输入不再解析。
+        """
+        if self._error:
+            raise self._error
+        if self.finished:
+            return []
+        # 丢弃已消费的前缀，避免缓冲区无限增长
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        items = []
+
+        if not self._started:
+            self._skip(WHITESPACE)
+            if self._pos >= len(self._buffer):
+                return items
+            if self._buffer[self._pos] != '[':
+                raise ValueError(f'期望 JSON 数组，实际为 {self._buffer[self._pos]!r}')
+            self._pos += 1
+            self._started = True
+
+        while True:
+            # 跳过空白和元素之间的逗号（tsc 的 trace.json 允许末尾多余的逗号）
+            self._skip(WHITESPACE + ',')
+            if self._pos >= len(self._buffer):
+                break
+            if self._buffer[self._pos] == ']':
+                self._pos += 1
+                self.finished = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if not self._incomplete(e):
+                    self._error = ValueError(f'JSON 数组元素格式错误（字符位置 {self._offset + e.pos}）: {e.msg}')
+                elif len(self._buffer) - self._pos > MAX_PENDING_CHARS:
+                    self._error = ValueError(f'字符位置 {self._offset + self._pos} 处的数组元素超过 '
+                                             f'{MAX_PENDING_CHARS} 个字符仍未结束')
+                if self._error and not items:
+                    raise self._error
+                # 元素不完整，等待更多输入（或先返回出错位置之前的元素）
+                break
+            # 数字在块边界被截断时 raw_decode 也会“成功”（如 "2." 解析为 2），需要确认其后紧跟分隔符
+            if isinstance(item, (int, float)) and not isinstance(item, bool):
+                if end >= len(self._buffer) or self._buffer[end] not in WHITESPACE + ',]':
+                    break
+            items.append(item)
+            self._pos = end
+        return items
+
+    def close(self):
+        """输入结束时调用：数组没有完整结束时抛出 ValueError"""
+        if self._error:
+            raise self._error
+        if self.finished:
+            return
+        # 已经不会有更多输入：剩余内容在末尾之前就无法解析的是格式错误，而不是截断
+        self._skip(WHITESPACE + ',')
+        if self._pos < len(self._buffer):
+            try:
+                self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if not e.msg.startswith('Unterminated string') and e.pos < len(self._buffer):
+                    self._error = ValueError(f'JSON 数组元素格式错误（字符位置 {self._offset + e.pos}）: {e.msg}')
+                    raise self._error from e
+        raise ValueError('JSON 数组不完整')
+
+
+def iter_json_array(fp: TextIO, chunk_size: int = CHUNK_SIZE, strict: bool = False) -> Iterator[Any]:
+    """
+    从文件对象逐个读取顶层数组元素
+
+    strict=False 时容忍被截断的文件（例如 tsc 被超时终止时写了一半的 trace），返回已经完整的元素；
+    元素格式错误时无论 strict 与否都抛出 ValueError。
+    """
+    stream = JsonArrayStream()
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield from stream.feed(chunk)
+        if stream.finished:
+            return
+    try:
+        stream.close()
+    except ValueError:
+        # 非 strict 时只容忍截断，格式错误照常抛出
+        if strict or stream.error:
+            raise
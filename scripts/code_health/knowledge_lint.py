@@ -0,0 +1,209 @@
+"""
+知识库检查
+
+遍历 projects/*/knowledge/ 下的 JSON，对所有 FAQ 条目（含 question 字段的对象）的 id、问题文本
+和关键词建立哈希索引，一次线性扫描即可完成以下检查：
+- 同一租户内重复的 id / 重复的问题
+- next_best_actions 指向不存在的问题
+- 同一关键词出现在多个分类（FAQ 分类或 ai_config 意图）中，匹配结果取决于顺序
+- _manifest.json 与实际文件不一致（列出但不存在 / 存在但未列出）
+"""
+
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+MANIFEST_NAME = '_manifest.json'
+# 比较问题文本时忽略的标点和空白
+QUESTION_NOISE = re.compile(r'[\s?？!！。.,，、~～]+')
+
+
+def normalize_question(text: str) -> str:
+    return QUESTION_NOISE.sub('', unicodedata.normalize('NFKC', text)).lower()
+
+
+def normalize_keyword(text: str) -> str:
+    return unicodedata.normalize('NFKC', text).strip().lower()
+
+
+def iter_knowledge_dirs(root: Path) -> Iterator[Tuple[str, Path]]:
+    """返回 (租户目录名, 知识库目录)"""
+    projects_dir = Path(root) / 'projects'
+    for tenant_dir in sorted(projects_dir.iterdir()):
+        knowledge_dir = tenant_dir / 'knowledge'
+        if tenant_dir.is_dir() and knowledge_dir.is_dir():
+            yield tenant_dir.name, knowledge_dir
+
+
+def manifest_files(manifest: Any) -> Optional[List[str]]:
+    """清单既可以是文件名数组，也可以是 {"files": [...]}"""
+    if isinstance(manifest, list):
+        files = manifest
+    elif isinstance(manifest, dict) and isinstance(manifest.get('files'), list):
+        files = manifest['files']
+    else:
+        return None
+    # 文件项可能是字符串，也可能是带 name 字段的对象
+    return [entry if isinstance(entry, str) else entry.get('name', '') for entry in files
+            if isinstance(entry, (str, dict))]
+
+
+def iter_faq_entries(data: Any, category: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """深度优先找出所有 FAQ 条目及其分类（条目的 category 字段，或 categories 下的键）"""
+    stack: List[Tuple[Any, Optional[str], bool]] = [(data, category, False)]
+    while stack:
+        node, current, under_categories = stack.pop()
+        if isinstance(node, dict):
+            if isinstance(node.get('question'), str):
+                yield node, node.get('category') or current
+                continue
+            for key, child in reversed(list(node.items())):
+                if key.startswith('_'):
+                    continue
+                stack.append((child, key if under_categories else current, key == 'categories'))
+        elif isinstance(node, list):
+            for child in reversed(node):
+                stack.append((child, current, False))
+
+
+class KnowledgeLinter:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.findings: List[Dict[str, Any]] = []
+        self.entries = 0
+        self.files = 0
+        self.tenants = 0
+
+    def report(self, file: Path, rule: str, severity: str, message: str, **extra):
+        self.findings.append({
+            'file': file.relative_to(self.root).as_posix() if isinstance(file, Path) else file,
+            'rule': rule,
+            'severity': severity,
+            'message': message,
+            **extra
+        })
+
+    def load(self, path: Path) -> Any:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            self.report(path, 'invalid-json', 'error', str(e))
+            return None
+
+    def check_manifest(self, knowledge_dir: Path, data_files: Set[str]):
+        manifest_path = knowledge_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            self.report(knowledge_dir, 'missing-manifest', 'warning', f'缺少 {MANIFEST_NAME}，加载器会回退到默认文件名')
+            return
+        manifest = self.load(manifest_path)
+        if manifest is None:
+            return
+        listed = manifest_files(manifest)
+        if listed is None:
+            self.report(manifest_path, 'invalid-manifest', 'error', '清单应为文件名数组或包含 files 数组的对象')
+            return
+        listed_set = set()
+        for name in listed:
+            if name in listed_set:
+                self.report(manifest_path, 'manifest-duplicate', 'warning', f'{name} 在清单中重复出现')
+            listed_set.add(name)
+            if name not in data_files:
+                self.report(manifest_path, 'manifest-missing-file', 'error', f'清单列出的 {name} 不存在')
+        for name in sorted(data_files - listed_set):
+            self.report(knowledge_dir / name, 'file-not-in-manifest', 'warning', f'{name} 未列入 {MANIFEST_NAME}，不会被加载')
+
+    def lint_tenant(self, knowledge_dir: Path):
+        data_files = {path.name for path in knowledge_dir.glob('*.json') if path.name != MANIFEST_NAME}
+        self.check_manifest(knowledge_dir, data_files)
+
+        # 同一租户内的索引：id / 规范化问题 -> 首次出现的位置
+        ids: Dict[str, str] = {}
+        questions: Dict[str, str] = {}
+        # 关键词 -> 分类 -> 首次出现的文件
+        keyword_categories: Dict[str, Dict[str, str]] = defaultdict(dict)
+        # (文件, 条目 id, 目标问题)
+        pending_actions: List[Tuple[str, str, str]] = []
+
+        for name in sorted(data_files):
+            path = knowledge_dir / name
+            data = self.load(path)
+            if data is None:
+                continue
+            self.files += 1
+            rel_path = path.relative_to(self.root).as_posix()
+
+            for entry, category in iter_faq_entries(data):
+                self.entries += 1
+                entry_id = str(entry.get('id', '')).strip()
+                label = entry_id or entry['question'][:30]
+                if entry_id:
+                    if entry_id in ids:
+                        self.report(rel_path, 'duplicate-id', 'error', f'id {entry_id} 重复（首次出现在 {ids[entry_id]}）')
+                    else:
+                        ids[entry_id] = rel_path
+                else:
+                    self.report(rel_path, 'missing-id', 'warning', f'问题「{label}」没有 id')
+
+                question = normalize_question(entry['question'])
+                if question in questions:
+                    self.report(rel_path, 'duplicate-question', 'warning',
+                                f'问题「{entry["question"]}」重复（首次出现在 {questions[question]}）')
+                else:
+                    questions[question] = rel_path
+
+                for keyword in entry.get('keywords') or []:
+                    if isinstance(keyword, str) and keyword.strip():
+                        keyword_categories[normalize_keyword(keyword)].setdefault(f'faq:{category or "-"}', rel_path)
+                for action in entry.get('next_best_actions') or []:
+                    if isinstance(action, str):
+                        pending_actions.append((rel_path, label, action))
+
+            # ai_config 中的意图也按关键词匹配，与 FAQ 分类共用一个关键词索引
+            intents = data.get('intents') if isinstance(data, dict) else None
+            for intent in intents if isinstance(intents, list) else []:
+                if not isinstance(intent, dict):
+                    continue
+                for keyword in intent.get('keywords') or []:
+                    if isinstance(keyword, str) and keyword.strip():
+                        keyword_categories[normalize_keyword(keyword)].setdefault(f'intent:{intent.get("id", "-")}', rel_path)
+
+        for rel_path, label, action in pending_actions:
+            if normalize_question(action) not in questions:
+                self.report(rel_path, 'dangling-next-action', 'warning', f'「{label}」的后续问题「{action}」不存在')
+
+        for keyword, categories in keyword_categories.items():
+            intents = [category for category in categories if category.startswith('intent:')]
+            if len(intents) > 1:
+                # 多个意图共用关键词时，命中哪个意图只取决于优先级
+                self.report(categories[intents[0]], 'keyword-conflict', 'warning',
+                            f'关键词「{keyword}」同时属于 {", ".join(sorted(intents))}', categories=sorted(categories))
+            elif len([category for category in categories if category.startswith('faq:')]) > 1:
+                faq_categories = sorted(category for category in categories if category.startswith('faq:'))
+                self.report(categories[faq_categories[0]], 'keyword-conflict', 'info',
+                            f'关键词「{keyword}」出现在多个 FAQ 分类: {", ".join(faq_categories)}', categories=sorted(categories))
+
+    def run(self, tenant_dirs: Optional[List[str]] = None) -> Dict[str, Any]:
+        for tenant, knowledge_dir in iter_knowledge_dirs(self.root):
+            if tenant_dirs is not None and tenant not in tenant_dirs:
+                continue
+            self.tenants += 1
+            self.lint_tenant(knowledge_dir)
+        by_rule: Dict[str, int] = defaultdict(int)
+        for finding in self.findings:
+            by_rule[finding['rule']] += 1
+        return {
+            'tenants': self.tenants,
+            'files': self.files,
+            'entries': self.entries,
+            'findings': self.findings,
+            'by_rule': dict(by_rule)
+        }
+
+
+def lint_knowledge(root: Path, tenant_dirs: Optional[List[str]] = None) -> Dict[str, Any]:
+    """检查 projects/*/knowledge（tenant_dirs 为目录名列表时只检查这些租户）"""
+    return KnowledgeLinter(root).run(tenant_dirs)
@@ -0,0 +1,264 @@
+"""
+流式子进程执行
+
+subprocess.run(capture_output=True) 会把工具的全部输出缓存在内存中再解析，超时时丢弃所有已产生的结果。
+这里用 asyncio 逐块读取 stdout，把解码后的文本交给增量解析器（按行 / 顶层 JSON 数组），
+每个检查有软、硬两个时间预算：
+- 超过软预算：记录超时并继续等待
+- 超过硬预算：终止整个进程组（先 SIGTERM，宽限期后 SIGKILL），已经解析出的结果保留
+
+内存占用只与单行（或单个 JSON 数组元素）大小和 stderr 尾部缓冲有关，与工具输出总量无关。
+"""
+
+import asyncio
+import codecs
+import os
+import signal
+import subprocess
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .jsonstream import JsonArrayStream
+
+READ_CHUNK = 64 * 1024
+# 单行超过该长度时截断（tsc / ts-prune 的单行输出不会这么长）
+MAX_LINE_CHARS = 64 * 1024
+STDERR_TAIL_BYTES = 16 * 1024
+TERMINATE_GRACE = 3.0
+
+
+class LineParser:
+    """把文本块切分为行，逐行回调"""
+
+    def __init__(self, on_line: Callable[[str], None]):
+        self.on_line = on_line
+        self._pending = ''
+        self.truncated_lines = 0
+
+    def feed(self, text: str):
+        text = self._pending + text
+        lines = text.split('\n')
+        self._pending = lines.pop()
+        if len(self._pending) > MAX_LINE_CHARS:
+            self._pending = self._pending[:MAX_LINE_CHARS]
+            self.truncated_lines += 1
+        for line in lines:
+            self.on_line(line.rstrip('\r'))
+
+    def close(self):
+        if self._pending:
+            self.on_line(self._pending.rstrip('\r'))
+            self._pending = ''
+
+
+class JsonArrayParser:
+    """逐个回调顶层 JSON 数组的元素（如 eslint -f json 的每个文件结果）"""
+
+    def __init__(self, on_item: Callable[[Any], None]):
+        self.on_item = on_item
+        self._stream = JsonArrayStream()
+        self.error: Optional[str] = None
+
+    def feed(self, text: str):
+        if self.error:
+            return
+        try:
+            for item in self._stream.feed(text):
+                self.on_item(item)
+        except ValueError as e:
+            # 输出不是 JSON（例如工具打印了错误信息），停止解析但不影响进程
+            self.error = str(e)
+
+    def close(self):
+        if self.error:
+            return
+        # 最后一块中的格式错误会在返回其之前的元素后才报告；输出在数组结束前中断（进程崩溃或被终止）也算解析失败
+        try:
+            self._stream.close()
+        except ValueError as e:
+            self.error = str(e)
+
+
+class NullParser:
+    """丢弃输出（结果写入文件的命令，如 jest --outputFile），只统计字节数"""
+
+    def feed(self, text: str):
+        pass
+
+    def close(self):
+        pass
+
+
+class TextCollector:
+    """收集完整文本（仅用于输出很小的命令，如 git / npm outdated）"""
+
+    def __init__(self):
+        self._parts: List[str] = []
+
+    def feed(self, text: str):
+        self._parts.append(text)
+
+    def close(self):
+        pass
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._parts)
+
+
+class StreamResult:
+    def __init__(self, cmd: List[str]):
+        self.cmd = cmd
+        self.returncode: Optional[int] = None
+        # ok / timeout / error
+        self.status = 'ok'
+        self.over_soft_budget = False
+        # time.perf_counter() 时间点
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.stdout_bytes = 0
+        self.stderr_tail = b''
+        self.rusage: Optional[Any] = None
+        self.error = ''
+
+    @property
+    def partial(self) -> bool:
+        return self.status != 'ok'
+
+    @property
+    def stderr(self) -> str:
+        return self.stderr_tail.decode('utf-8', errors='replace')
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'returncode': self.returncode,
+            'elapsed': round(self.elapsed, 3),
+            'over_soft_budget': self.over_soft_budget,
+            'stdout_bytes': self.stdout_bytes
+        }
+
+
+def _signal_group(process: subprocess.Popen, sig: int):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        try:
+            process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+
+def _reap(process: subprocess.Popen, result: StreamResult):
+    """回收子进程；支持 wait4 时同时取得资源使用情况"""
+    if hasattr(os, 'wait4'):
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+            result.rusage = rusage
+            process.returncode = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            process.wait()
+    else:
+        process.wait()
+    result.returncode = process.returncode
+
+
+async def _run(cmd: List[str], cwd: str, parser, soft_budget: Optional[float], hard_budget: Optional[float],
+               result: StreamResult):
+    loop = asyncio.get_running_loop()
+    process = subprocess.Popen(
+        cmd, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=True
+    )
+
+    async def open_reader(pipe) -> asyncio.StreamReader:
+        reader = asyncio.StreamReader(limit=READ_CHUNK)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        return reader
+
+    stdout = await open_reader(process.stdout)
+    stderr = await open_reader(process.stderr)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    stderr_tail: deque = deque()
+    stderr_size = 0
+
+    async def pump_stdout():
+        while True:
+            chunk = await stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            result.stdout_bytes += len(chunk)
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b'', final=True))
+
+    async def pump_stderr():
+        nonlocal stderr_size
+        while True:
+            chunk = await stderr.read(READ_CHUNK)
+            if not chunk:
+                break
+            stderr_tail.append(chunk)
+            stderr_size += len(chunk)
+            while stderr_size - len(stderr_tail[0]) >= STDERR_TAIL_BYTES:
+                stderr_size -= len(stderr_tail.popleft())
+
+    pumps = asyncio.ensure_future(asyncio.gather(pump_stdout(), pump_stderr()))
+    try:
+        if soft_budget is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(pumps), soft_budget)
+            except asyncio.TimeoutError:
+                result.over_soft_budget = True
+        remaining = None
+        if hard_budget is not None:
+            remaining = max(0.0, hard_budget - (soft_budget or 0.0)) if result.over_soft_budget else hard_budget
+        try:
+            await asyncio.wait_for(asyncio.shield(pumps), remaining)
+        except asyncio.TimeoutError:
+            result.status = 'timeout'
+            _signal_group(process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(pumps), TERMINATE_GRACE)
+            except asyncio.TimeoutError:
+                _signal_group(process, signal.SIGKILL)
+                pumps.cancel()
+    finally:
+        parser.close()
+        result.stderr_tail = b''.join(stderr_tail)[-STDERR_TAIL_BYTES:]
+        await loop.run_in_executor(None, _reap, process, result)
+
+
+async def _run_timed(cmd: List[str], cwd: str, parser, soft_budget: Optional[float],
+                     hard_budget: Optional[float]) -> StreamResult:
+    result = StreamResult(cmd)
+    result.started = start = time.perf_counter()
+    try:
+        await _run(cmd, cwd, parser, soft_budget, hard_budget, result)
+    except OSError as e:
+        result.status = 'error'
+        result.error = str(e)
+        result.returncode = -1
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def stream_command(cmd: List[str], parser, cwd: Optional[str] = None, soft_budget: Optional[float] = None,
+                   hard_budget: Optional[float] = None) -> StreamResult:
+    """
+    运行命令并把 stdout 增量地交给 parser（需要 feed(text) / close() 方法）
+
+    进程无法启动时 status 为 'error'；超过硬预算时为 'timeout'，已解析的结果仍然有效。
+    """
+    return asyncio.run(_run_timed(cmd, cwd or os.getcwd(), parser, soft_budget, hard_budget))
+
+
+def stream_commands(jobs: Sequence[Tuple[List[str], Any]], cwd: Optional[str] = None,
+                    soft_budget: Optional[float] = None, hard_budget: Optional[float] = None) -> List[StreamResult]:
+    """在同一个事件循环中并行运行多个 (命令, parser)，每个命令单独计算预算，结果按输入顺序返回"""
+    async def run_all():
+        return await asyncio.gather(*(
+            _run_timed(cmd, cwd or os.getcwd(), parser, soft_budget, hard_budget) for cmd, parser in jobs
+        ))
+
+    return list(asyncio.run(run_all()))
@@ -0,0 +1,204 @@
+"""
+全仓库密钥扫描引擎
+
+- 所有规则合并为一个预编译正则，每个文件只扫描一遍
+- 预先计算行首偏移表，用 bisect 定位行号（线性时间）
+- 基于香农熵识别通用高熵字符串
+- 多进程并行扫描整个仓库（包括 projects/* 和 scripts/）
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .ts_source import LineIndex
+
+# 规则名 -> (正则片段, 问题类型)；片段必须不含命名分组
+SECRET_RULES = [
+    ('password', r'password\s*[:=]\s*["\'][^"\'\s]{4,}["\']', '硬编码密码'),
+    ('api_key', r'api[_-]?key\s*[:=]\s*["\'][^"\'\s]{8,}["\']', '硬编码 API Key'),
+    ('secret', r'secret\s*[:=]\s*["\'][^"\'\s]{8,}["\']', '硬编码密钥'),
+    ('token', r'token\s*[:=]\s*["\'][^"\'\s]{8,}["\']', '硬编码 Token'),
+    ('private_key', r'-----BEGIN (?:RSA |EC |OPENSSH |DSA )?PRIVATE KEY-----', '私钥'),
+    ('aws_access_key', r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b', 'AWS Access Key'),
+    ('google_api_key', r'\bAIza[0-9A-Za-z_\-]{35}\b', 'Google API Key'),
+    ('github_token', r'\bgh[pousr]_[0-9A-Za-z]{36,}\b', 'GitHub Token'),
+    ('slack_token', r'\bxox[abposr]-[0-9A-Za-z\-]{10,}\b', 'Slack Token'),
+    ('jwt', r'\beyJ[0-9A-Za-z_\-]{10,}\.eyJ[0-9A-Za-z_\-]{10,}\.[0-9A-Za-z_\-]{10,}', 'JWT（可能是 Supabase 密钥）'),
+]
+
+COMBINED_PATTERN = re.compile(
+    '|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in SECRET_RULES),
+    re.IGNORECASE
+)
+RULE_TYPES = {name: issue_type for name, _, issue_type in SECRET_RULES}
+
+# 通用高熵字符串：引号内、无空白的长字符串
+STRING_LITERAL_PATTERN = re.compile(r'["\'`]([A-Za-z0-9+/=_\-\.]{20,})["\'`]')
+HEX_CHARSET = frozenset('0123456789abcdefABCDEF')
+ENTROPY_THRESHOLD_BASE64 = 4.5
+ENTROPY_THRESHOLD_HEX = 3.0
+ENTROPY_TYPE = '高熵字符串（疑似密钥）'
+
+# 匹配内容中出现这些词时视为示例/占位符
+PLACEHOLDER_MARKERS = ('example', 'todo', 'your-', 'your_', 'xxxx', 'placeholder', 'process.env', '${', 'dummy', 'changeme')
+IGNORE_PRAGMA = 'secret-scan: ignore'
+
+SCAN_EXTENSIONS = {
+    '.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs', '.json', '.py', '.sh',
+    '.toml', '.yml', '.yaml', '.sql', '.md', '.env'
+}
+EXCLUDED_DIRS = {'node_modules', '.next', '.git', '.vercel', '.wrangler', '__pycache__', 'coverage', '.code-health'}
+EXCLUDED_FILES = {'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml'}
+MAX_FILE_BYTES = 1024 * 1024
+
+# 少于该数量的文件直接在当前进程扫描，避免进程池启动开销
+PARALLEL_MIN_FILES = 64
+FILES_PER_TASK = 32
+
+
+def shannon_entropy(value: str) -> float:
+    """计算字符串的香农熵（bit/字符）"""
+    if not value:
+        return 0.0
+    length = len(value)
+    return -sum((count / length) * math.log2(count / length) for count in Counter(value).values())
+
+
+def is_placeholder(text: str) -> bool:
+    lowered = text.lower()
+    return any(marker in lowered for marker in PLACEHOLDER_MARKERS)
+
+
+def looks_like_generic_secret(value: str) -> bool:
+    """判断字符串字面量是否像随机生成的密钥"""
+    # 路径、URL、域名、版本号等常见的非密钥字符串
+    if value.startswith(('http', '/', './', '../', '@')) or value.count('.') > 2 or value.count('-') > 3:
+        return False
+    if value.isalpha() or value.isdigit():
+        return False
+    if set(value) <= HEX_CHARSET:
+        return len(value) >= 32 and shannon_entropy(value) >= ENTROPY_THRESHOLD_HEX
+    # 随机 base64 字符串通常混合大小写和数字
+    has_upper = any(c.isupper() for c in value)
+    has_lower = any(c.islower() for c in value)
+    has_digit = any(c.isdigit() for c in value)
+    if not (has_upper and has_lower and has_digit):
+        return False
+    return shannon_entropy(value) >= ENTROPY_THRESHOLD_BASE64
+
+
+def scan_content(content: str, rel_path: str) -> List[Dict[str, Any]]:
+    """扫描单个文件内容，返回问题列表"""
+    issues = []
+    index: Optional[LineIndex] = None
+    flagged_lines = set()
+    lines = None
+
+    def line_of(position: int) -> int:
+        nonlocal index
+        if index is None:
+            index = LineIndex(content)
+        return index.line_of(position)
+
+    def line_text(line_no: int) -> str:
+        nonlocal lines
+        if lines is None:
+            lines = content.split('\n')
+        return lines[line_no - 1] if 0 < line_no <= len(lines) else ''
+
+    for match in COMBINED_PATTERN.finditer(content):
+        text = match.group(0)
+        if is_placeholder(text):
+            continue
+        line_no = line_of(match.start())
+        if IGNORE_PRAGMA in line_text(line_no):
+            continue
+        flagged_lines.add(line_no)
+        issues.append({
+            'file': rel_path,
+            'line': line_no,
+            'rule': match.lastgroup,
+            'type': RULE_TYPES[match.lastgroup]
+        })
+
+    for match in STRING_LITERAL_PATTERN.finditer(content):
+        value = match.group(1)
+        if is_placeholder(value) or not looks_like_generic_secret(value):
+            continue
+        line_no = line_of(match.start())
+        if line_no in flagged_lines or IGNORE_PRAGMA in line_text(line_no):
+            continue
+        flagged_lines.add(line_no)
+        issues.append({
+            'file': rel_path,
+            'line': line_no,
+            'rule': 'high_entropy',
+            'type': ENTROPY_TYPE,
+            'entropy': round(shannon_entropy(value), 2)
+        })
+
+    return issues
+
+
+def scan_file(path: str, root: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except (UnicodeDecodeError, OSError):
+        return []
+    return scan_content(content, os.path.relpath(path, root))
+
+
+def scan_files(paths: List[str], root: str) -> List[Dict[str, Any]]:
+    """扫描一批文件（进程池任务单元）"""
+    issues = []
+    for path in paths:
+        issues.extend(scan_file(path, root))
+    return issues
+
+
+def iter_scan_targets(root: Path) -> Iterator[str]:
+    """遍历仓库中所有需要扫描的文件"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+        for filename in filenames:
+            if filename in EXCLUDED_FILES:
+                continue
+            suffix = os.path.splitext(filename)[1]
+            if suffix not in SCAN_EXTENSIONS and not filename.startswith('.env'):
+                continue
+            if '__tests__' in dirpath or '.test.' in filename or '.spec.' in filename:
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.path.getsize(path) > MAX_FILE_BYTES:
+                    continue
+            except OSError:
+                continue
+            yield path
+
+
+def scan_repository(root: Path, workers: Optional[int] = None) -> Dict[str, Any]:
+    """并行扫描整个仓库"""
+    root = Path(root)
+    paths = sorted(iter_scan_targets(root))
+    issues: List[Dict[str, Any]] = []
+
+    if len(paths) < PARALLEL_MIN_FILES or workers == 1:
+        issues = scan_files(paths, str(root))
+    else:
+        batches = [paths[i:i + FILES_PER_TASK] for i in range(0, len(paths), FILES_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            for batch_issues in executor.map(scan_files, batches, [str(root)] * len(batches)):
+                issues.extend(batch_issues)
+
+    issues.sort(key=lambda issue: (issue['file'], issue['line']))
+    return {
+        'files_scanned': len(paths),
+        'issues': issues
+    }
@@ -0,0 +1,140 @@
+"""
+多租户检查的辅助工具
+
+租户列表来自 projects/registry.json，每个租户的文件位于 projects/<path>/（组件、知识库、config.json）。
+各租户的组件大多是彼此的副本，ContentCache 按文件内容哈希缓存单文件分析结果，
+相同内容在整个运行中只分析一次；tsc / ESLint 对所有租户只各运行一次，结果按路径前缀分配给租户。
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+REGISTRY_PATH = Path('projects') / 'registry.json'
+TENANT_SOURCE_EXTENSIONS = {'.ts', '.tsx', '.js', '.jsx'}
+TENANT_DATA_EXTENSIONS = {'.json'}
+EXCLUDED_DIRS = {'node_modules', '.next', '__pycache__'}
+REQUIRED_CONFIG_KEYS = ('id', 'name', 'allowedOrigins')
+
+
+class Tenant:
+    def __init__(self, tenant_id: str, name: str, path: str, active: bool = True, deployment: str = 'shared',
+                 group: Optional[str] = None):
+        self.id = tenant_id
+        self.name = name
+        # 相对于项目根目录，如 projects/goldenyears
+        self.directory = (Path('projects') / path).as_posix()
+        self.active = active
+        self.deployment = deployment
+        self.group = group
+
+    @property
+    def prefix(self) -> str:
+        return self.directory + '/'
+
+
+def load_registry(root: Path, include_inactive: bool = False) -> List[Tenant]:
+    with open(Path(root) / REGISTRY_PATH, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+    tenants = []
+    for tenant_id, entry in registry.get('companies', {}).items():
+        if not entry.get('active', True) and not include_inactive:
+            continue
+        tenants.append(Tenant(
+            tenant_id,
+            entry.get('name', tenant_id),
+            entry.get('path', tenant_id),
+            active=entry.get('active', True),
+            deployment=entry.get('deployment', 'shared'),
+            group=entry.get('group')
+        ))
+    return tenants
+
+
+def unregistered_directories(root: Path, tenants: List[Tenant]) -> List[str]:
+    """projects/ 下存在但没有登记在 registry.json 中的租户目录"""
+    registered = {tenant.directory for tenant in tenants}
+    projects_dir = Path(root) / 'projects'
+    return sorted(
+        f'projects/{entry.name}' for entry in projects_dir.iterdir()
+        if entry.is_dir() and f'projects/{entry.name}' not in registered
+    )
+
+
+def tenant_of(tenants: List[Tenant], rel_path: str) -> Optional[Tenant]:
+    rel_path = rel_path.replace(os.sep, '/')
+    for tenant in tenants:
+        if rel_path.startswith(tenant.prefix):
+            return tenant
+    return None
+
+
+def iter_tenant_files(root: Path, tenant: Tenant) -> Iterator[str]:
+    """租户目录下需要分析的源码和数据文件（相对于项目根目录）"""
+    base = Path(root) / tenant.directory
+    for dirpath, dirnames, filenames in os.walk(base):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS)
+        for filename in sorted(filenames):
+            suffix = os.path.splitext(filename)[1]
+            if suffix in TENANT_SOURCE_EXTENSIONS or suffix in TENANT_DATA_EXTENSIONS:
+                yield os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, '/')
+
+
+class ContentCache:
+    """按 (分析类型, 内容哈希) 缓存单文件分析结果"""
+
+    def __init__(self):
+        self._results: Dict[Tuple[str, bytes], Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(content: str) -> bytes:
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, kind: str, digest: bytes, compute: Callable[[], Any]) -> Any:
+        key = (kind, digest)
+        if key in self._results:
+            self.hits += 1
+            return self._results[key]
+        self.misses += 1
+        result = self._results[key] = compute()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._results),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0
+        }
+
+
+def validate_config(root: Path, tenant: Tenant) -> List[Dict[str, Any]]:
+    """检查租户的 config.json 是否存在、可解析，且与 registry 一致"""
+    config_file = f'{tenant.directory}/config.json'
+    path = Path(root) / config_file
+    if not path.exists():
+        return [{'file': config_file, 'severity': 'error', 'rule': 'missing-config', 'message': '缺少 config.json'}]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except ValueError as e:
+        return [{'file': config_file, 'severity': 'error', 'rule': 'invalid-json', 'message': str(e)}]
+
+    findings = []
+    for key in REQUIRED_CONFIG_KEYS:
+        if key not in config:
+            findings.append({'file': config_file, 'severity': 'error', 'rule': 'missing-config-key',
+                             'message': f'缺少字段 {key}'})
+    if config.get('id') not in (None, tenant.id):
+        findings.append({'file': config_file, 'severity': 'error', 'rule': 'config-id-mismatch',
+                         'message': f"config.json 中的 id 为 {config['id']}，registry 中为 {tenant.id}"})
+    for origin in config.get('allowedOrigins', []):
+        if origin.startswith('http://') and 'localhost' not in origin:
+            findings.append({'file': config_file, 'severity': 'warning', 'rule': 'insecure-origin',
+                             'message': f'允许了非 HTTPS 来源 {origin}'})
+    return findings
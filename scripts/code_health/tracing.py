@@ -0,0 +1,137 @@
+"""
+检查过程的追踪与资源统计
+
+每个检查记录为一个 span（墙钟时间、本进程 CPU 时间），检查中启动的子进程记录为嵌套事件
+（子进程 CPU 时间和峰值 RSS 来自 wait4 的 rusage，外加解析的输出字节数）。
+结果写成 Chrome trace-event JSON（chrome://tracing 或 https://ui.perfetto.dev 打开），
+并汇总成报告中的耗时表。
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CHECKS_TID = 1
+# 子进程按时间重叠情况分配到不同的轨道，并行分片不会互相遮挡
+PROCESS_TID_BASE = 100
+
+
+def rusage_max_rss_kb(rusage) -> int:
+    """ru_maxrss 在 Linux 上以 KB 为单位，在 macOS 上以字节为单位"""
+    if rusage is None:
+        return 0
+    return rusage.ru_maxrss // 1024 if sys.platform == 'darwin' else rusage.ru_maxrss
+
+
+class CheckSpan:
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.wall = 0.0
+        self.cpu_self = 0.0
+        self.cpu_children = 0.0
+        self.max_rss_kb = 0
+        self.bytes_parsed = 0
+        self.processes = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'wall': round(self.wall, 3),
+            'cpu_self': round(self.cpu_self, 3),
+            'cpu_children': round(self.cpu_children, 3),
+            'max_rss_mb': round(self.max_rss_kb / 1024, 1),
+            'bytes_parsed': self.bytes_parsed,
+            'processes': self.processes
+        }
+
+
+class Tracer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.spans: Dict[str, CheckSpan] = {}
+        self._current: Optional[CheckSpan] = None
+        # 每条子进程轨道上最后一个事件的结束时间（微秒）
+        self._lanes: List[float] = []
+
+    def _us(self, perf_time: float) -> float:
+        return round((perf_time - self.origin) * 1_000_000, 1)
+
+    @contextmanager
+    def check(self, name: str):
+        """记录一个检查的 span；期间 record_process 记录的子进程计入该检查"""
+        span = CheckSpan(name)
+        previous, self._current = self._current, span
+        try:
+            yield span
+        finally:
+            span.wall = time.perf_counter() - span.start
+            span.cpu_self = time.process_time() - span.cpu_start
+            self._current = previous
+            self.spans[name] = span
+            self.events.append({
+                'name': name, 'cat': 'check', 'ph': 'X', 'pid': os.getpid(), 'tid': CHECKS_TID,
+                'ts': self._us(span.start), 'dur': round(span.wall * 1_000_000, 1),
+                'args': span.as_dict()
+            })
+
+    def _lane(self, start_us: float, end_us: float) -> int:
+        for index, lane_end in enumerate(self._lanes):
+            if lane_end <= start_us:
+                self._lanes[index] = end_us
+                return PROCESS_TID_BASE + index
+        self._lanes.append(end_us)
+        return PROCESS_TID_BASE + len(self._lanes) - 1
+
+    def record_process(self, result):
+        """记录一个 runner.StreamResult（需要 started / elapsed / rusage / stdout_bytes）"""
+        rusage = result.rusage
+        cpu_user = rusage.ru_utime if rusage else 0.0
+        cpu_sys = rusage.ru_stime if rusage else 0.0
+        max_rss_kb = rusage_max_rss_kb(rusage)
+        start_us = self._us(result.started)
+        dur_us = round(result.elapsed * 1_000_000, 1)
+        self.events.append({
+            'name': ' '.join(result.cmd[:3]), 'cat': 'process', 'ph': 'X', 'pid': os.getpid(),
+            'tid': self._lane(start_us, start_us + dur_us), 'ts': start_us, 'dur': dur_us,
+            'args': {
+                'cmd': ' '.join(result.cmd),
+                'check': self._current.name if self._current else None,
+                'status': result.status,
+                'returncode': result.returncode,
+                'cpu_user': round(cpu_user, 3),
+                'cpu_sys': round(cpu_sys, 3),
+                'max_rss_mb': round(max_rss_kb / 1024, 1),
+                'stdout_bytes': result.stdout_bytes
+            }
+        })
+        span = self._current
+        if span is not None:
+            span.cpu_children += cpu_user + cpu_sys
+            span.max_rss_kb = max(span.max_rss_kb, max_rss_kb)
+            span.bytes_parsed += result.stdout_bytes
+            span.processes += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: span.as_dict() for name, span in self.spans.items()}
+
+    def write(self, path: Path):
+        pid = os.getpid()
+        metadata = [
+            {'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'code_health_check'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': CHECKS_TID, 'args': {'name': 'checks'}},
+        ]
+        metadata.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': PROCESS_TID_BASE + index,
+             'args': {'name': f'subprocess {index + 1}'}}
+            for index in range(len(self._lanes))
+        )
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,150 @@
+"""
+TypeScript / JavaScript 源码的轻量级文本工具
+
+不做完整解析，只提供规则引擎需要的基础能力：
+- 把注释和字符串内容替换为空格（保持偏移和行号不变）
+- 括号配对
+- 偏移 -> 行号（预计算行首偏移表 + bisect）
+"""
+
+import re
+from bisect import bisect_right
+from typing import List, Optional
+
+OPENERS = {'(': ')', '[': ']', '{': '}'}
+# 这些字符之后出现的 / 是正则字面量而不是除号
+REGEX_PRECEDING = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_PRECEDING_KEYWORDS = ('return', 'typeof', 'case', 'in', 'of', 'void', 'throw')
+
+
+def _regex_allowed(content: str, pos: int) -> bool:
+    j = pos - 1
+    while j >= 0 and content[j] in ' \t\r\n':
+        j -= 1
+    if j < 0 or content[j] in REGEX_PRECEDING:
+        return True
+    end = j + 1
+    while j >= 0 and (content[j].isalnum() or content[j] in '_$'):
+        j -= 1
+    return content[j + 1:end] in REGEX_PRECEDING_KEYWORDS
+
+
+class LineIndex:
+    """预计算行首偏移，O(log n) 把字符偏移换算为行号（从 1 开始）"""
+
+    def __init__(self, content: str):
+        self.offsets = [0]
+        self.offsets.extend(match.end() for match in re.finditer('\n', content))
+
+    def line_of(self, position: int) -> int:
+        return bisect_right(self.offsets, position)
+
+
+def strip_comments_and_strings(content: str) -> str:
+    """
+    返回与原文等长的代码文本：注释、字符串和模板字符串的内容替换为空格，
+    保留引号本身和换行，便于后续用正则和括号配对分析代码结构
+    """
+    out = list(content)
+    i = 0
+    length = len(content)
+
+    def blank(start: int, end: int):
+        for k in range(start, min(end, length)):
+            if out[k] != '\n':
+                out[k] = ' '
+
+    while i < length:
+        char = content[i]
+        nxt = content[i + 1] if i + 1 < length else ''
+        if char == '/' and nxt == '/':
+            end = content.find('\n', i)
+            end = length if end == -1 else end
+            blank(i, end)
+            i = end
+        elif char == '/' and nxt == '*':
+            end = content.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            blank(i, end)
+            i = end
+        elif char == '/' and _regex_allowed(content, i):
+            # 正则字面量：跳到未转义、且不在字符类中的 /
+            j = i + 1
+            in_class = False
+            while j < length and content[j] != '\n':
+                if content[j] == '\\':
+                    j += 1
+                elif content[j] == '[':
+                    in_class = True
+                elif content[j] == ']':
+                    in_class = False
+                elif content[j] == '/' and not in_class:
+                    break
+                j += 1
+            blank(i + 1, j)
+            i = j + 1
+        elif char in ('"', "'", '`'):
+            j = i + 1
+            while j < length and content[j] != char:
+                if content[j] == '\\':
+                    j += 1
+                elif content[j] == '\n' and char != '`':
+                    break
+                j += 1
+            blank(i + 1, j)
+            i = j + 1
+        else:
+            i += 1
+    return ''.join(out)
+
+
+def find_matching(code: str, open_pos: int) -> Optional[int]:
+    """返回与 open_pos 处括号配对的闭括号位置（code 应已去除注释和字符串）"""
+    opener = code[open_pos]
+    closer = OPENERS.get(opener)
+    if closer is None:
+        return None
+    depth = 0
+    for i in range(open_pos, len(code)):
+        char = code[i]
+        if char == opener:
+            depth += 1
+        elif char == closer:
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def skip_whitespace(code: str, pos: int) -> int:
+    while pos < len(code) and code[pos].isspace():
+        pos += 1
+    return pos
+
+
+def statement_end(code: str, pos: int) -> int:
+    """从 pos 开始找到当前语句结束（深度为 0 的分号或换行后的闭括号）"""
+    depth = 0
+    for i in range(pos, len(code)):
+        char = code[i]
+        if char in OPENERS:
+            depth += 1
+        elif char in (')', ']', '}'):
+            if depth == 0:
+                return i
+            depth -= 1
+        elif char == ';' and depth == 0:
+            return i
+    return len(code)
+
+
+def block_after(code: str, pos: int) -> List[int]:
+    """
+    返回 pos 之后的语句块范围 [start, end)：
+    如果紧跟 { 则为配对的花括号块，否则为单条语句
+    """
+    start = skip_whitespace(code, pos)
+    if start < len(code) and code[start] == '{':
+        end = find_matching(code, start)
+        return [start, (end + 1) if end is not None else len(code)]
+    return [start, statement_end(code, start)]
@@ -0,0 +1,348 @@
+"""
+TypeScript 类型检查性能分析
+
+运行 tsc --extendedDiagnostics --generateTrace，并流式解析生成的 trace.json / types.json：
+- 各阶段耗时（parse / bind / check / emit，来自 extendedDiagnostics 和 trace 事件）
+- 检查最慢的源文件（checkSourceFile 事件）
+- 最昂贵的类型关系比较（structuredTypeRelatedTo，按源/目标类型聚合，通过 types.json 解析为类型名和声明位置）
+- 最昂贵的表达式检查位置（checkExpression / checkVariableDeclaration 等）
+- 类型实例化排行：trace 不记录单个实例化的耗时，因此按 types.json 中 instantiatedType 统计
+  每个泛型被实例化出的类型数（数量越多，实例化与后续比较的开销越大），并列出触发
+  instantiateType_DepthLimit（实例化深度或次数超限）的类型
+"""
+
+import json
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .jsonstream import iter_json_array
+from .ts_source import LineIndex
+
+TOP_N = 20
+# 低于该耗时（毫秒）的表达式检查不参与排行，减少聚合开销
+MIN_HOTSPOT_MS = 1.0
+
+DIAGNOSTIC_LINE_PATTERN = re.compile(r'^(?P<name>[A-Za-z][A-Za-z /()\-]*?):\s+(?P<value>[\d.]+)(?P<unit>[sK]?)\s*$')
+
+# 各阶段最外层的 trace 事件 -> 阶段名
+PHASE_EVENTS = {'createProgram': 'program', 'createSourceFile': 'parse', 'bindSourceFile': 'bind',
+                'checkSourceFile': 'check', 'emitJsFileOrBundle': 'emit', 'emitDeclarationFileOrBundle': 'emit'}
+RELATION_EVENTS = {'structuredTypeRelatedTo'}
+VARIANCE_EVENTS = {'getVariancesWorker'}
+HOTSPOT_EVENTS = {'checkExpression', 'checkVariableDeclaration', 'checkDeferredNode', 'checkSourceElement'}
+DEPTH_LIMIT_EVENT = 'instantiateType_DepthLimit'
+
+
+def metric_key(name: str) -> str:
+    """'Check time' -> 'check_time'"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def parse_extended_diagnostics(output: str) -> Dict[str, float]:
+    """
+    解析 --extendedDiagnostics 输出的统计表
+
+    时间统一为秒，内存统一为 KB，其余为计数。
+    """
+    stats: Dict[str, float] = {}
+    for line in output.splitlines():
+        match = DIAGNOSTIC_LINE_PATTERN.match(line.strip())
+        if not match:
+            continue
+        stats[metric_key(match.group('name'))] = float(match.group('value'))
+    return stats
+
+
+def trace_files(trace_dir: Path) -> List[Tuple[Path, Optional[Path]]]:
+    """返回 (trace 文件, types 文件) 列表；tsc -b 会为每个项目生成一组并写入 legend.json"""
+    legend_path = trace_dir / 'legend.json'
+    if legend_path.exists():
+        try:
+            legend = json.loads(legend_path.read_text(encoding='utf-8'))
+            return [(Path(entry['tracePath']), Path(entry['typesPath']) if entry.get('typesPath') else None)
+                    for entry in legend]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    pairs = []
+    for trace_path in sorted(trace_dir.glob('trace*.json')):
+        types_path = trace_dir / trace_path.name.replace('trace', 'types', 1)
+        pairs.append((trace_path, types_path if types_path.exists() else None))
+    return pairs
+
+
+class TraceAnalysis:
+    """对 trace 事件做单遍聚合，不保留事件本身"""
+
+    def __init__(self):
+        self.phase_ms: Dict[str, float] = defaultdict(float)
+        self.file_check_ms: Dict[str, float] = defaultdict(float)
+        self.relation_ms: Dict[Tuple[int, int], float] = defaultdict(float)
+        self.relation_count: Dict[Tuple[int, int], int] = defaultdict(int)
+        self.variance_ms: Dict[int, float] = defaultdict(float)
+        self.hotspot_ms: Dict[Tuple[str, int, int], float] = defaultdict(float)
+        # instantiateType_DepthLimit：类型 id -> (最大深度, 最大实例化次数, 出现次数)
+        self.depth_limits: Dict[int, List[int]] = {}
+        self.events = 0
+        # 按线程记录未结束的 B 事件
+        self._open: Dict[Tuple[Any, Any], List[Dict[str, Any]]] = defaultdict(list)
+
+    def add(self, event: Dict[str, Any]):
+        self.events += 1
+        ph = event.get('ph')
+        if ph == 'X':
+            self._complete(event, float(event.get('dur', 0)) / 1000)
+        elif ph == 'B':
+            self._open[(event.get('pid'), event.get('tid'))].append(event)
+        elif ph == 'E':
+            stack = self._open.get((event.get('pid'), event.get('tid')))
+            if stack:
+                begin = stack.pop()
+                self._complete(begin, (float(event.get('ts', 0)) - float(begin.get('ts', 0))) / 1000)
+        elif ph in ('i', 'I') and event.get('name') == DEPTH_LIMIT_EVENT:
+            args = event.get('args') or {}
+            if 'typeId' in args:
+                record = self.depth_limits.setdefault(int(args['typeId']), [0, 0, 0])
+                record[0] = max(record[0], int(args.get('instantiationDepth', 0)))
+                record[1] = max(record[1], int(args.get('instantiationCount', 0)))
+                record[2] += 1
+
+    def _complete(self, event: Dict[str, Any], duration_ms: float):
+        name = event.get('name', '')
+        args = event.get('args') or {}
+        # 只按最外层的阶段事件统计，避免嵌套事件重复计时
+        if name in PHASE_EVENTS:
+            self.phase_ms[PHASE_EVENTS[name]] += duration_ms
+        if name == 'checkSourceFile' and args.get('path'):
+            self.file_check_ms[args['path']] += duration_ms
+        elif name in RELATION_EVENTS and 'sourceId' in args and 'targetId' in args:
+            # 类型关系比较会递归嵌套，这里记录的是包含子比较的总耗时
+            key = (int(args['sourceId']), int(args['targetId']))
+            self.relation_ms[key] += duration_ms
+            self.relation_count[key] += 1
+        elif name in VARIANCE_EVENTS and 'id' in args:
+            self.variance_ms[int(args['id'])] += duration_ms
+        elif name in HOTSPOT_EVENTS and duration_ms >= MIN_HOTSPOT_MS and args.get('path'):
+            self.hotspot_ms[(args['path'], int(args.get('pos', 0)), int(args.get('end', 0)))] += duration_ms
+
+    def top_relations(self, limit: int) -> List[Tuple[Tuple[int, int], float, int]]:
+        items = sorted(self.relation_ms.items(), key=lambda item: -item[1])[:limit]
+        return [(key, ms, self.relation_count[key]) for key, ms in items]
+
+    def top_variances(self, limit: int) -> List[Tuple[int, float]]:
+        return sorted(self.variance_ms.items(), key=lambda item: -item[1])[:limit]
+
+    def top_depth_limits(self, limit: int) -> List[Tuple[int, List[int]]]:
+        return sorted(self.depth_limits.items(), key=lambda item: (-item[1][2], -item[1][1]))[:limit]
+
+
+def count_instantiations(types_path: Optional[Path], errors: Optional[List[str]] = None) -> Counter:
+    """流式扫描 types.json：泛型类型 id -> 由它实例化出的类型数；读取失败的原因追加到 errors"""
+    counts: Counter = Counter()
+    if not types_path:
+        return counts
+    try:
+        with open(types_path, 'r', encoding='utf-8') as f:
+            for entry in iter_json_array(f):
+                if isinstance(entry, dict) and isinstance(entry.get('instantiatedType'), int) \
+                        and entry['instantiatedType'] != entry.get('id'):
+                    counts[entry['instantiatedType']] += 1
+    except (OSError, ValueError) as e:
+        if errors is not None:
+            errors.append(f'{types_path.name}: {e}')
+    return counts
+
+
+def load_type_descriptions(types_path: Optional[Path], wanted: Set[int],
+                           errors: Optional[List[str]] = None) -> Dict[int, Dict[str, Any]]:
+    """流式扫描 types.json，只保留需要的类型"""
+    if not types_path or not wanted:
+        return {}
+    found: Dict[int, Dict[str, Any]] = {}
+    try:
+        with open(types_path, 'r', encoding='utf-8') as f:
+            for entry in iter_json_array(f):
+                type_id = entry.get('id') if isinstance(entry, dict) else None
+                if type_id in wanted:
+                    found[type_id] = entry
+                    if len(found) == len(wanted):
+                        break
+    except (OSError, ValueError) as e:
+        if errors is not None:
+            errors.append(f'{types_path.name}: {e}')
+    return found
+
+
+def describe_type(type_id: int, types: Dict[int, Dict[str, Any]], project_root: Path) -> str:
+    entry = types.get(type_id)
+    if not entry:
+        return f'#{type_id}'
+    name = (entry.get('display') or entry.get('symbolName') or entry.get('intrinsicName')
+            or ('union' if entry.get('unionTypes') else '') or ('intersection' if entry.get('intersectionTypes') else '')
+            or f'#{type_id}')
+    if len(name) > 80:
+        name = name[:77] + '...'
+    declaration = entry.get('firstDeclaration') or {}
+    if declaration.get('path'):
+        location = relative_to(declaration['path'], project_root)
+        line = (declaration.get('start') or {}).get('line')
+        return f'{name} ({location}:{line})' if line is not None else f'{name} ({location})'
+    return name
+
+
+def relative_to(path: str, project_root: Path) -> str:
+    root = str(project_root.resolve()).replace('\\', '/').rstrip('/') + '/'
+    normalized = path.replace('\\', '/')
+    if normalized.lower().startswith(root.lower()):
+        return normalized[len(root):]
+    if '/node_modules/' in normalized:
+        return 'node_modules/' + normalized.split('/node_modules/', 1)[1]
+    return normalized
+
+
+def pos_to_line(project_root: Path, rel_path: str, pos: int, cache: Dict[str, Any]) -> int:
+    """把 trace 中的字符偏移换算为行号"""
+    if rel_path not in cache:
+        try:
+            cache[rel_path] = LineIndex((project_root / rel_path).read_text(encoding='utf-8'))
+        except (OSError, UnicodeDecodeError):
+            cache[rel_path] = None
+    index = cache[rel_path]
+    return index.line_of(pos) if index else 0
+
+
+def analyze_trace_dir(trace_dir: Path, project_root: Path, top: int = TOP_N) -> Dict[str, Any]:
+    """聚合 trace 目录中的全部事件，返回排行榜"""
+    analysis = TraceAnalysis()
+    pairs = trace_files(trace_dir)
+    # 格式错误或读取失败的文件：已解析的部分照常统计，但在报告中注明结果不完整
+    errors: List[str] = []
+    for trace_path, _ in pairs:
+        try:
+            with open(trace_path, 'r', encoding='utf-8') as f:
+                for event in iter_json_array(f):
+                    if isinstance(event, dict):
+                        analysis.add(event)
+        except (OSError, ValueError) as e:
+            errors.append(f'{trace_path.name}: {e}')
+
+    relations = analysis.top_relations(top)
+    variances = analysis.top_variances(top)
+    depth_limits = analysis.top_depth_limits(top)
+    instantiation_counts: Counter = Counter()
+    for _, types_path in pairs:
+        instantiation_counts.update(count_instantiations(types_path, errors))
+    instantiations = instantiation_counts.most_common(top)
+    wanted = {type_id for (source, target), _, _ in relations for type_id in (source, target)}
+    wanted.update(type_id for type_id, _ in variances)
+    wanted.update(type_id for type_id, _ in instantiations)
+    wanted.update(type_id for type_id, _ in depth_limits)
+    types: Dict[int, Dict[str, Any]] = {}
+    for _, types_path in pairs:
+        types.update(load_type_descriptions(types_path, wanted - set(types), errors))
+
+    line_cache: Dict[str, Any] = {}
+    hotspots = []
+    for (path, pos, _end), ms in sorted(analysis.hotspot_ms.items(), key=lambda item: -item[1])[:top]:
+        rel_path = relative_to(path, project_root)
+        hotspots.append({'file': rel_path, 'line': pos_to_line(project_root, rel_path, pos, line_cache),
+                         'ms': round(ms, 1)})
+
+    return {
+        'events': analysis.events,
+        'phase_ms': {phase: round(ms, 1) for phase, ms in sorted(analysis.phase_ms.items())},
+        'slowest_files': [
+            {'file': relative_to(path, project_root), 'ms': round(ms, 1)}
+            for path, ms in sorted(analysis.file_check_ms.items(), key=lambda item: -item[1])[:top]
+        ],
+        'expensive_relations': [
+            {'source': describe_type(source, types, project_root), 'target': describe_type(target, types, project_root),
+             'ms': round(ms, 1), 'count': count}
+            for (source, target), ms, count in relations
+        ],
+        'expensive_variances': [
+            {'type': describe_type(type_id, types, project_root), 'ms': round(ms, 1)}
+            for type_id, ms in variances
+        ],
+        'expensive_expressions': hotspots,
+        'instantiated_types': sum(instantiation_counts.values()),
+        'most_instantiated': [
+            {'type': describe_type(type_id, types, project_root), 'count': count}
+            for type_id, count in instantiations
+        ],
+        'instantiation_depth_limits': [
+            {'type': describe_type(type_id, types, project_root), 'depth': depth, 'instantiations': count,
+             'hits': hits}
+            for type_id, (depth, count, hits) in depth_limits
+        ],
+        'parse_errors': errors
+    }
+
+
+def profile_metrics(profile: Dict[str, Any]) -> Dict[str, float]:
+    """展开为 tsc_profile.* 指标，写入历史时间序列"""
+    metrics: Dict[str, float] = {}
+    for key, value in profile.get('diagnostics', {}).items():
+        metrics[f'tsc_profile.{key}'] = value
+    trace = profile.get('trace', {})
+    for phase, ms in trace.get('phase_ms', {}).items():
+        metrics[f'tsc_profile.phase_ms.{phase}'] = ms
+    if 'instantiated_types' in trace:
+        metrics['tsc_profile.instantiated_types'] = trace['instantiated_types']
+    for item in trace.get('slowest_files', []):
+        metrics[f'tsc_profile.file_check_ms.{item["file"]}'] = item['ms']
+    return metrics
+
+
+def format_profile(profile: Dict[str, Any], deltas: Dict[str, float], top: int) -> Iterable[str]:
+    """生成控制台输出"""
+    diagnostics = profile.get('diagnostics', {})
+    trace = profile.get('trace', {})
+
+    def delta(metric: str) -> str:
+        change = deltas.get(metric)
+        if change is None or abs(change) < 0.005:
+            return ''
+        return f" ({'+' if change > 0 else ''}{change:.2f})"
+
+    yield '⏱️  阶段耗时 (extendedDiagnostics, 秒)'
+    for key in ('i_o_read_time', 'parse_time', 'resolvemodule_time', 'resolvetypereference_time',
+                'program_time', 'bind_time', 'check_time', 'emit_time', 'total_time'):
+        if key in diagnostics:
+            yield f"  {key:<28}{diagnostics[key]:>10.2f}{delta('tsc_profile.' + key)}"
+    for key in ('files', 'lines_of_typescript', 'types', 'instantiations', 'symbols', 'memory_used'):
+        if key in diagnostics:
+            yield f"  {key:<28}{diagnostics[key]:>10.0f}{delta('tsc_profile.' + key)}"
+
+    if trace.get('phase_ms'):
+        yield ''
+        yield '⏱️  阶段耗时 (trace, 毫秒)'
+        for phase, ms in trace['phase_ms'].items():
+            yield f'  {phase:<28}{ms:>10.1f}'
+
+    sections = (
+        ('🐢 检查最慢的文件', 'slowest_files', lambda item: f"{item['ms']:>9.1f} ms  {item['file']}"),
+        ('🧮 最昂贵的类型关系比较', 'expensive_relations',
+         lambda item: f"{item['ms']:>9.1f} ms  ×{item['count']:<5} {item['source']}  →  {item['target']}"),
+        ('🧮 最昂贵的泛型变型计算', 'expensive_variances', lambda item: f"{item['ms']:>9.1f} ms  {item['type']}"),
+        ('🧬 实例化最多的泛型（types.json，按实例化出的类型数）', 'most_instantiated',
+         lambda item: f"{item['count']:>9} 个  {item['type']}"),
+        ('🧨 实例化超限 (instantiateType_DepthLimit)', 'instantiation_depth_limits',
+         lambda item: f"{item['hits']:>9} 次  深度 {item['depth']}，实例化 {item['instantiations']}  {item['type']}"),
+        ('🔎 最昂贵的表达式检查', 'expensive_expressions',
+         lambda item: f"{item['ms']:>9.1f} ms  {item['file']}:{item['line']}"),
+    )
+    for title, key, fmt in sections:
+        items = trace.get(key, [])[:top]
+        if items:
+            yield ''
+            yield title
+            for item in items:
+                yield '  ' + fmt(item)
+
+    if trace.get('parse_errors'):
+        yield ''
+        yield '⚠️  trace 文件解析失败（以上统计只包含出错位置之前的内容）'
+        for error in trace['parse_errors']:
+            yield f'  {error}'
@@ -11,6 +11,24 @@ for company_dir in projects/*/; do
     mkdir -p "public/projects/$company/knowledge"
     cp -r "$company_dir/knowledge"/* "public/projects/$company/knowledge/" 2>/dev/null
     
+    # 已有发布清单（migrate_knowledge_base.py 生成，含版本、补丁和统计信息）且所有文件都早于清单时保留；
+    # 有文件在发布后被修改时，清单中的统计信息已过期，改为生成只含文件名的清单
+    manifest="$company_dir/knowledge/_manifest.json"
+    if [ -f "$manifest" ]; then
+      stale=""
+      for file in "$company_dir/knowledge"/*.json; do
+        if [ "$file" -nt "$manifest" ]; then
+          stale="$file"
+          break
+        fi
+      done
+      if [ -z "$stale" ]; then
+        echo "✅ $company 完成"
+        continue
+      fi
+      echo "⚠️  $(basename "$stale") 在发布后被修改，重新生成文件清单（运行 migrate_knowledge_base.py --publish-only 更新发布）"
+    fi
+    
     # 生成文件清单（用于 Edge Runtime）
     json_files=()
     for file in "public/projects/$company/knowledge"/*.json; do
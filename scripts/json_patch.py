@@ -0,0 +1,160 @@
+"""
+RFC 6902 JSON Patch 的生成与应用
+
+make_patch 生成把 old 变成 new 的操作序列（只使用 add / remove / replace）：
+- 对象按键递归比较
+- 数组先用 SequenceMatcher 按元素内容对齐，插入/删除只产生对应的 add/remove，
+  修改过的元素继续递归，所以在长数组中间改一条答案只会得到一个 replace
+- 子树的差异比直接替换整个子树还大时，改用一个 replace
+apply_patch 用于发布前校验补丁（应用后必须与新版本完全一致）。
+"""
+
+import copy
+import difflib
+import hashlib
+import json
+from typing import Any, Dict, List
+
+Patch = List[Dict[str, Any]]
+
+
+def canonical_json(value: Any) -> str:
+    """键排序、无多余空白的序列化结果，用于比较和计算内容哈希"""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def content_hash(value: Any) -> str:
+    return hashlib.sha256(canonical_json(value).encode('utf-8')).hexdigest()
+
+
+def escape_token(token: Any) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def unescape_token(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def patch_size(patch: Patch) -> int:
+    return len(canonical_json(patch).encode('utf-8'))
+
+
+def _same(a: Any, b: Any) -> bool:
+    # 1 == True、1 == 1.0 在 Python 中成立，但在 JSON 中是不同的值；容器内的元素也要逐个比较类型
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(_same, a, b))
+    return a == b
+
+
+def _diff(old: Any, new: Any, path: str) -> Patch:
+    if _same(old, new):
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = _diff_object(old, new, path)
+    elif isinstance(old, list) and isinstance(new, list):
+        ops = _diff_array(old, new, path)
+    else:
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    replace = [{'op': 'replace', 'path': path, 'value': new}]
+    # 根节点用 '' 路径替换也是合法的
+    return ops if patch_size(ops) <= patch_size(replace) else replace
+
+
+def _diff_object(old: Dict[str, Any], new: Dict[str, Any], path: str) -> Patch:
+    ops: Patch = []
+    for key in old:
+        if key not in new:
+            ops.append({'op': 'remove', 'path': f'{path}/{escape_token(key)}'})
+    for key, value in new.items():
+        child = f'{path}/{escape_token(key)}'
+        if key not in old:
+            ops.append({'op': 'add', 'path': child, 'value': value})
+        else:
+            ops.extend(_diff(old[key], value, child))
+    return ops
+
+
+def _diff_array(old: List[Any], new: List[Any], path: str) -> Patch:
+    matcher = difflib.SequenceMatcher(None, [canonical_json(v) for v in old], [canonical_json(v) for v in new],
+                                      autojunk=False)
+    ops: Patch = []
+    # 从后往前生成操作，前面元素的下标不受后面修改的影响
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == 'equal':
+            continue
+        if tag == 'replace' and i2 - i1 == j2 - j1:
+            for offset in range(i2 - i1):
+                ops.extend(_diff(old[i1 + offset], new[j1 + offset], f'{path}/{i1 + offset}'))
+            continue
+        for _ in range(i2 - i1):
+            ops.append({'op': 'remove', 'path': f'{path}/{i1}'})
+        for offset in range(j2 - j1):
+            ops.append({'op': 'add', 'path': f'{path}/{i1 + offset}', 'value': new[j1 + offset]})
+    return ops
+
+
+def make_patch(old: Any, new: Any) -> Patch:
+    return _diff(old, new, '')
+
+
+def _resolve(document: Any, path: str):
+    """返回 (父节点, 最后一级 token)；path 为 '' 时父节点为 None"""
+    if path == '':
+        return None, ''
+    if not path.startswith('/'):
+        raise ValueError(f'无效的 JSON Pointer: {path}')
+    tokens = [unescape_token(token) for token in path[1:].split('/')]
+    node = document
+    for token in tokens[:-1]:
+        if isinstance(node, list):
+            node = node[int(token)]
+        elif isinstance(node, dict):
+            node = node[token]
+        else:
+            raise ValueError(f'路径 {path} 指向的不是容器')
+    return node, tokens[-1]
+
+
+def apply_patch(document: Any, patch: Patch) -> Any:
+    """在副本上依次应用 add / remove / replace，返回新文档"""
+    document = copy.deepcopy(document)
+    for op in patch:
+        kind = op.get('op')
+        path = op.get('path', '')
+        try:
+            parent, token = _resolve(document, path)
+            if parent is None:
+                if kind not in ('add', 'replace'):
+                    raise ValueError(f'不能对根节点执行 {kind}')
+                document = copy.deepcopy(op['value'])
+                continue
+            if kind == 'add':
+                value = copy.deepcopy(op['value'])
+                if isinstance(parent, list):
+                    index = len(parent) if token == '-' else int(token)
+                    if index > len(parent):
+                        raise IndexError(index)
+                    parent.insert(index, value)
+                else:
+                    parent[token] = value
+            elif kind == 'remove':
+                if isinstance(parent, list):
+                    del parent[int(token)]
+                else:
+                    del parent[token]
+            elif kind == 'replace':
+                if isinstance(parent, list):
+                    parent[int(token)] = copy.deepcopy(op['value'])
+                else:
+                    if token not in parent:
+                        raise KeyError(token)
+                    parent[token] = copy.deepcopy(op['value'])
+            else:
+                raise ValueError(f'不支持的操作: {kind}')
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f'无法应用 {kind} {path}: {e}') from e
+    return document
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+FAQ 知识库的紧凑二进制格式（.kbin）与 mmap 读取器
+
+批处理工具和检索索引构建往往只需要其中几条 FAQ，却要 json.load 整个 5-faq_detailed.json。
+.kbin 把一个租户的全部 FAQ 条目编码为（所有整数为小端）：
+
+    头部      magic 'KBIN'、版本、条目数、分类数、各段偏移、源内容 sha256
+    条目表    定长记录（按分类、id 排序）：id / 问题 / 答案 / 其他字段 在字符串区的偏移和长度，分类下标，标志位
+    id 索引   按 id 字节序排序的条目下标（u32），二分查找
+    分类表    定长记录：分类名偏移和长度、该分类第一条记录的下标、条目数
+    字符串区  UTF-8 文本（其他字段为紧凑 JSON）
+
+读取器用 mmap 打开文件，按 id 查找只访问几条定长记录，返回的条目持有 memoryview 切片，
+访问字段时才解码，不解析整个文件。
+
+    python scripts/knowledge_binary.py build projects/goldenyears/knowledge faq.kbin
+    python scripts/knowledge_binary.py get faq.kbin <id>
+    python scripts/knowledge_binary.py bench
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import random
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from code_health.knowledge_lint import iter_faq_entries, iter_knowledge_dirs  # noqa: E402
+
+MAGIC = b'KBIN'
+FORMAT_VERSION = 1
+# magic, 版本, 保留, 条目数, 分类数, 条目表偏移, id 索引偏移, 分类表偏移, 字符串区偏移, 源内容 sha256
+HEADER = struct.Struct('<4sHHIIIIII32s')
+# id, 问题, 答案, 其他字段 的 (偏移, 长度)；分类下标；标志位
+RECORD = struct.Struct('<8IHH')
+CATEGORY = struct.Struct('<4I')
+ID_ORDER = struct.Struct('<I')
+FLAG_ANSWER_JSON = 1
+# 这些字段单独存放，其余字段放进 extra
+CORE_FIELDS = ('id', 'question', 'answer', 'category')
+
+
+def iter_tenant_faq(knowledge_dir: Path) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """租户知识库中所有文件的 FAQ 条目（按文件名顺序）"""
+    for path in sorted(Path(knowledge_dir).glob('*.json')):
+        if path.name.startswith('_'):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        yield from iter_faq_entries(data)
+
+
+def encode(entries: List[Tuple[Dict[str, Any], Optional[str]]]) -> bytes:
+    """把 (条目, 分类) 列表编码为 .kbin"""
+    blob = bytearray()
+
+    def put(text: str) -> Tuple[int, int]:
+        data = text.encode('utf-8')
+        offset = len(blob)
+        blob.extend(data)
+        return offset, len(data)
+
+    source = hashlib.sha256()
+    rows = []
+    for position, (entry, category) in enumerate(entries):
+        entry_id = str(entry.get('id') or f'#{position}')
+        answer = entry.get('answer', '')
+        flags = 0
+        if not isinstance(answer, str):
+            answer = json.dumps(answer, ensure_ascii=False, separators=(',', ':'))
+            flags |= FLAG_ANSWER_JSON
+        extra = {key: value for key, value in entry.items() if key not in CORE_FIELDS}
+        extra_text = json.dumps(extra, ensure_ascii=False, separators=(',', ':')) if extra else ''
+        rows.append((category or '', entry_id, entry['question'], answer, extra_text, flags))
+        source.update(json.dumps([category, entry], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+    # 同一分类的条目连续存放；分类内按 id 排序（保持稳定顺序）
+    rows.sort(key=lambda row: (row[0], row[1].encode('utf-8')))
+    category_names: List[str] = []
+    category_index: Dict[str, int] = {}
+    category_ranges: Dict[str, List[int]] = {}
+    records = bytearray()
+    for index, (category, entry_id, question, answer, extra_text, flags) in enumerate(rows):
+        if category not in category_ranges:
+            category_ranges[category] = [index, 0]
+            category_index[category] = len(category_names)
+            category_names.append(category)
+        category_ranges[category][1] += 1
+        records.extend(RECORD.pack(*put(entry_id), *put(question), *put(answer), *put(extra_text),
+                                   category_index[category], flags))
+
+    id_order = sorted(range(len(rows)), key=lambda i: (rows[i][1].encode('utf-8'), i))
+    id_table = b''.join(ID_ORDER.pack(i) for i in id_order)
+    categories = bytearray()
+    for name in category_names:
+        first, count = category_ranges[name]
+        categories.extend(CATEGORY.pack(*put(name), first, count))
+
+    records_offset = HEADER.size
+    id_offset = records_offset + len(records)
+    categories_offset = id_offset + len(id_table)
+    blob_offset = categories_offset + len(categories)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(rows), len(category_names), records_offset, id_offset,
+                         categories_offset, blob_offset, source.digest())
+    return header + bytes(records) + id_table + bytes(categories) + bytes(blob)
+
+
+class Entry:
+    """一条 FAQ；字段在访问时才从 mmap 中解码"""
+
+    __slots__ = ('_reader', '_record')
+
+    def __init__(self, reader: 'KnowledgeBinary', record: Tuple[int, ...]):
+        self._reader = reader
+        self._record = record
+
+    def _view(self, field: int) -> memoryview:
+        offset, length = self._record[field * 2], self._record[field * 2 + 1]
+        start = self._reader.blob_offset + offset
+        return self._reader.view[start:start + length]
+
+    @property
+    def raw_answer(self) -> memoryview:
+        """答案的 UTF-8 字节（不复制；仍被引用时读取器关闭后延迟到切片释放时才解除映射）"""
+        return self._view(2)
+
+    @property
+    def id(self) -> str:
+        return str(self._view(0), 'utf-8')
+
+    @property
+    def question(self) -> str:
+        return str(self._view(1), 'utf-8')
+
+    @property
+    def answer(self) -> Any:
+        text = str(self._view(2), 'utf-8')
+        return json.loads(text) if self._record[9] & FLAG_ANSWER_JSON else text
+
+    @property
+    def category(self) -> str:
+        return self._reader.category_name(self._record[8])
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        view = self._view(3)
+        return json.loads(str(view, 'utf-8')) if len(view) else {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'id': self.id, 'question': self.question, 'answer': self.answer, 'category': self.category,
+                **self.extra}
+
+
+class KnowledgeBinary:
+    def __init__(self, path: Path):
+        self.closed = False
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._mmap)
+        (magic, version, _, self.entry_count, self.category_count, self.records_offset, self.id_offset,
+         self.categories_offset, self.blob_offset, self.source_sha256) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f'{path} 不是版本 {FORMAT_VERSION} 的 .kbin 文件')
+
+    def __enter__(self) -> 'KnowledgeBinary':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # mmap 持有自己的文件描述符副本，文件可以立即关闭
+        self._file.close()
+        # 先释放 memoryview，否则 mmap 无法关闭
+        self.view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 调用方仍持有 raw_answer 等切片：只丢弃读取器自己的引用，
+            # 映射在最后一个切片被回收时随 mmap 对象一起释放
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def _record(self, index: int) -> Tuple[int, ...]:
+        return RECORD.unpack_from(self._mmap, self.records_offset + index * RECORD.size)
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self.blob_offset + offset
+        return self._mmap[start:start + length]
+
+    def category_name(self, index: int) -> str:
+        offset, length, _, _ = CATEGORY.unpack_from(self._mmap, self.categories_offset + index * CATEGORY.size)
+        return self._string(offset, length).decode('utf-8')
+
+    def get(self, entry_id: str) -> Optional[Entry]:
+        """按 id 二分查找"""
+        key = entry_id.encode('utf-8')
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            index, = ID_ORDER.unpack_from(self._mmap, self.id_offset + middle * ID_ORDER.size)
+            record = self._record(index)
+            current = self._string(record[0], record[1])
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return Entry(self, record)
+        return None
+
+    def categories(self) -> Dict[str, int]:
+        result = {}
+        for index in range(self.category_count):
+            offset, length, _, count = CATEGORY.unpack_from(self._mmap, self.categories_offset + index * CATEGORY.size)
+            result[self._string(offset, length).decode('utf-8')] = count
+        return result
+
+    def by_category(self, name: str) -> Iterator[Entry]:
+        key = name.encode('utf-8')
+        for index in range(self.category_count):
+            offset, length, first, count = CATEGORY.unpack_from(self._mmap,
+                                                                self.categories_offset + index * CATEGORY.size)
+            if self._string(offset, length) == key:
+                for record_index in range(first, first + count):
+                    yield Entry(self, self._record(record_index))
+                return
+
+    def __iter__(self) -> Iterator[Entry]:
+        for index in range(self.entry_count):
+            yield Entry(self, self._record(index))
+
+
+def build_file(knowledge_dir: Path, output: Path) -> Optional[Dict[str, Any]]:
+    """把租户知识库中的 FAQ 写成 .kbin；没有 FAQ 时返回 None"""
+    entries = list(iter_tenant_faq(knowledge_dir))
+    if not entries:
+        return None
+    data = encode(entries)
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(data)
+    return {'entries': len(entries), 'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def benchmark(knowledge_dir: Path, lookups: int, seed: int = 0) -> Dict[str, Any]:
+    """比较单条查找的耗时：每次 json.load 全部文件 vs 每次打开 .kbin 查找"""
+    import tempfile
+
+    entries = list(iter_tenant_faq(knowledge_dir))
+    ids = [str(entry.get('id') or f'#{i}') for i, (entry, _) in enumerate(entries)]
+    sample = random.Random(seed).choices(ids, k=lookups)
+    json_bytes = sum(path.stat().st_size for path in knowledge_dir.glob('*.json') if not path.name.startswith('_'))
+
+    json_times = []
+    for entry_id in sample:
+        started = time.perf_counter()
+        found = None
+        for position, (entry, _) in enumerate(iter_tenant_faq(knowledge_dir)):
+            if str(entry.get('id') or f'#{position}') == entry_id:
+                found = entry['answer']
+                break
+        json_times.append(time.perf_counter() - started)
+        assert found is not None
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'faq.kbin'
+        info = build_file(knowledge_dir, path)
+        binary_times = []
+        for entry_id in sample:
+            started = time.perf_counter()
+            with KnowledgeBinary(path) as reader:
+                entry = reader.get(entry_id)
+                answer = entry.answer
+            binary_times.append(time.perf_counter() - started)
+            assert answer is not None
+
+    def summary(times: List[float]) -> Dict[str, float]:
+        return {'p50_us': round(percentile(times, 50) * 1e6, 1), 'p99_us': round(percentile(times, 99) * 1e6, 1)}
+
+    json_summary = summary(json_times)
+    binary_summary = summary(binary_times)
+    return {
+        'entries': len(entries),
+        'json_bytes': json_bytes,
+        'kbin_bytes': info['bytes'] if info else 0,
+        'json': json_summary,
+        'kbin': binary_summary,
+        'speedup': round(json_summary['p50_us'] / binary_summary['p50_us'], 1) if binary_summary['p50_us'] else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FAQ 二进制格式（.kbin）工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='把知识库目录中的 FAQ 编码为 .kbin')
+    build_parser.add_argument('knowledge_dir', type=Path)
+    build_parser.add_argument('output', type=Path)
+
+    get_parser = subparsers.add_parser('get', help='按 id 读取一条 FAQ')
+    get_parser.add_argument('path', type=Path)
+    get_parser.add_argument('id')
+
+    bench_parser = subparsers.add_parser('bench', help='与 json.load 比较单条查找耗时')
+    bench_parser.add_argument('--tenant', action='append', help='租户目录名（默认所有有 FAQ 的租户）')
+    bench_parser.add_argument('--lookups', type=int, default=200)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        info = build_file(args.knowledge_dir, args.output)
+        if info is None:
+            print(f'⚠️  {args.knowledge_dir} 中没有 FAQ 条目')
+            return 1
+        print(f"✅ {args.output}: {info['entries']} 条，{info['bytes']:,} 字节")
+        return 0
+
+    if args.command == 'get':
+        try:
+            reader = KnowledgeBinary(args.path)
+        except (OSError, ValueError) as e:
+            print(f'❌ {e}')
+            return 1
+        with reader:
+            entry = reader.get(args.id)
+            if entry is None:
+                print(f'❌ 找不到 {args.id}')
+                return 1
+            print(json.dumps(entry.to_dict(), ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{'租户':<20} {'条目':>6} {'JSON 字节':>11} {'kbin 字节':>11} {'json p50':>10} {'kbin p50':>10} {'加速':>7}")
+    for tenant, knowledge_dir in iter_knowledge_dirs(PROJECT_ROOT):
+        if args.tenant and tenant not in args.tenant:
+            continue
+        if not any(True for _ in iter_tenant_faq(knowledge_dir)):
+            continue
+        result = benchmark(knowledge_dir, args.lookups)
+        print(f"{tenant:<20} {result['entries']:>6} {result['json_bytes']:>11,} {result['kbin_bytes']:>11,} "
+              f"{result['json']['p50_us']:>8}µs {result['kbin']['p50_us']:>8}µs {result['speedup']:>6}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
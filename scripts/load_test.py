@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+聊天 / FAQ 菜单接口的压力测试工具
+
+按目标速率（开环、可选泊松到达）向多个租户、多个会话发送请求：
+- POST /api/{company}/chat：记录首个 token 时间（TTFT）和完整响应时间
+- GET /api/{company}/faq-menu：记录响应时间
+延迟从“计划发出时间”开始计算，客户端排队造成的延迟也会计入（避免协同遗漏），
+结果记录在 HDR 风格的对数-线性直方图中，可导出为 JSON 并在不同构建之间比较。
+
+为了不消耗真实的 Gemini 配额，mock 子命令（或 run --mock-port）启动一个兼容
+streamGenerateContent?alt=sse 的本地模拟服务，首 token 延迟、每 token 延迟、
+token 数和错误率均可配置。应用通过 GEMINI_BASE_URL 指向它：
+
+    python scripts/load_test.py mock --port 8787
+    GEMINI_API_KEY=mock GEMINI_BASE_URL=http://127.0.0.1:8787/v1beta npm run dev
+    python scripts/load_test.py run --rate 20 --duration 60 --out base.json
+    python scripts/load_test.py compare base.json candidate.json
+
+每个会话使用不同的 X-Forwarded-For，模拟不同客户端（否则所有请求都会落在同一个限流桶里）。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from code_health.knowledge_lint import iter_faq_entries, iter_knowledge_dirs  # noqa: E402
+from code_health.tenants import load_registry  # noqa: E402
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_MOCK_PORT = 8787
+# 在响应流中出现即视为收到第一个 token（UI message stream 的文本增量事件）
+TEXT_DELTA_MARKER = b'"text-delta"'
+FALLBACK_QUESTIONS = ['你好', '请问营业时间是几点？', '如何联系客服？']
+MOCK_TOKENS = ['您好', '，', '感谢', '您的', '咨询', '。', '我们', '的', '服务', '时间', '是', '周一',
+               '至', '周五', '，', '如有', '其他', '问题', '欢迎', '随时', '联系', '我们', '。']
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class HdrHistogram:
+    """
+    对数-线性分桶的直方图（HdrHistogram 的简化实现，值为整数微秒）
+
+    每个 2 的幂区间再等分为若干子桶，任意值的相对误差不超过 10^-significant_digits；
+    只保存非零桶，导出后可以合并（多次运行、多个进程）。
+    """
+
+    def __init__(self, significant_digits: int = 2):
+        self.significant_digits = significant_digits
+        largest_single_unit = 2 * 10 ** significant_digits
+        self.sub_bucket_bits = max(1, math.ceil(math.log2(largest_single_unit)))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.counts: Dict[int, int] = defaultdict(int)
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self.sum = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (value >> shift) - self.sub_bucket_half
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < self.sub_bucket_count:
+            return index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.sub_bucket_half + 1
+        sub_bucket = offset % self.sub_bucket_half + self.sub_bucket_half
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value: int, count: int = 1):
+        value = max(0, int(value))
+        self.counts[self._index(value)] += count
+        self.min = value if self.total == 0 else min(self.min, value)
+        self.max = max(self.max, value)
+        self.total += count
+        self.sum += value * count
+
+    def percentile(self, percentile: float) -> int:
+        """返回不小于该百分位的最小桶上界（与 HdrHistogram 一样偏保守）"""
+        if self.total == 0:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def merge(self, other: 'HdrHistogram'):
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError('只能合并精度相同的直方图')
+        if other.total == 0:
+            return
+        for index, count in other.counts.items():
+            self.counts[index] += count
+        self.min = other.min if self.total == 0 else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.total += other.total
+        self.sum += other.sum
+
+    def summary_ms(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            'count': self.total,
+            'min': round(self.min / 1000, 1),
+            'mean': round(self.mean() / 1000, 1),
+            'max': round(self.max / 1000, 1)
+        }
+        for percentile in PERCENTILES:
+            summary[f'p{percentile:g}'] = round(self.percentile(percentile) / 1000, 1)
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'significant_digits': self.significant_digits,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'sum': self.sum,
+            'counts': {str(index): count for index, count in sorted(self.counts.items())},
+            'summary_ms': self.summary_ms()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'HdrHistogram':
+        histogram = cls(data.get('significant_digits', 2))
+        for index, count in data.get('counts', {}).items():
+            histogram.counts[int(index)] = count
+        histogram.total = data.get('total', 0)
+        histogram.min = data.get('min', 0)
+        histogram.max = data.get('max', 0)
+        histogram.sum = data.get('sum', 0)
+        return histogram
+
+
+# ---------------------------------------------------------------------------
+# 模拟 Gemini 服务
+# ---------------------------------------------------------------------------
+
+class MockGeminiServer:
+    """兼容 models/{model}:streamGenerateContent?alt=sse 的最小 HTTP 服务"""
+
+    def __init__(self, first_token_ms: float = 300, token_ms: float = 20, tokens: int = 80,
+                 jitter: float = 0.2, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.peak_active = 0
+        self.server: Optional[asyncio.base_events.Server] = None
+
+    def _delay(self, base_ms: float) -> float:
+        if self.jitter:
+            base_ms *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, base_ms) / 1000
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_MOCK_PORT):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'requests': self.requests, 'errors': self.errors, 'peak_active': self.peak_active}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            request_line = await reader.readline()
+            headers = await read_headers(reader)
+            length = int(headers.get('content-length', '0') or 0)
+            if length:
+                await reader.readexactly(length)
+            parts = request_line.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else '/'
+            self.requests += 1
+            if ':streamGenerateContent' not in path and ':generateContent' not in path:
+                await self.respond_json(writer, 404, {'error': {'code': 404, 'message': f'unknown path {path}',
+                                                                'status': 'NOT_FOUND'}})
+                return
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                await asyncio.sleep(self._delay(self.first_token_ms))
+                await self.respond_json(writer, 503, {'error': {'code': 503, 'message': 'mock overload',
+                                                                'status': 'UNAVAILABLE'}})
+                return
+            if ':streamGenerateContent' in path:
+                await self.stream(writer)
+            else:
+                await asyncio.sleep(self._delay(self.first_token_ms + self.token_ms * self.tokens))
+                await self.respond_json(writer, 200, self.chunk(self.text(self.tokens), finish=True))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    def text(self, count: int) -> str:
+        return ''.join(MOCK_TOKENS[i % len(MOCK_TOKENS)] for i in range(count))
+
+    def chunk(self, text: str, finish: bool = False) -> Dict[str, Any]:
+        candidate: Dict[str, Any] = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+        chunk: Dict[str, Any] = {'candidates': [candidate]}
+        if finish:
+            candidate['finishReason'] = 'STOP'
+            chunk['usageMetadata'] = {'promptTokenCount': 0, 'candidatesTokenCount': self.tokens,
+                                      'totalTokenCount': self.tokens}
+        return chunk
+
+    async def respond_json(self, writer: asyncio.StreamWriter, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n'
+            .encode('latin-1') + payload
+        )
+        await writer.drain()
+
+    async def stream(self, writer: asyncio.StreamWriter):
+        # 不使用 chunked 编码，响应以关闭连接结束
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        await asyncio.sleep(self._delay(self.first_token_ms))
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self._delay(self.token_ms))
+            event = self.chunk(MOCK_TOKENS[i % len(MOCK_TOKENS)], finish=i == self.tokens - 1)
+            writer.write(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\r\n\r\n')
+            await writer.drain()
+
+
+# ---------------------------------------------------------------------------
+# HTTP 客户端（每个请求一个连接，流式读取响应体）
+# ---------------------------------------------------------------------------
+
+async def read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def iter_body(reader: asyncio.StreamReader, headers: Dict[str, str]):
+    """按 chunked / Content-Length / 关闭连接三种方式读取响应体"""
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                return
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                await read_headers(reader)
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    elif 'content-length' in headers:
+        remaining = int(headers['content-length'])
+        while remaining > 0:
+            data = await reader.read(min(remaining, 65536))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+    else:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            yield data
+
+
+class RequestOutcome:
+    __slots__ = ('endpoint', 'status', 'error', 'ttft_us', 'latency_us', 'bytes')
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.status = 0
+        self.error: Optional[str] = None
+        self.ttft_us: Optional[int] = None
+        self.latency_us = 0
+        self.bytes = 0
+
+
+async def send_request(base: Tuple[str, int, bool], method: str, path: str, headers: Dict[str, str],
+                       body: Optional[bytes], outcome: RequestOutcome, scheduled: float, timeout: float):
+    """发送请求并流式读取响应；TTFT 和总延迟都从计划发出时间 scheduled 算起"""
+    host, port, use_tls = base
+
+    async def run():
+        reader, writer = await asyncio.open_connection(host, port, ssl=use_tls or None)
+        try:
+            lines = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: close',
+                     'Accept: */*']
+            lines.extend(f'{name}: {value}' for name, value in headers.items())
+            if body is not None:
+                lines.append(f'Content-Length: {len(body)}')
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + (body or b''))
+            await writer.drain()
+
+            status_line = await reader.readline()
+            parts = status_line.split()
+            if len(parts) < 2:
+                raise ConnectionError('empty response')
+            outcome.status = int(parts[1])
+            response_headers = await read_headers(reader)
+            # 标记可能被拆到两个分块里，保留上一块的尾部一起查找
+            tail = b''
+            async for data in iter_body(reader, response_headers):
+                outcome.bytes += len(data)
+                if outcome.ttft_us is None and outcome.endpoint == 'chat':
+                    if TEXT_DELTA_MARKER in tail + data:
+                        outcome.ttft_us = int((time.perf_counter() - scheduled) * 1_000_000)
+                    tail = data[-len(TEXT_DELTA_MARKER):]
+        finally:
+            writer.close()
+
+    try:
+        await asyncio.wait_for(run(), timeout)
+        if outcome.status >= 400:
+            outcome.error = 'rate_limited' if outcome.status == 429 else f'http_{outcome.status}'
+        elif outcome.endpoint == 'chat' and outcome.ttft_us is None:
+            outcome.error = 'no_tokens'
+    except asyncio.TimeoutError:
+        outcome.error = 'timeout'
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        outcome.error = type(e).__name__
+    outcome.latency_us = int((time.perf_counter() - scheduled) * 1_000_000)
+
+
+# ---------------------------------------------------------------------------
+# 负载生成
+# ---------------------------------------------------------------------------
+
+class Session:
+    def __init__(self, index: int, tenant: str, run_id: str):
+        self.tenant = tenant
+        self.session_id = f'load-{run_id}-{index}'
+        # 10.0.0.0/8 内按会话编号分配，每个会话一个限流桶
+        self.ip = f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+
+
+def load_questions(root: Path, tenants: List[str]) -> Dict[str, List[str]]:
+    """从各租户知识库中取出 FAQ 问题作为请求内容"""
+    directories = {tenant.id: tenant.directory.split('/', 1)[1] for tenant in load_registry(root, True)}
+    questions: Dict[str, List[str]] = {}
+    knowledge_dirs = dict(iter_knowledge_dirs(root))
+    for tenant in tenants:
+        knowledge_dir = knowledge_dirs.get(directories.get(tenant, tenant))
+        found: List[str] = []
+        if knowledge_dir is not None:
+            for path in sorted(knowledge_dir.glob('*.json')):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                found.extend(entry['question'] for entry, _ in iter_faq_entries(data))
+        questions[tenant] = found or FALLBACK_QUESTIONS
+    return questions
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, tenants: List[str], questions: Dict[str, List[str]], rate: float,
+                 duration: float, sessions: int = 100, faq_ratio: float = 0.1, poisson: bool = True,
+                 max_in_flight: int = 1000, timeout: float = 60, seed: Optional[int] = None):
+        parts = urlsplit(base_url)
+        use_tls = parts.scheme == 'https'
+        self.base = (parts.hostname or 'localhost', parts.port or (443 if use_tls else 80), use_tls)
+        self.path_prefix = parts.path.rstrip('/')
+        self.rate = rate
+        self.duration = duration
+        self.faq_ratio = faq_ratio
+        self.poisson = poisson
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        run_id = f'{int(time.time()):x}'
+        self.sessions = [Session(i, tenants[i % len(tenants)], run_id) for i in range(sessions)]
+        self.questions = questions
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.histograms: Dict[str, HdrHistogram] = {}
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.bytes = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.max_lag_us = 0
+
+    def histogram(self, name: str) -> HdrHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = HdrHistogram()
+        return histogram
+
+    def arrivals(self):
+        """计划发出时间（相对开始时间的秒数）：固定间隔或泊松过程"""
+        at = 0.0
+        while True:
+            at += self.random.expovariate(self.rate) if self.poisson else 1 / self.rate
+            if at >= self.duration:
+                return
+            yield at
+
+    async def one(self, scheduled: float):
+        session = self.random.choice(self.sessions)
+        headers = {'X-Forwarded-For': session.ip, 'User-Agent': 'load_test.py'}
+        if self.random.random() < self.faq_ratio:
+            outcome = RequestOutcome('faq_menu')
+            method, path, body = 'GET', f'{self.path_prefix}/api/{session.tenant}/faq-menu', None
+        else:
+            outcome = RequestOutcome('chat')
+            method, path = 'POST', f'{self.path_prefix}/api/{session.tenant}/chat'
+            question = self.random.choice(self.questions[session.tenant])
+            body = json.dumps({'message': question, 'sessionId': session.session_id},
+                              ensure_ascii=False).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        async with self.semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                await send_request(self.base, method, path, headers, body, outcome, scheduled, self.timeout)
+            finally:
+                self.in_flight -= 1
+
+        self.counts[outcome.endpoint] += 1
+        self.bytes += outcome.bytes
+        if outcome.error:
+            self.errors[outcome.endpoint][outcome.error] += 1
+            return
+        self.histogram(f'{outcome.endpoint}.latency').record(outcome.latency_us)
+        if outcome.ttft_us is not None:
+            self.histogram(f'{outcome.endpoint}.ttft').record(outcome.ttft_us)
+
+    async def run(self) -> Dict[str, Any]:
+        loop_start = time.perf_counter()
+        tasks = []
+        for offset in self.arrivals():
+            scheduled = loop_start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 事件循环跟不上目标速率（客户端本身成为瓶颈）
+                self.max_lag_us = max(self.max_lag_us, int(-delay * 1_000_000))
+            tasks.append(asyncio.ensure_future(self.one(scheduled)))
+        await asyncio.gather(*tasks)
+        return self.results(time.perf_counter() - loop_start)
+
+    def results(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, count in sorted(self.counts.items()):
+            errors = dict(self.errors.get(endpoint, {}))
+            error_count = sum(errors.values())
+            endpoints[endpoint] = {
+                'requests': count,
+                'errors': error_count,
+                'error_rate': round(error_count / count, 4) if count else 0,
+                'errors_by_type': errors,
+                'throughput': round((count - error_count) / elapsed, 2) if elapsed else 0
+            }
+        return {
+            'elapsed': round(elapsed, 2),
+            'target_rate': self.rate,
+            'achieved_rate': round(sum(self.counts.values()) / elapsed, 2) if elapsed else 0,
+            'peak_in_flight': self.peak_in_flight,
+            'max_scheduler_lag_ms': round(self.max_lag_us / 1000, 1),
+            'bytes_received': self.bytes,
+            'endpoints': endpoints,
+            'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+        }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() or None
+
+
+def print_results(results: Dict[str, Any]):
+    print(f"\n⏱️  {results['elapsed']}s，目标 {results['target_rate']} req/s，实际 {results['achieved_rate']} req/s，"
+          f"峰值并发 {results['peak_in_flight']}")
+    if results['max_scheduler_lag_ms'] > 10:
+        print(f"⚠️  发送端最大滞后 {results['max_scheduler_lag_ms']} ms，客户端可能已成为瓶颈")
+    for endpoint, stats in results['endpoints'].items():
+        print(f"\n{endpoint}: {stats['requests']} 个请求，错误率 {stats['error_rate'] * 100:.2f}%，"
+              f"成功吞吐 {stats['throughput']} req/s")
+        for error, count in sorted(stats['errors_by_type'].items()):
+            print(f'  ❌ {error}: {count}')
+    print(f"\n{'指标':<20} {'count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'p99.9':>9} {'max':>9}  (ms)")
+    for name, histogram in results['histograms'].items():
+        summary = histogram['summary_ms']
+        print(f"{name:<20} {summary['count']:>7} {summary['p50']:>9} {summary['p90']:>9} {summary['p99']:>9} "
+              f"{summary['p99.9']:>9} {summary['max']:>9}")
+    if results.get('mock'):
+        mock = results['mock']
+        print(f"\n🤖 模拟 Gemini：{mock['requests']} 个请求，注入错误 {mock['errors']}，峰值并发 {mock['peak_active']}")
+
+
+def mock_from_args(args) -> MockGeminiServer:
+    return MockGeminiServer(first_token_ms=args.first_token_ms, token_ms=args.token_ms, tokens=args.tokens,
+                            jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+
+
+async def run_mock(args):
+    mock = mock_from_args(args)
+    await mock.start(args.host, args.port)
+    print(f'🤖 模拟 Gemini 服务: http://{args.host}:{args.port}/v1beta '
+          f'(首 token {args.first_token_ms}ms，每 token {args.token_ms}ms，{args.tokens} 个 token)')
+    print(f'   启动应用时设置 GEMINI_BASE_URL=http://{args.host}:{args.port}/v1beta')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mock.stop()
+
+
+async def run_load(args) -> Dict[str, Any]:
+    if args.tenant:
+        tenants = args.tenant
+    else:
+        tenants = [tenant.id for tenant in load_registry(PROJECT_ROOT)]
+    questions = load_questions(PROJECT_ROOT, tenants)
+
+    mock = None
+    if args.mock_port:
+        # 同进程内启动模拟服务；应用需以 GEMINI_BASE_URL 指向该端口
+        mock = mock_from_args(args)
+        await mock.start('127.0.0.1', args.mock_port)
+
+    generator = LoadGenerator(args.base_url, tenants, questions, args.rate, args.duration,
+                              sessions=args.sessions, faq_ratio=args.faq_ratio, poisson=not args.uniform,
+                              max_in_flight=args.max_in_flight, timeout=args.timeout, seed=args.seed)
+    print(f'🚀 {args.base_url}: {args.rate} req/s × {args.duration}s，{len(tenants)} 个租户，{args.sessions} 个会话')
+    try:
+        results = await generator.run()
+    finally:
+        if mock is not None:
+            await mock.stop()
+
+    results.update({
+        'format': RESULT_FORMAT_VERSION,
+        'label': args.label or git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'base_url': args.base_url, 'rate': args.rate, 'duration': args.duration, 'tenants': tenants,
+            'sessions': args.sessions, 'faq_ratio': args.faq_ratio, 'poisson': not args.uniform,
+            'max_in_flight': args.max_in_flight
+        }
+    })
+    if mock is not None:
+        results['mock'] = mock.stats()
+    return results
+
+
+def compare_results(base: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """逐个直方图比较 p50/p90/p99，以及各接口错误率"""
+    rows = []
+    for name in sorted(set(base.get('histograms', {})) | set(candidate.get('histograms', {}))):
+        if name not in base['histograms'] or name not in candidate['histograms']:
+            continue
+        before = HdrHistogram.from_dict(base['histograms'][name])
+        after = HdrHistogram.from_dict(candidate['histograms'][name])
+        for percentile in (50, 90, 99):
+            old = before.percentile(percentile) / 1000
+            new = after.percentile(percentile) / 1000
+            change = (new - old) / old if old else 0.0
+            rows.append({
+                'metric': f'{name}.p{percentile}', 'base': round(old, 1), 'candidate': round(new, 1),
+                'change_pct': round(change * 100, 1), 'regression': change > threshold
+            })
+    for endpoint in sorted(set(base.get('endpoints', {})) & set(candidate.get('endpoints', {}))):
+        old = base['endpoints'][endpoint]['error_rate']
+        new = candidate['endpoints'][endpoint]['error_rate']
+        rows.append({
+            'metric': f'{endpoint}.error_rate', 'base': old, 'candidate': new,
+            'change_pct': round((new - old) * 100, 2),
+            # 错误率按绝对百分点比较
+            'regression': new - old > 0.01
+        })
+    return rows
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != RESULT_FORMAT_VERSION:
+        raise ValueError(f'{path} 不是 load_test.py 的结果文件')
+    return data
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--first-token-ms', type=float, default=300, help='模拟首 token 延迟（毫秒）')
+    parser.add_argument('--token-ms', type=float, default=20, help='模拟每个后续 token 的间隔（毫秒）')
+    parser.add_argument('--tokens', type=int, default=80, help='每个响应的 token 数')
+    parser.add_argument('--jitter', type=float, default=0.2, help='延迟的随机抖动比例')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的比例')
+    parser.add_argument('--seed', type=int, help='随机种子（便于复现）')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='聊天 / FAQ 菜单接口压力测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    mock_parser = subparsers.add_parser('mock', help='启动模拟 Gemini 流式服务')
+    mock_parser.add_argument('--host', default='127.0.0.1')
+    mock_parser.add_argument('--port', type=int, default=DEFAULT_MOCK_PORT)
+    add_mock_arguments(mock_parser)
+
+    run_parser = subparsers.add_parser('run', help='按目标速率发送请求并记录延迟')
+    run_parser.add_argument('--base-url', default='http://localhost:3000', help='应用地址')
+    run_parser.add_argument('--rate', type=float, default=10, help='目标请求速率（req/s）')
+    run_parser.add_argument('--duration', type=float, default=30, help='持续时间（秒）')
+    run_parser.add_argument('--tenant', action='append', help='只测试指定租户（可多次指定，默认所有启用的租户）')
+    run_parser.add_argument('--sessions', type=int, default=100, help='模拟的会话数')
+    run_parser.add_argument('--faq-ratio', type=float, default=0.1, help='faq-menu 请求的比例')
+    run_parser.add_argument('--uniform', action='store_true', help='固定间隔发送（默认泊松到达）')
+    run_parser.add_argument('--max-in-flight', type=int, default=1000, help='最大并发连接数')
+    run_parser.add_argument('--timeout', type=float, default=60, help='单个请求超时（秒）')
+    run_parser.add_argument('--mock-port', type=int, help='同时在该端口启动模拟 Gemini 服务')
+    run_parser.add_argument('--label', help='结果标签（默认当前 commit）')
+    run_parser.add_argument('--out', help='把结果（含直方图）导出为 JSON')
+    add_mock_arguments(run_parser)
+
+    compare_parser = subparsers.add_parser('compare', help='比较两次运行的结果')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='延迟增加超过该比例视为回归')
+
+    args = parser.parse_args()
+
+    if args.command == 'mock':
+        try:
+            asyncio.run(run_mock(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == 'run':
+        if args.rate <= 0 or args.duration <= 0:
+            parser.error('--rate 和 --duration 必须大于 0')
+        results = asyncio.run(run_load(args))
+        print_results(results)
+        if args.out:
+            Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f'\n📄 结果已保存: {args.out}')
+        return 0
+
+    try:
+        base = load_results(args.base)
+        candidate = load_results(args.candidate)
+    except (OSError, ValueError) as e:
+        print(f'❌ {e}')
+        return 2
+    rows = compare_results(base, candidate, args.threshold)
+    print(f"比较 {base.get('label') or args.base} → {candidate.get('label') or args.candidate}\n")
+    print(f"{'指标':<28} {'基线':>10} {'候选':>10} {'变化':>9}")
+    for row in rows:
+        unit = 'pp' if row['metric'].endswith('error_rate') else '%'
+        marker = '  ⚠️' if row['regression'] else ''
+        print(f"{row['metric']:<28} {row['base']:>10} {row['candidate']:>10} {row['change_pct']:>+8}{unit}{marker}")
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f'\n⚠️  {len(regressions)} 项回归')
+        return 1
+    print('\n✅ 没有回归')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,16 +6,40 @@
 功能：
 1. 备份现有知识库文件
 2. 从 chatbot-service 复制知识库到 1chatbot-service/projects
-3. 同步知识库到 public 目录（静态网站访问）
-4. 验证 JSON 文件格式
+3. 验证 JSON 文件格式
+4. 发布到 public 目录（静态网站访问）：每个专案有单调递增的发布版本号，
+   变化的文件附带相对上一版本的 RFC 6902 JSON Patch，缓存了旧版本的客户端
+   可以按清单中的补丁链增量更新，而不必重新下载整个文件
+
+发布目录结构（public/projects/<专案>/knowledge/）：
+- _manifest.json：version（发布版本号）、files、entries（每个文件的版本、哈希、字节数、补丁链、
+  统计信息 stats，格式同 loader.ts 的 getFileStats）
+- _patches/<文件名（不含扩展名）>/<from>-<to>.json：补丁
+- _releases/<上一版本>/：上一个发布的完整文件，部署切换期间仍可访问
+- _faq.kbin：全部 FAQ 的随机访问二进制编码（见 knowledge_binary.py），清单的 faq_index 记录其大小和哈希
+
+5. 按部署分组输出（dist/knowledge/<分组>/）：只包含 registry.json 中 active 的租户，
+   分组名为 deployment，设置了 group 时为 <deployment>.<group>。每个分组包含其租户的发布目录
+   （projects/<租户>/knowledge/）和 index.json（租户列表、每个租户的内容哈希、分组的聚合哈希），
+   每个部署只上传和预热自己的租户；聚合哈希不变的分组无需重新部署。
+   dist/knowledge/partitions.json 汇总所有分组的聚合哈希。
 """
 
+import argparse
 import os
 import shutil
+import re
 import json
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent))
+
+from code_health.tenants import load_registry  # noqa: E402
+from json_patch import apply_patch, content_hash, make_patch, patch_size  # noqa: E402
+from knowledge_binary import build_file as build_faq_binary  # noqa: E402
+
 # 路径配置
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -23,6 +47,18 @@ SOURCE_DIR = PROJECT_ROOT.parent / "chatbot-service" / "projects"
 TARGET_DIR = PROJECT_ROOT / "projects"
 PUBLIC_DIR = PROJECT_ROOT / "public" / "projects"
 BACKUP_DIR = PROJECT_ROOT / "projects_backup"
+DIST_DIR = PROJECT_ROOT / "dist" / "knowledge"
+
+MANIFEST_NAME = "_manifest.json"
+PATCHES_DIR_NAME = "_patches"
+RELEASES_DIR_NAME = "_releases"
+FAQ_BINARY_NAME = "_faq.kbin"
+PARTITION_INDEX_NAME = "index.json"
+PARTITIONS_NAME = "partitions.json"
+# 每个文件最多保留的补丁数，更旧的客户端直接重新获取整个文件
+MAX_PATCH_CHAIN = 10
+# 补丁超过完整文件的这一比例时不发布补丁
+MAX_PATCH_RATIO = 0.5
 
 def validate_json(file_path: Path) -> tuple[bool, str]:
     """验证 JSON 文件格式"""
@@ -73,7 +109,6 @@ def migrate_project_knowledge(project: str) -> dict:
     """迁移单个专案的知识库"""
     source_kb = SOURCE_DIR / project / "knowledge"
     target_kb = TARGET_DIR / project / "knowledge"
-    public_kb = PUBLIC_DIR / project / "knowledge"
     
     result = {
         "project": project,
@@ -88,17 +123,14 @@ def migrate_project_knowledge(project: str) -> dict:
     
     # 创建目标目录
     target_kb.mkdir(parents=True, exist_ok=True)
-    public_kb.mkdir(parents=True, exist_ok=True)
     
     # 复制所有 JSON 文件
     json_files = list(source_kb.glob("*.json"))
     
     for json_file in json_files:
         try:
-            # 复制到 projects 目录
+            # 复制到 projects 目录（public 目录由 publish_release 发布）
             shutil.copy2(json_file, target_kb / json_file.name)
-            # 复制到 public 目录
-            shutil.copy2(json_file, public_kb / json_file.name)
             
             # 验证 JSON 格式
             is_valid, error_msg = validate_json(target_kb / json_file.name)
@@ -113,60 +145,365 @@ def migrate_project_knowledge(project: str) -> dict:
     
     return result
 
-def create_manifest(project: str):
-    """创建 _manifest.json 文件"""
+def load_json_file(file_path: Path):
+    """读取 JSON 文件，不存在或无法解析时返回 None"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_previous_manifest(public_kb: Path) -> dict | None:
+    """上一个发布的清单；旧格式（文件名数组或 "1.0.0" 版本号）视为尚未发布过"""
+    manifest = load_json_file(public_kb / MANIFEST_NAME)
+    if isinstance(manifest, dict) and isinstance(manifest.get("version"), int):
+        return manifest
+    return None
+
+def keep_previous_release(public_kb: Path, previous: dict):
+    """把上一个发布的完整文件保存到 _releases/<版本>/，只保留这一个旧版本"""
+    releases_dir = public_kb / RELEASES_DIR_NAME
+    release_dir = releases_dir / str(previous["version"])
+    if releases_dir.exists():
+        for old in releases_dir.iterdir():
+            if old != release_dir:
+                shutil.rmtree(old)
+    release_dir.mkdir(parents=True, exist_ok=True)
+    for name in previous.get("files", []) + [MANIFEST_NAME, FAQ_BINARY_NAME]:
+        if (public_kb / name).exists():
+            shutil.copy2(public_kb / name, release_dir / name)
+
+def build_patch(public_kb: Path, name: str, previous_entry: dict, data, digest: str, size: int,
+                release: int) -> dict | None:
+    """生成从上一版本到当前版本的补丁并校验；补丁不可用时返回 None"""
+    old = load_json_file(public_kb / name)
+    # public 中的文件被其他途径改动过时，无法保证补丁基于客户端持有的版本
+    if old is None or content_hash(old) != previous_entry.get("sha256"):
+        return None
+    patch = make_patch(old, data)
+    try:
+        if content_hash(apply_patch(old, patch)) != digest:
+            return None
+    except ValueError:
+        return None
+    patch_bytes = patch_size(patch)
+    if patch_bytes > size * MAX_PATCH_RATIO:
+        return None
+
+    relative_path = f"{PATCHES_DIR_NAME}/{Path(name).stem}/{previous_entry['release']}-{release}.json"
+    patch_file = public_kb / relative_path
+    patch_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(patch_file, 'w', encoding='utf-8') as f:
+        json.dump(patch, f, ensure_ascii=False, separators=(',', ':'))
+    return {"from": previous_entry["release"], "to": release, "path": relative_path, "bytes": patch_bytes}
+
+def prune_patches(public_kb: Path, entries: dict):
+    """删除清单中不再引用的补丁"""
+    patches_dir = public_kb / PATCHES_DIR_NAME
+    if not patches_dir.exists():
+        return
+    referenced = {patch["path"] for entry in entries.values() for patch in entry.get("patches", [])}
+    for patch_file in patches_dir.rglob("*.json"):
+        if patch_file.is_file() and patch_file.relative_to(public_kb).as_posix() not in referenced:
+            patch_file.unlink()
+    for directory in sorted(patches_dir.iterdir(), reverse=True):
+        if directory.is_dir() and not any(directory.iterdir()):
+            directory.rmdir()
+
+def write_faq_binary(knowledge_dir: Path, public_kb: Path) -> dict | None:
+    """把专案的全部 FAQ 写成 _faq.kbin；没有 FAQ 时删除旧文件"""
+    info = build_faq_binary(knowledge_dir, public_kb / FAQ_BINARY_NAME)
+    if info is None:
+        (public_kb / FAQ_BINARY_NAME).unlink(missing_ok=True)
+        return None
+    return {"path": FAQ_BINARY_NAME, **info}
+
+def write_manifest(knowledge_dir: Path, public_kb: Path, manifest: dict, result: dict):
+    try:
+        with open(public_kb / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        shutil.copy2(public_kb / MANIFEST_NAME, knowledge_dir / MANIFEST_NAME)
+    except OSError as e:
+        result["errors"].append(f"写入 manifest 失败: {e}")
+
+def _truthy(value) -> bool:
+    # 按 JavaScript 的真值判断：空数组、空对象也算存在
+    return value is not None and value is not False and value != 0 and value != ""
+
+def _count(value) -> int:
+    return len(value) if isinstance(value, (list, dict)) else 0
+
+def _names(value, *fields) -> list:
+    """数组或对象的值中，取每一项第一个非空的字段"""
+    items = value if isinstance(value, list) else list(value.values()) if isinstance(value, dict) else []
+    names = []
+    for item in items:
+        if isinstance(item, dict):
+            name = next((item[field] for field in fields if item.get(field)), None)
+            if name:
+                names.append(name)
+    return names
+
+def file_stats(name: str, data) -> dict:
+    """
+    知识库文件的统计信息，与 lib/knowledge/loader.ts 的 getFileStats 结果一致
+
+    发布时计算一次写入清单，加载时直接读取，不必每次遍历数据。
+    """
+    key = re.sub(r"^\d+-", "", Path(name).stem)
+    stats = {}
+    if not isinstance(data, dict):
+        return stats
+
+    if key == "services":
+        if _truthy(data.get("services")):
+            stats["count"] = _count(data["services"])
+            stats["items"] = _names(data["services"], "name", "id")
+    elif key == "company_info":
+        if _truthy(data.get("branches")):
+            stats["branches"] = _count(data["branches"])
+            stats["branchNames"] = _names(data["branches"], "name")
+        if "contact_channels" in data or "contact" in data:
+            stats["hasContact"] = True
+    elif key == "faq_detailed":
+        categories = data.get("categories")
+        if isinstance(categories, (dict, list)):
+            # Object.keys 对数组返回下标字符串
+            if isinstance(categories, list):
+                categories = {str(index): category for index, category in enumerate(categories)}
+            stats["categories"] = len(categories)
+            stats["categoryNames"] = list(categories)
+            stats["totalQuestions"] = sum(
+                len(category["questions"]) for category in categories.values()
+                if isinstance(category, dict) and isinstance(category.get("questions"), list)
+            )
+    elif key == "ai_config":
+        if _truthy(data.get("intents")):
+            stats["intents"] = _count(data["intents"])
+        if _truthy(data.get("entities")):
+            stats["entities"] = _count(data["entities"])
+    elif key in ("response_templates", "personas"):
+        field = "templates" if key == "response_templates" else "personas"
+        if _truthy(data.get(field)):
+            stats[field] = _count(data[field])
+    return stats
+
+def publish_release(project: str) -> dict:
+    """
+    把 projects/<专案>/knowledge 发布到 public 目录
+
+    内容（按规范化 JSON 的 sha256）与上一个发布相同时不产生新版本；
+    否则版本号加一，变化的文件在补丁链末尾追加一个补丁，并写入新的 _manifest.json。
+    """
     knowledge_dir = TARGET_DIR / project / "knowledge"
-    public_knowledge_dir = PUBLIC_DIR / project / "knowledge"
-    
+    public_kb = PUBLIC_DIR / project / "knowledge"
+    result = {"project": project, "release": None, "changed": [], "removed": [], "patch_bytes": 0,
+              "full_bytes": 0, "errors": []}
+
     if not knowledge_dir.exists():
-        return
-    
+        return result
+
     # 获取所有 JSON 文件
     json_files = sorted([f.name for f in knowledge_dir.glob("*.json") if not f.name.startswith("_")])
-    
+    current = {}
+    for name in json_files:
+        data = load_json_file(knowledge_dir / name)
+        if data is None:
+            result["errors"].append(f"{name}: 无法解析，未发布")
+            continue
+        current[name] = (data, content_hash(data), (knowledge_dir / name).stat().st_size)
+    json_files = [name for name in json_files if name in current]
+
+    previous = load_previous_manifest(public_kb)
+    previous_entries = previous.get("entries", {}) if previous else {}
+    changed = [name for name in json_files if previous_entries.get(name, {}).get("sha256") != current[name][1]]
+    removed = [name for name in previous_entries if name not in current]
+    if previous and not changed and not removed:
+        result["release"] = previous["version"]
+        # 早于二进制格式或统计信息的发布：补上缺少的内容，内容未变所以不增加版本号
+        backfill = False
+        if "faq_index" not in previous or not (public_kb / previous["faq_index"]["path"]).exists():
+            faq_index = write_faq_binary(knowledge_dir, public_kb)
+            if faq_index:
+                previous["faq_index"] = faq_index
+                backfill = True
+        for name, entry in previous_entries.items():
+            if "stats" not in entry:
+                entry["stats"] = file_stats(name, current[name][0])
+                backfill = True
+        if backfill:
+            write_manifest(knowledge_dir, public_kb, previous, result)
+        return result
+
+    release = previous["version"] + 1 if previous else 1
+    public_kb.mkdir(parents=True, exist_ok=True)
+    if previous:
+        keep_previous_release(public_kb, previous)
+
+    entries = {}
+    for name in json_files:
+        data, digest, size = current[name]
+        previous_entry = previous_entries.get(name)
+        if name not in changed:
+            entries[name] = {**previous_entry, "stats": previous_entry.get("stats", file_stats(name, data))}
+            continue
+        patches = []
+        if previous_entry:
+            patch = build_patch(public_kb, name, previous_entry, data, digest, size, release)
+            if patch:
+                # 补丁链断开（本次无法生成补丁）时，旧补丁也不再有用
+                patches = (previous_entry.get("patches", []) + [patch])[-MAX_PATCH_CHAIN:]
+                result["patch_bytes"] += patch["bytes"]
+        entries[name] = {"release": release, "sha256": digest, "bytes": size, "patches": patches,
+                         "stats": file_stats(name, data)}
+        result["full_bytes"] += size
+        shutil.copy2(knowledge_dir / name, public_kb / name)
+
+    for name in removed:
+        (public_kb / name).unlink(missing_ok=True)
+    prune_patches(public_kb, entries)
+
     manifest = {
-        "version": "1.0.0",
+        "version": release,
         "last_updated": datetime.now().strftime("%Y-%m-%d"),
-        "files": json_files
+        "files": json_files,
+        "entries": entries
     }
-    
-    # 写入 manifest
-    manifest_file = knowledge_dir / "_manifest.json"
-    public_manifest_file = public_knowledge_dir / "_manifest.json"
-    
-    try:
-        with open(manifest_file, 'w', encoding='utf-8') as f:
-            json.dump(manifest, f, ensure_ascii=False, indent=2)
-        shutil.copy2(manifest_file, public_manifest_file)
-    except Exception as e:
-        print(f"⚠️  创建 manifest 失败 ({project}): {e}")
+    faq_index = write_faq_binary(knowledge_dir, public_kb)
+    if faq_index:
+        manifest["faq_index"] = faq_index
+    write_manifest(knowledge_dir, public_kb, manifest, result)
+
+    result.update({"release": release, "changed": changed, "removed": removed})
+    return result
+
+def print_release(release: dict):
+    """输出发布结果"""
+    if release["release"] is None:
+        return
+    if not release["changed"] and not release["removed"]:
+        print(f"  📦 发布版本 {release['release']}（无变化）")
+    else:
+        saved = ""
+        if release["patch_bytes"]:
+            saved = f"，补丁 {release['patch_bytes']:,} 字节 / 完整文件 {release['full_bytes']:,} 字节"
+        print(f"  📦 发布版本 {release['release']}: {len(release['changed'])} 个文件变化，"
+              f"{len(release['removed'])} 个文件删除{saved}")
+    for error in release["errors"]:
+        print(f"  ⚠️  {error}")
+
+def partition_name(tenant) -> str:
+    return f"{tenant.deployment}.{tenant.group}" if tenant.group else tenant.deployment
+
+def tenant_content_hash(manifest: dict) -> str:
+    """由清单中每个文件的 sha256 得到租户的内容哈希，与版本号和发布时间无关"""
+    return content_hash({name: entry.get("sha256") for name, entry in manifest.get("entries", {}).items()})
+
+def build_partitions(dist_dir: Path = DIST_DIR) -> list[dict]:
+    """
+    把已发布的 active 租户按部署分组复制到 dist_dir/<分组>/，写入每个分组的 index.json
+
+    每次完整重建：分组先写入临时目录再替换，不再存在的分组目录会被删除。
+    """
+    by_partition: dict[str, list] = {}
+    for tenant in load_registry(PROJECT_ROOT):
+        by_partition.setdefault(partition_name(tenant), []).append(tenant)
+
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    partitions = []
+    for name in sorted(by_partition):
+        staging = dist_dir / f".{name}.tmp"
+        if staging.exists():
+            shutil.rmtree(staging)
+        tenants = []
+        warnings = []
+        for tenant in sorted(by_partition[name], key=lambda t: t.id):
+            public_kb = PROJECT_ROOT / "public" / tenant.directory / "knowledge"
+            manifest = load_previous_manifest(public_kb)
+            if manifest is None:
+                warnings.append(f"{tenant.id}: 尚未发布，未包含在分组中")
+                continue
+            shutil.copytree(public_kb, staging / tenant.directory / "knowledge")
+            tenants.append({
+                "id": tenant.id,
+                "name": tenant.name,
+                "path": tenant.directory,
+                "release": manifest["version"],
+                "sha256": tenant_content_hash(manifest)
+            })
+        first = by_partition[name][0]
+        index = {
+            "partition": name,
+            "deployment": first.deployment,
+            "group": first.group,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "sha256": content_hash([[t["id"], t["sha256"]] for t in tenants]),
+            "tenants": tenants
+        }
+        staging.mkdir(parents=True, exist_ok=True)
+        with open(staging / PARTITION_INDEX_NAME, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        target = dist_dir / name
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(staging, target)
+        partitions.append({"partition": name, "tenants": len(tenants), "sha256": index["sha256"],
+                           "warnings": warnings})
+
+    # 只删除本函数生成的目录（含 index.json 的旧分组和残留的临时目录）
+    names = {partition["partition"] for partition in partitions}
+    for entry in dist_dir.iterdir():
+        stale = (entry / PARTITION_INDEX_NAME).exists() or entry.name.endswith(".tmp")
+        if entry.is_dir() and entry.name not in names and stale:
+            shutil.rmtree(entry)
+    with open(dist_dir / PARTITIONS_NAME, 'w', encoding='utf-8') as f:
+        json.dump({p["partition"]: {"tenants": p["tenants"], "sha256": p["sha256"]} for p in partitions},
+                  f, ensure_ascii=False, indent=2)
+    return partitions
+
+def print_partitions(partitions: list[dict], dist_dir: Path):
+    print(f"📦 部署分组（{dist_dir}）:")
+    for partition in partitions:
+        print(f"  {partition['partition']}: {partition['tenants']} 个租户，sha256 {partition['sha256'][:12]}")
+        for warning in partition["warnings"]:
+            print(f"  ⚠️  {warning}")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="知识库迁移与发布")
+    parser.add_argument("--publish-only", action="store_true",
+                        help="不从 chatbot-service 同步，只把 projects/ 中的知识库发布到 public 目录")
+    parser.add_argument("--dist", type=Path, default=DIST_DIR, help="按部署分组输出的目录")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("知识库迁移脚本")
     print("=" * 60)
-    print(f"源目录: {SOURCE_DIR}")
+    if not args.publish_only:
+        print(f"源目录: {SOURCE_DIR}")
     print(f"目标目录: {TARGET_DIR}")
     print(f"公共目录: {PUBLIC_DIR}")
     print()
     
-    # 检查源目录
-    if not SOURCE_DIR.exists():
-        print(f"❌ 错误: 源目录不存在: {SOURCE_DIR}")
-        print("请确保 chatbot-service 项目在同一父目录下")
-        return 1
-    
-    # 备份现有知识库
-    backup_existing_knowledge()
-    
-    # 获取专案列表
-    projects = get_projects_from_registry()
-    if not projects:
-        # 如果无法从 registry 获取，扫描目录
-        projects = [d.name for d in SOURCE_DIR.iterdir() 
-                   if d.is_dir() and (d / "knowledge").exists() 
-                   and d.name != "templates" and d.name != "archived"]
+    if args.publish_only:
+        projects = sorted(d.name for d in TARGET_DIR.iterdir() if d.is_dir() and (d / "knowledge").exists())
+    else:
+        # 检查源目录
+        if not SOURCE_DIR.exists():
+            print(f"❌ 错误: 源目录不存在: {SOURCE_DIR}")
+            print("请确保 chatbot-service 项目在同一父目录下")
+            return 1
+        
+        # 备份现有知识库
+        backup_existing_knowledge()
+        
+        # 获取专案列表
+        projects = get_projects_from_registry()
+        if not projects:
+            # 如果无法从 registry 获取，扫描目录
+            projects = [d.name for d in SOURCE_DIR.iterdir() 
+                       if d.is_dir() and (d / "knowledge").exists() 
+                       and d.name != "templates" and d.name != "archived"]
     
     if not projects:
         print("❌ 未找到任何专案")
@@ -181,38 +518,53 @@ def main():
     results = []
     
     for project in projects:
-        print(f"🔄 迁移 {project}...")
-        result = migrate_project_knowledge(project)
-        results.append(result)
-        
-        if result["copied"] > 0:
-            print(f"  ✅ 已复制 {result['copied']} 个文件")
-            for file in result["files"]:
-                print(f"     - {file}")
-        
-        if result["errors"]:
-            print(f"  ⚠️  发现 {len(result['errors'])} 个错误:")
-            for error in result["errors"]:
-                print(f"     - {error}")
-            total_errors += len(result["errors"])
-        
-        total_copied += result["copied"]
+        if args.publish_only:
+            print(f"🔄 发布 {project}...")
+        else:
+            print(f"🔄 迁移 {project}...")
+            result = migrate_project_knowledge(project)
+            results.append(result)
+            
+            if result["copied"] > 0:
+                print(f"  ✅ 已复制 {result['copied']} 个文件")
+                for file in result["files"]:
+                    print(f"     - {file}")
+            
+            if result["errors"]:
+                print(f"  ⚠️  发现 {len(result['errors'])} 个错误:")
+                for error in result["errors"]:
+                    print(f"     - {error}")
+                total_errors += len(result["errors"])
+            
+            total_copied += result["copied"]
         
-        # 创建 manifest
-        create_manifest(project)
+        # 发布到 public 目录并生成 manifest
+        release = publish_release(project)
+        print_release(release)
+        total_errors += len(release["errors"])
         print()
     
+    # 按部署分组输出
+    try:
+        print_partitions(build_partitions(args.dist), args.dist)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  部署分组输出失败: {e}")
+        total_errors += 1
+    print()
+    
     # 总结
     print("=" * 60)
-    print("迁移完成")
+    print("发布完成" if args.publish_only else "迁移完成")
     print("=" * 60)
-    print(f"✅ 成功复制: {total_copied} 个文件")
+    if not args.publish_only:
+        print(f"✅ 成功复制: {total_copied} 个文件")
     if total_errors > 0:
         print(f"⚠️  错误数量: {total_errors}")
     print()
     
     # 显示详细结果
-    print("详细结果:")
+    if results:
+        print("详细结果:")
     for result in results:
         status = "✅" if result["copied"] > 0 and not result["errors"] else "⚠️"
         print(f"  {status} {result['project']}: {result['copied']} 个文件")
@@ -221,4 +573,3 @@ def main():
 
 if __name__ == "__main__":
     exit(main())
-
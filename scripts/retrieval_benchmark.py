@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+检索质量与延迟基准
+
+从 projects/*/knowledge/5-faq_detailed.json 的每个 question 构建标准查询集，
+并自动生成扰动版本：
+- drop：随机删去约 15% 的字符（错字、漏字）
+- reorder：打乱分句顺序
+- keywords：只用条目的 keywords 拼成查询
+每条查询的正确答案是原条目（问题文本相同的重复条目都算正确）。
+
+对每个租户、每个检索器、每种查询类型输出 recall@k、MRR 和单次查询延迟分位数。
+检索器可替换：内置 keyword（与 chat-helpers 中触发词包含匹配相同的思路）、bm25（字符二元组）、
+hashing（load_embeddings.py 的哈希嵌入 + 余弦，需要 numpy），或 --retriever 模块:类名，
+类需要提供 name、index(docs) 和 search(query, k) -> [条目 id]；可选的 circular_variants 列出
+由检索器自身使用的字段构造、必然命中的查询类型，报告中以 * 标出。
+
+    python scripts/retrieval_benchmark.py --retriever bm25 --retriever keyword --json bench.json
+"""
+
+import argparse
+import heapq
+import importlib
+import json
+import math
+import random
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from code_health.knowledge_lint import iter_faq_entries, iter_knowledge_dirs, normalize_question  # noqa: E402
+
+FAQ_FILE = '5-faq_detailed.json'
+VARIANTS = ('exact', 'drop', 'reorder', 'keywords')
+K_VALUES = (1, 3, 5, 10)
+DROP_RATIO = 0.15
+SHUFFLE_ATTEMPTS = 10
+CLAUSE_BREAK = re.compile(r'[，,、；;。！？!?\s]+')
+ASCII_WORD = re.compile(r'[a-z0-9]+')
+
+
+class Doc:
+    __slots__ = ('id', 'question', 'answer', 'keywords', 'category')
+
+    def __init__(self, doc_id: str, question: str, answer: str, keywords: List[str], category: Optional[str]):
+        self.id = doc_id
+        self.question = question
+        self.answer = answer
+        self.keywords = keywords
+        self.category = category
+
+
+def load_docs(knowledge_dir: Path) -> List[Doc]:
+    with open(knowledge_dir / FAQ_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    docs = []
+    for position, (entry, category) in enumerate(iter_faq_entries(data)):
+        answer = entry.get('answer')
+        docs.append(Doc(
+            str(entry.get('id') or f'#{position}'),
+            entry['question'],
+            answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False),
+            [keyword for keyword in entry.get('keywords') or [] if isinstance(keyword, str)],
+            category
+        ))
+    return docs
+
+
+# ---------------------------------------------------------------------------
+# 查询集
+# ---------------------------------------------------------------------------
+
+def drop_characters(text: str, rng: random.Random) -> str:
+    chars = [c for c in text if not c.isspace()]
+    keep = [c for c in chars if rng.random() >= DROP_RATIO]
+    # 至少删掉一个字符，至少保留一半
+    if len(keep) == len(chars) and len(chars) > 1:
+        keep.pop(rng.randrange(len(keep)))
+    return ''.join(keep) if len(keep) >= len(chars) / 2 else ''.join(chars[:max(1, len(chars) // 2)])
+
+
+def reorder_clauses(text: str, rng: random.Random) -> Optional[str]:
+    """打乱分句；无法得到与原句不同的顺序时（如分句全部相同）返回 None"""
+    clauses = [clause for clause in CLAUSE_BREAK.split(text) if clause]
+    if len(set(clauses)) < 2:
+        # 只有一种分句时从中间切开对调
+        compact = ''.join(clauses)
+        if len(compact) < 4:
+            return None
+        middle = len(compact) // 2
+        rotated = compact[middle:] + compact[:middle]
+        return rotated if rotated != compact else None
+    shuffled = clauses[:]
+    for _ in range(SHUFFLE_ATTEMPTS):
+        rng.shuffle(shuffled)
+        if shuffled != clauses:
+            return '，'.join(shuffled)
+    # 随机多次仍与原顺序相同时直接轮转一位（至少有两种分句，轮转后必然不同）
+    return '，'.join(clauses[1:] + clauses[:1])
+
+
+def build_queries(docs: List[Doc], seed: int = 0) -> List[Dict[str, Any]]:
+    """每个条目生成各类查询；relevant 为问题文本相同的全部条目 id"""
+    rng = random.Random(seed)
+    same_question: Dict[str, List[str]] = defaultdict(list)
+    for doc in docs:
+        same_question[normalize_question(doc.question)].append(doc.id)
+
+    queries = []
+    for doc in docs:
+        relevant = same_question[normalize_question(doc.question)]
+        variants = {
+            'exact': doc.question,
+            'drop': drop_characters(doc.question, rng),
+            'reorder': reorder_clauses(doc.question, rng),
+            'keywords': ' '.join(doc.keywords) if doc.keywords else None
+        }
+        for variant, text in variants.items():
+            if text:
+                queries.append({'variant': variant, 'query': text, 'relevant': relevant, 'source': doc.id})
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# 检索器
+# ---------------------------------------------------------------------------
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def terms(text: str) -> List[str]:
+    """拉丁字母按单词，其余按字符二元组（单字也计入，短查询才有命中）"""
+    text = normalize(text)
+    result = ASCII_WORD.findall(text)
+    chars = [c for c in text if c.isalnum() and not c.isascii()]
+    result.extend(chars)
+    result.extend(a + b for a, b in zip(chars, chars[1:]))
+    return result
+
+
+class KeywordRetriever:
+    """按查询中包含的关键词（及完整问题）计分，与应用中 q_triggers 的包含匹配一致"""
+
+    name = 'keyword'
+    # keywords 查询由条目自己的关键词拼成，对本检索器必然命中，结果没有意义
+    circular_variants = ('keywords',)
+
+    def index(self, docs: List[Doc]):
+        self.docs = [(doc.id, normalize(doc.question), [normalize(k) for k in doc.keywords if k.strip()])
+                     for doc in docs]
+
+    def search(self, query: str, k: int) -> List[str]:
+        query = normalize(query)
+        scored = []
+        for position, (doc_id, question, keywords) in enumerate(self.docs):
+            score = sum(len(keyword) for keyword in keywords if keyword in query)
+            if question in query:
+                score += len(question)
+            if score:
+                scored.append((-score, position, doc_id))
+        return [doc_id for _, _, doc_id in heapq.nsmallest(k, scored)]
+
+
+class BM25Retriever:
+    name = 'bm25'
+    # 索引包含条目关键词，keywords 查询同样是循环的
+    circular_variants = ('keywords',)
+    K1 = 1.2
+    B = 0.75
+
+    def index(self, docs: List[Doc]):
+        self.ids = [doc.id for doc in docs]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = []
+        for position, doc in enumerate(docs):
+            # 问题权重加倍
+            counts = Counter(terms(doc.question) * 2 + terms(' '.join(doc.keywords)) + terms(doc.answer))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self.postings[term].append((position, count))
+        average = sum(lengths) / len(lengths) if lengths else 0
+        self.norms = [self.K1 * (1 - self.B + self.B * length / average) if average else self.K1 for length in lengths]
+        total = len(docs)
+        self.idf = {term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for term, postings in self.postings.items()}
+
+    def search(self, query: str, k: int) -> List[str]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(terms(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, count in self.postings[term]:
+                scores[position] += idf * count * (self.K1 + 1) / (count + self.norms[position])
+        return [self.ids[position] for position, _ in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
+
+
+class HashingRetriever:
+    """load_embeddings.HashingEmbedder 的向量 + 余弦相似度（暴力搜索）"""
+
+    name = 'hashing'
+    # 索引包含条目关键词，keywords 查询同样是循环的
+    circular_variants = ('keywords',)
+
+    def __init__(self):
+        from load_embeddings import HashingEmbedder
+        self.embedder = HashingEmbedder()
+        self.np = self.embedder.np
+
+    def index(self, docs: List[Doc]):
+        self.ids = [doc.id for doc in docs]
+        self.matrix = self.embedder.embed([f"{doc.question}\n{' '.join(doc.keywords)}" for doc in docs])
+
+    def search(self, query: str, k: int) -> List[str]:
+        scores = self.matrix @ self.embedder.embed([query])[0]
+        k = min(k, len(self.ids))
+        top = self.np.argpartition(-scores, k - 1)[:k]
+        return [self.ids[i] for i in top[self.np.argsort(-scores[top], kind='stable')]]
+
+
+RETRIEVERS = {'keyword': KeywordRetriever, 'bm25': BM25Retriever, 'hashing': HashingRetriever}
+
+
+def create_retriever(spec: str):
+    if spec in RETRIEVERS:
+        return RETRIEVERS[spec]()
+    module_name, _, attribute = spec.partition(':')
+    if not attribute:
+        raise ValueError(f'未知的检索器 {spec}（可选 {", ".join(RETRIEVERS)}，或 模块:类名）')
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+# ---------------------------------------------------------------------------
+# 评测
+# ---------------------------------------------------------------------------
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * p / 100) - 1))]
+
+
+def evaluate(retriever, docs: List[Doc], queries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    retriever.index(docs)
+    index_seconds = time.perf_counter() - started
+    max_k = max(K_VALUES)
+
+    by_variant: Dict[str, Dict[str, Any]] = {}
+    misses = []
+    for variant in VARIANTS:
+        selected = [query for query in queries if query['variant'] == variant]
+        if not selected:
+            continue
+        hits = {k: 0 for k in K_VALUES}
+        reciprocal_rank = 0.0
+        latencies = []
+        for query in selected:
+            started = time.perf_counter()
+            results = retriever.search(query['query'], max_k)
+            latencies.append(time.perf_counter() - started)
+            relevant = set(query['relevant'])
+            rank = next((i + 1 for i, doc_id in enumerate(results) if doc_id in relevant), None)
+            if rank is not None:
+                reciprocal_rank += 1 / rank
+                for k in K_VALUES:
+                    if rank <= k:
+                        hits[k] += 1
+            elif variant == 'exact':
+                misses.append({'query': query['query'], 'expected': query['source'], 'got': results[:3]})
+        count = len(selected)
+        by_variant[variant] = {
+            'queries': count,
+            'circular': variant in getattr(retriever, 'circular_variants', ()),
+            **{f'recall@{k}': round(hits[k] / count, 4) for k in K_VALUES},
+            'mrr': round(reciprocal_rank / count, 4),
+            'latency_us': {f'p{p}': round(percentile(latencies, p) * 1e6, 1) for p in (50, 95, 99)}
+        }
+    return {'index_ms': round(index_seconds * 1000, 2), 'variants': by_variant, 'exact_misses': misses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检索质量与延迟基准（基于 FAQ 数据）')
+    parser.add_argument('--retriever', action='append', help='keyword / bm25 / hashing / 模块:类名（可多次指定）')
+    parser.add_argument('--tenant', action='append', help='只评测指定租户目录（可多次指定）')
+    parser.add_argument('--seed', type=int, default=0, help='扰动查询的随机种子')
+    parser.add_argument('--json', type=Path, help='把完整结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    try:
+        retrievers = [create_retriever(spec) for spec in args.retriever or ['keyword', 'bm25']]
+    except (ImportError, AttributeError, ValueError) as e:
+        print(f'❌ {e}')
+        return 2
+
+    results: Dict[str, Any] = {'seed': args.seed, 'tenants': {}}
+    print(f"{'租户':<14} {'检索器':<9} {'查询':<9} {'数量':>5} {'R@1':>6} {'R@5':>6} {'R@10':>6} {'MRR':>6} "
+          f"{'p50µs':>8} {'p99µs':>8}")
+    for tenant, knowledge_dir in iter_knowledge_dirs(PROJECT_ROOT):
+        if (args.tenant and tenant not in args.tenant) or not (knowledge_dir / FAQ_FILE).exists():
+            continue
+        docs = load_docs(knowledge_dir)
+        if not docs:
+            continue
+        queries = build_queries(docs, args.seed)
+        tenant_results = results['tenants'][tenant] = {'entries': len(docs), 'retrievers': {}}
+        for retriever in retrievers:
+            evaluation = evaluate(retriever, docs, queries)
+            tenant_results['retrievers'][retriever.name] = evaluation
+            for variant, stats in evaluation['variants'].items():
+                label = f"{variant}*" if stats['circular'] else variant
+                print(f"{tenant:<14} {retriever.name:<9} {label:<9} {stats['queries']:>5} "
+                      f"{stats['recall@1']:>6.3f} {stats['recall@5']:>6.3f} {stats['recall@10']:>6.3f} "
+                      f"{stats['mrr']:>6.3f} {stats['latency_us']['p50']:>8} {stats['latency_us']['p99']:>8}")
+
+    if not results['tenants']:
+        print(f'❌ 没有找到 {FAQ_FILE}')
+        return 1
+    if any(stats['circular'] for tenant in results['tenants'].values()
+           for evaluation in tenant['retrievers'].values() for stats in evaluation['variants'].values()):
+        print('\n* 查询由检索器自身使用的字段构造（循环），结果必然命中，不能用于比较')
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'\n📄 结果已保存: {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
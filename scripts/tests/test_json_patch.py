@@ -0,0 +1,94 @@
+"""
+json_patch 的往返测试：apply_patch(old, make_patch(old, new)) 必须与 new 完全一致（包括值的类型）
+
+    python -m pytest scripts/tests
+"""
+
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from json_patch import apply_patch, canonical_json, make_patch  # noqa: E402
+
+
+def assert_round_trip(old, new):
+    patched = apply_patch(old, make_patch(old, new))
+    assert canonical_json(patched) == canonical_json(new)
+
+
+def test_type_changes_inside_containers():
+    cases = [
+        ([1], [True]),
+        ([0], [False]),
+        ({'a': 1}, {'a': 1.0}),
+        ({'a': [1, {'b': 2}]}, {'a': [1, {'b': 2.0}]}),
+        ([[1, 2]], [[1.0, 2]]),
+    ]
+    for old, new in cases:
+        assert make_patch(old, new), (old, new)
+        assert_round_trip(old, new)
+
+
+def test_identical_documents_produce_empty_patch():
+    document = {'faq': [{'id': 'a/b~c', 'answer': {'text': '你好', 'links': [1, 2.5, None, True]}}]}
+    assert make_patch(document, json.loads(canonical_json(document))) == []
+
+
+def test_array_edits():
+    old = [{'id': i, 'answer': f'答案 {i}'} for i in range(20)]
+    new = [dict(item) for item in old]
+    new[10]['answer'] = '修改后的答案'
+    del new[3]
+    new.insert(15, {'id': 'new', 'answer': '新增'})
+    patch = make_patch(old, new)
+    assert [op for op in patch if op['op'] == 'replace'] == [
+        {'op': 'replace', 'path': '/10/answer', 'value': '修改后的答案'}
+    ]
+    assert_round_trip(old, new)
+
+
+def test_root_and_special_keys():
+    assert_round_trip({'a': 1}, [1, 2])
+    assert_round_trip({'a/b': 1, 'c~d': [1]}, {'a/b': 2, 'c~d': [1, 2]})
+    assert_round_trip([], [{'x': None}])
+
+
+def test_random_round_trips():
+    rng = random.Random(0)
+
+    def value(depth=0):
+        choice = rng.random()
+        if depth > 3 or choice < 0.4:
+            return rng.choice([0, 1, 1.0, 2.5, True, False, None, '', '值', 'a/b', '~'])
+        if choice < 0.7:
+            return [value(depth + 1) for _ in range(rng.randint(0, 4))]
+        return {rng.choice('abcde/~'): value(depth + 1) for _ in range(rng.randint(0, 4))}
+
+    def mutate(node):
+        if isinstance(node, list) and node and rng.random() < 0.7:
+            node = list(node)
+            index = rng.randrange(len(node))
+            action = rng.random()
+            if action < 0.3:
+                del node[index]
+            elif action < 0.6:
+                node.insert(index, value())
+            else:
+                node[index] = mutate(node[index])
+            return node
+        if isinstance(node, dict) and node and rng.random() < 0.7:
+            node = dict(node)
+            key = rng.choice(list(node))
+            node[key] = mutate(node[key])
+            return node
+        return value()
+
+    for _ in range(500):
+        old = value()
+        new = old
+        for _ in range(rng.randint(1, 3)):
+            new = mutate(new)
+        assert_round_trip(old, new)
@@ -0,0 +1,66 @@
+"""
+流式 JSON 数组解析：完整输出逐个产出元素，被截断或损坏的输出必须报告解析错误
+
+    python -m pytest scripts/tests
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from code_health.jsonstream import iter_json_array  # noqa: E402
+from code_health.runner import JsonArrayParser  # noqa: E402
+
+
+def parse(text: str, chunk_size: int = 4):
+    items = []
+    parser = JsonArrayParser(items.append)
+    for start in range(0, len(text), chunk_size):
+        parser.feed(text[start:start + chunk_size])
+    parser.close()
+    return items, parser.error
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+def test_complete_array(chunk_size):
+    document = [{'filePath': '/p/a.ts', 'messages': [{'line': 1, 'message': '引号 "x"'}]}, {'n': -1.5e3}, [], None]
+    items, error = parse(json.dumps(document, ensure_ascii=False), chunk_size)
+    assert error is None
+    assert items == document
+
+
+@pytest.mark.parametrize('text', [
+    '[{"a":1}, garbage]',
+    '[{"a":1},{"b":2',
+    '[{"a":1},{"b":2},{"c":"' + 'x' * 40,
+    '[{"a":1}',
+    '[{"a":1},',
+    '',
+    'Oops! Something went wrong',
+])
+@pytest.mark.parametrize('chunk_size', [1, 4, 1024])
+def test_truncated_or_malformed_output_reports_error(text, chunk_size):
+    items, error = parse(text, chunk_size)
+    assert error
+    assert all(isinstance(item, dict) for item in items)
+
+
+def test_malformed_element_in_the_middle():
+    text = '[' + ', '.join([json.dumps({'pad': 'y' * 30})] * 2 + ['{"b": x}', '{"c": 3}']) + ']'
+    items, error = parse(text, 7)
+    assert len(items) == 2
+    assert '格式错误' in error
+
+
+def test_iter_json_array_truncated():
+    text = json.dumps([{'a': 1}, {'b': 2}])[:-5]
+    assert list(iter_json_array(io.StringIO(text))) == [{'a': 1}]
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), strict=True))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a":1}, garbage]')))
@@ -0,0 +1,111 @@
+"""
+load_embeddings 的 COPY binary 编码与 --output-dir 检查点
+
+    python -m pytest scripts/tests
+"""
+
+import json
+import struct
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+np = pytest.importorskip('numpy')
+
+from load_embeddings import (COLUMNS, EMBEDDING_DIM, PGCOPY_SIGNATURE, Checkpoint, Chunk,  # noqa: E402
+                             DirectorySink, HashingEmbedder, encode_binary, load_tenant)
+
+
+def decode_pgcopy(data: bytes):
+    """按 PostgreSQL COPY binary 格式解析出每行的原始字段"""
+    assert data.startswith(PGCOPY_SIGNATURE)
+    flags, extension = struct.unpack_from('>ii', data, len(PGCOPY_SIGNATURE))
+    assert (flags, extension) == (0, 0)
+    offset = len(PGCOPY_SIGNATURE) + 8
+    rows = []
+    while True:
+        count, = struct.unpack_from('>h', data, offset)
+        offset += 2
+        if count == -1:
+            break
+        fields = []
+        for _ in range(count):
+            length, = struct.unpack_from('>i', data, offset)
+            offset += 4
+            fields.append(data[offset:offset + length])
+            offset += length
+        rows.append(dict(zip(COLUMNS, fields)))
+    assert offset == len(data)
+    return rows
+
+
+def decode_vector(field: bytes):
+    """pgvector 的二进制表示：int16 维度、int16 保留、大端 float4[]"""
+    dim, unused = struct.unpack_from('>hh', field, 0)
+    assert unused == 0
+    assert len(field) == 4 + 4 * dim
+    return np.frombuffer(field, dtype='>f4', offset=4)
+
+
+def test_binary_copy_layout():
+    chunks = [
+        Chunk('company-b', '5-faq_detailed.json', 'faq-1', 0, '問：可以改期嗎？\n答：可以', {'type': 'faq'}),
+        Chunk('company-b', '1-company_info.json', 'contact', 3, 'contact.phone: 02-1234', {'type': 'section'}),
+    ]
+    embedder = HashingEmbedder()
+    vectors = embedder.embed([chunk.content for chunk in chunks])
+    rows = decode_pgcopy(encode_binary(chunks, vectors, embedder.name))
+
+    assert len(rows) == len(chunks)
+    for row, chunk, vector in zip(rows, chunks, vectors):
+        assert row['id'].decode('utf-8') == chunk.id
+        assert row['company_id'].decode('utf-8') == chunk.company
+        assert row['source_file'].decode('utf-8') == chunk.source_file
+        assert row['source_path'].decode('utf-8') == chunk.source_path
+        assert struct.unpack('>i', row['chunk_index']) == (chunk.index,)
+        assert row['content'].decode('utf-8') == chunk.content
+        assert row['content_hash'].decode('utf-8') == chunk.content_hash
+        assert row['embedding_model'].decode('utf-8') == embedder.name
+        decoded = decode_vector(row['embedding'])
+        assert decoded.shape == (EMBEDDING_DIM,)
+        assert np.array_equal(decoded, vector.astype(np.float32))
+        # jsonb 二进制格式：版本号 1 + JSON 文本
+        assert row['metadata'][:1] == b'\x01'
+        assert json.loads(row['metadata'][1:].decode('utf-8')) == chunk.metadata
+
+
+def test_directory_sink_checkpoint_waits_for_load(tmp_path):
+    knowledge = tmp_path / 'knowledge'
+    knowledge.mkdir()
+    (knowledge / '1-company_info.json').write_text(json.dumps({'name': '測試公司', 'hours': '週一至週五'}),
+                                                   encoding='utf-8')
+    output = tmp_path / 'out'
+    checkpoint_path = tmp_path / 'checkpoint.json'
+    embedder = HashingEmbedder()
+
+    def run():
+        checkpoint = Checkpoint(checkpoint_path, embedder.name, 'out#binary')
+        sink = DirectorySink(output, 'binary')
+        sink.restore(checkpoint)
+        try:
+            return load_tenant('demo', knowledge, embedder, sink, checkpoint, 'binary', 16, 800)
+        finally:
+            sink.close()
+
+    assert run()['embedded'] == 2
+    # load.sql 还没有执行：分块不能算作已导入
+    assert run()['embedded'] == 2
+    assert not checkpoint_path.exists() or not json.loads(checkpoint_path.read_text())['tenants'].get('demo')
+
+    # 模拟 psql 执行到 load.sql 末尾的 \! 命令
+    script = (output / 'load.sql').read_text(encoding='utf-8')
+    assert script.startswith('\\set ON_ERROR_STOP on\n')
+    for line in script.splitlines():
+        if line.startswith('\\!'):
+            subprocess.run(line[2:], shell=True, cwd=output, check=True)
+    assert run()['embedded'] == 0
+    assert not list(output.glob('run-*.json'))
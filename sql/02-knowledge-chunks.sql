@@ -0,0 +1,46 @@
+-- 知识库分块表（由 scripts/load_embeddings.py 批量写入）
+-- 依赖 01-init.sql 中启用的 pgvector 扩展
+
+-- 10. 知识库分块表 (knowledge_chunks)
+CREATE TABLE IF NOT EXISTS knowledge_chunks (
+  id TEXT PRIMARY KEY,                 -- (company_id, source_file, source_path, chunk_index) 的哈希
+  company_id TEXT NOT NULL,
+  source_file TEXT NOT NULL,           -- 如 5-faq_detailed.json
+  source_path TEXT NOT NULL,           -- FAQ 条目 id 或 JSON 中的顶层键
+  chunk_index INTEGER NOT NULL DEFAULT 0,
+  content TEXT NOT NULL,
+  content_hash TEXT NOT NULL,
+  embedding_model TEXT NOT NULL,
+  embedding vector(768) NOT NULL,
+  metadata JSONB,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_company_id ON knowledge_chunks(company_id);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_source ON knowledge_chunks(company_id, source_file);
+-- 向量相似度搜索索引（使用 HNSW 算法）
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_embedding ON knowledge_chunks USING hnsw (embedding vector_cosine_ops);
+
+-- 11. 按公司检索最相似的分块
+CREATE OR REPLACE FUNCTION match_knowledge_chunks(
+  query_embedding vector(768),
+  company TEXT,
+  match_count INTEGER DEFAULT 5
+)
+RETURNS TABLE (
+  id TEXT,
+  source_file TEXT,
+  source_path TEXT,
+  content TEXT,
+  similarity REAL
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT c.id, c.source_file, c.source_path, c.content,
+         (1 - (c.embedding <=> query_embedding))::REAL AS similarity
+  FROM knowledge_chunks c
+  WHERE c.company_id = company
+  ORDER BY c.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql;